@@ -0,0 +1,45 @@
+"""
+Micro-benchmark of the agent JSON serialization.
+Run from the agent directory: python benchmarks/bench_serializer.py
+"""
+import os
+import sys
+import timeit
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from file_datasource import FileDatasource
+from schema.aggregated_data_schema import AggregatedDataSchema
+from schema.fast_serializer import compile_serializer, dumps_many
+
+RECORDS = 10000
+REPEAT = 5
+
+
+def main():
+    datasource = FileDatasource(
+        *(os.path.join(SRC_DIR, "data", f"{name}.csv") for name in ("accelerometer", "gps", "humidex", "anemometer")),
+        preload=True
+    )
+    datasource.startReading()
+    batch = datasource.read(RECORDS)
+    dumps = compile_serializer(AggregatedDataSchema())
+
+    assert all(dumps(data) == AggregatedDataSchema().dumps(data) for data in batch)
+    assert dumps_many(dumps, batch) == AggregatedDataSchema(many=True).dumps(batch)
+
+    cases = {
+        "schema per record": lambda: [AggregatedDataSchema().dumps(data) for data in batch],
+        "cached schema": lambda schema=AggregatedDataSchema(): [schema.dumps(data) for data in batch],
+        "compiled serializer": lambda: [dumps(data) for data in batch],
+    }
+    baseline = None
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=1, repeat=REPEAT))
+        baseline = baseline or seconds
+        print(f"{name:20} {RECORDS / seconds:12.0f} records/s  x{baseline / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
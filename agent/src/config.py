@@ -8,13 +8,59 @@ def try_parse(type, value: str):
         return None
 
 
+def parse_bool(value: str):
+    return (value or "").strip().lower() in ("1", "true", "yes", "on")
+
+
 USER_ID = 1
 # MQTT config
 MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "mqtt"
 MQTT_BROKER_PORT = try_parse(int, os.environ.get("MQTT_BROKER_PORT")) or 1883
 MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "agent"
+MQTT_QOS = try_parse(int, os.environ.get("MQTT_QOS")) or 0
+# QoS > 0 messages paho keeps in memory while disconnected, further ones go to the offline spool
+MQTT_MAX_QUEUED = try_parse(int, os.environ.get("MQTT_MAX_QUEUED")) or 1000
+# Publish every vehicle to MQTT_TOPIC/{user_id % TOPIC_PARTITIONS} so edge instances can split the stream,
+# disabled when 0. Must match TOPIC_PARTITIONS of the edge
+TOPIC_PARTITIONS = try_parse(int, os.environ.get("TOPIC_PARTITIONS")) or 0
+# Maximum number of unacknowledged messages, enables the windowed asynchronous publisher when set.
+# The window publishes with QoS 1 at least, so the broker acknowledges every message
+INFLIGHT_WINDOW = try_parse(int, os.environ.get("INFLIGHT_WINDOW")) or 0
 
 # Delay for sending data to mqtt in seconds
 DELAY = try_parse(float, os.environ.get("DELAY")) or 1
+# Target rate in records per second, replaces DELAY pacing when set
+RATE = try_parse(float, os.environ.get("RATE")) or 0
 
 BATCH_SIZE = try_parse(int, os.environ.get("BATCH_SIZE")) or 1
+# Send the whole batch as one MQTT message with a JSON array instead of one message per record
+BATCH_ENVELOPE = parse_bool(os.environ.get("BATCH_ENVELOPE"))
+# Payload format: "json" or "binary" (see wire_codec.py)
+WIRE_FORMAT = os.environ.get("WIRE_FORMAT") or "json"
+
+# Directory with the sensor files and their format: "csv" or "npy" (generated by synthetic_data.py)
+DATA_DIR = os.environ.get("DATA_DIR") or "data"
+DATA_FORMAT = os.environ.get("DATA_FORMAT") or "csv"
+
+# Load sensor CSV files into memory once and replay them from NumPy columns
+PRELOAD = parse_bool(os.environ.get("PRELOAD"))
+
+# Resample the sensors onto a common timeline using the recording rates of the files in Hz
+TIME_ALIGNED = parse_bool(os.environ.get("TIME_ALIGNED"))
+ACCELEROMETER_SAMPLE_RATE = try_parse(float, os.environ.get("ACCELEROMETER_SAMPLE_RATE")) or 1.0
+GPS_SAMPLE_RATE = try_parse(float, os.environ.get("GPS_SAMPLE_RATE")) or 1.0
+HUMIDEX_SAMPLE_RATE = try_parse(float, os.environ.get("HUMIDEX_SAMPLE_RATE")) or 1.0
+ANEMOMETER_SAMPLE_RATE = try_parse(float, os.environ.get("ANEMOMETER_SAMPLE_RATE")) or 1.0
+
+# Directory of the offline spool for messages that could not be published, disabled when empty
+SPOOL_DIR = os.environ.get("SPOOL_DIR") or ""
+# Size of one memory-mapped spool segment and the cap of the whole spool in bytes
+SPOOL_SEGMENT_SIZE = try_parse(int, os.environ.get("SPOOL_SEGMENT_SIZE")) or 1024 * 1024
+SPOOL_MAX_SIZE = try_parse(int, os.environ.get("SPOOL_MAX_SIZE")) or 64 * 1024 * 1024
+# Messages per second republished from the spool after reconnect
+SPOOL_DRAIN_RATE = try_parse(float, os.environ.get("SPOOL_DRAIN_RATE")) or 100
+
+# Number of virtual vehicles simulated by one agent process, user ids start from USER_ID
+FLEET_SIZE = try_parse(int, os.environ.get("FLEET_SIZE")) or 1
+# Standard deviation of the noise added to fleet GPS coordinates in degrees
+GPS_JITTER = try_parse(float, os.environ.get("GPS_JITTER")) or 0.00005
@@ -1,7 +1,10 @@
 from enum import Enum
 from csv import DictReader
+from dataclasses import fields
 from datetime import datetime
+from fractions import Fraction
 from marshmallow import Schema
+import numpy as np
 from schema.accelerometer_schema import AccelerometerSchema
 from schema.gps_schema import GpsSchema
 from schema.humidex_schema import HumidexSchema
@@ -26,20 +29,43 @@ class FileDatasource:
         accelerometer_filename: str,
         gps_filename: str,
         humidex_filename: str,
-        anemometer_filename: str
+        anemometer_filename: str,
+        preload: bool = False,
+        sample_rates: tuple = None
     ) -> None:
+        """
+        sample_rates are the recording rates of the accelerometer, GPS, humidex and anemometer
+        files in Hz. When given, the sensors are resampled onto a common timeline at the highest
+        rate instead of being zipped row by row, this requires (and enables) preload mode.
+        """
+        filenames = (accelerometer_filename, gps_filename, humidex_filename, anemometer_filename)
+        # Memory-mapped .npy files are always read in columns
+        self.preload = preload or sample_rates is not None or any(name.endswith(".npy") for name in filenames)
+        self.sample_rates = sample_rates or (1.0,) * len(FileDatasource.DataKeys)
+        self.time_aligned = sample_rates is not None
+        self.position = 0
         self.readers = [None] * len(FileDatasource.DataKeys)
-        self.readers[FileDatasource.DataKeys.ACCELEROMETER.value] = DatasourceReader(accelerometer_filename, AccelerometerSchema())
-        self.readers[FileDatasource.DataKeys.GPS.value] = DatasourceReader(gps_filename, GpsSchema())
-        self.readers[FileDatasource.DataKeys.HUMIDEX.value] = DatasourceReader(humidex_filename, HumidexSchema())
-        self.readers[FileDatasource.DataKeys.ANEMOMETER.value] = DatasourceReader(anemometer_filename, AnemometerSchema())
+        self.readers[FileDatasource.DataKeys.ACCELEROMETER.value] = self._create_reader(accelerometer_filename, AccelerometerSchema(), Accelerometer, FileDatasource.DataKeys.ACCELEROMETER)
+        self.readers[FileDatasource.DataKeys.GPS.value] = self._create_reader(gps_filename, GpsSchema(), Gps, FileDatasource.DataKeys.GPS, interpolate=True)
+        self.readers[FileDatasource.DataKeys.HUMIDEX.value] = self._create_reader(humidex_filename, HumidexSchema(), Humidex, FileDatasource.DataKeys.HUMIDEX)
+        self.readers[FileDatasource.DataKeys.ANEMOMETER.value] = self._create_reader(anemometer_filename, AnemometerSchema(), Anemometer, FileDatasource.DataKeys.ANEMOMETER)
 
-    def read(self, batch_size) -> AggregatedData:
+    def _create_reader(self, filename: str, schema: Schema, domain_type: type, key: DataKeys, interpolate: bool = False):
+        if filename.endswith(".npy"):
+            return MemmapDatasourceReader(filename, schema, domain_type, self.sample_rates[key.value], interpolate)
+        if self.preload:
+            return PreloadedDatasourceReader(filename, schema, domain_type, self.sample_rates[key.value], interpolate)
+        return DatasourceReader(filename, schema)
+
+    def read(self, batch_size) -> list[AggregatedData]:
         """Метод повертає дані отримані з датчиків"""
         for reader in self.readers:
             if not reader.reader:
                 raise Exception("CSV Readers not initialized. Call startReading first.")
-        
+
+        if self.preload:
+            return self._read_preloaded(batch_size)
+
         result = [None] * batch_size
 
         try:
@@ -56,8 +82,66 @@ class FileDatasource:
             print(f"Validation error: {err}")
             return []
 
+    def _read_preloaded(self, batch_size) -> list[AggregatedData]:
+        """Builds a batch from index slices over the preloaded sensor columns"""
+        result = self.read_at(self.position, batch_size, config.USER_ID)
+        self.position += batch_size
+        return result
+
+    def read_at(
+        self,
+        position: int,
+        batch_size: int,
+        user_id: int,
+        gps_jitter: float = 0.0,
+        rng: np.random.Generator = None
+    ) -> list[AggregatedData]:
+        """
+        Builds a batch starting at the given position without touching the shared cursor.
+        Without sample rates every sensor wraps around its own file length, in time aligned
+        mode the position is a sample of the common timeline. When gps_jitter is set, gaussian
+        noise with that standard deviation (in degrees) is added to the coordinates.
+        Only available in preload mode.
+        """
+        if self.time_aligned:
+            # Samples of the common timeline, all sensors loop together after the shortest one ends
+            samples = np.arange(position, position + batch_size) % self.length
+            columns = [reader.sample(samples, self.base_rate) for reader in self.readers]
+        else:
+            columns = [reader.slice(position, batch_size) for reader in self.readers]
+
+        if gps_jitter:
+            rng = rng or np.random.default_rng()
+            gps_columns = columns[FileDatasource.DataKeys.GPS.value]
+            columns[FileDatasource.DataKeys.GPS.value] = [
+                column + rng.normal(0.0, gps_jitter, batch_size) for column in gps_columns
+            ]
+
+        accelerometers, gpss, humidexes, anemometers = (
+            reader.to_domain(reader_columns) for reader, reader_columns in zip(self.readers, columns)
+        )
+        timestamp = datetime.now()
+
+        return [
+            AggregatedData(accelerometer, gps, humidex, anemometer, timestamp, user_id)
+            for accelerometer, gps, humidex, anemometer in zip(accelerometers, gpss, humidexes, anemometers)
+        ]
+
+    @property
+    def base_rate(self) -> float:
+        """Rate of the common timeline, the rate of the fastest sensor"""
+        return max(self.sample_rates)
+
+    @property
+    def length(self) -> int:
+        """Number of samples in one replay loop, in time aligned mode limited by the shortest recording"""
+        if self.time_aligned:
+            return min(reader.timeline_length(self.base_rate) for reader in self.readers)
+        return max(reader.length for reader in self.readers)
+
     def startReading(self, *args, **kwargs):
         """Метод повинен викликатись перед початком читання даних"""
+        self.position = 0
         for reader in self.readers:
             reader.startReading()
 
@@ -93,4 +177,94 @@ class DatasourceReader:
     
     def stopReading(self):
         if self.file:
-            self.file.close()
\ No newline at end of file
+            self.file.close()
+
+
+class PreloadedDatasourceReader:
+    """
+    Loads the whole CSV file into NumPy columns once so it can be replayed in a loop.
+    Rows are validated through the schema a single time in startReading,
+    after that reading is only slicing the columns.
+    """
+    filename: str
+    columns: list[np.ndarray]
+
+    def __init__(self, filename, schema: Schema, domain_type: type, rate: float = 1.0, interpolate: bool = False):
+        self.filename = filename
+        self.schema = schema
+        self.domain_type = domain_type
+        # Recording rate in Hz, interpolate selects linear interpolation instead of holding the last sample
+        self.rate = rate
+        self.interpolate = interpolate
+        self.field_names = [field.name for field in fields(domain_type)]
+        self.columns = []
+        self.length = 0
+        self.reader = None
+
+    def startReading(self):
+        with open(self.filename, 'r') as file:
+            rows = self.schema.load(list(DictReader(file)), many=True)
+
+        if not rows:
+            raise Exception(f"No data in {self.filename}")
+
+        self.columns = [
+            np.array([row[name] for row in rows], dtype=self._dtype(name))
+            for name in self.field_names
+        ]
+        self.length = len(rows)
+        self.reader = self
+
+    def slice(self, position: int, batch_size: int) -> list[np.ndarray]:
+        """Returns batch_size values of every column starting at position, wrapping around at the end of the file"""
+        indices = np.arange(position, position + batch_size) % self.length
+        return [column[indices] for column in self.columns]
+
+    def rows_per_sample(self, base_rate: float) -> Fraction:
+        """Rows of this file per sample of a timeline at base_rate Hz, as an exact fraction"""
+        return (Fraction(self.rate) / Fraction(base_rate)).limit_denominator(1_000_000)
+
+    def timeline_length(self, base_rate: float) -> int:
+        """Number of samples of a timeline at base_rate Hz that fall within the recording"""
+        step = self.rows_per_sample(base_rate)
+        return -(-self.length * step.denominator // step.numerator)
+
+    def sample(self, samples: np.ndarray, base_rate: float) -> list[np.ndarray]:
+        """Returns the columns resampled at the given samples of a timeline at base_rate Hz, below timeline_length"""
+        # Integer arithmetic, so samples that land exactly on a row are not rounded down to the previous one
+        step = self.rows_per_sample(base_rate)
+        numerators = samples * step.numerator
+        lower = numerators // step.denominator
+        if not self.interpolate:
+            return [column[lower] for column in self.columns]
+        # The last row is held instead of interpolating towards the first one
+        upper = np.minimum(lower + 1, self.length - 1)
+        fraction = (numerators % step.denominator) / step.denominator
+        return [column[lower] + (column[upper] - column[lower]) * fraction for column in self.columns]
+
+    def to_domain(self, columns: list[np.ndarray]) -> list:
+        values = [column.tolist() for column in columns]
+        return [self.domain_type(*row) for row in zip(*values)]
+
+    def stopReading(self):
+        self.columns = []
+        self.reader = None
+
+    def _dtype(self, name):
+        return np.int32 if self.domain_type.__annotations__[name] is int else np.float64
+
+
+class MemmapDatasourceReader(PreloadedDatasourceReader):
+    """
+    Replays a structured .npy file (see synthetic_data.py) through a memory map,
+    so datasets larger than RAM are streamed page by page instead of being loaded.
+    """
+
+    def startReading(self):
+        data = np.load(self.filename, mmap_mode='r')
+        if not len(data):
+            raise Exception(f"No data in {self.filename}")
+
+        self.columns = [data[name] for name in self.field_names]
+        self.length = len(data)
+        self.reader = self
@@ -0,0 +1,62 @@
+import asyncio
+import time
+import numpy as np
+from file_datasource import FileDatasource
+
+
+class Vehicle:
+    """Virtual vehicle that replays the shared preloaded data from its own offset"""
+
+    def __init__(self, user_id: int, offset: int, gps_jitter: float, seed: int):
+        self.user_id = user_id
+        self.position = offset
+        self.gps_jitter = gps_jitter
+        self.rng = np.random.default_rng(seed)
+
+    def read(self, datasource: FileDatasource, batch_size: int):
+        data = datasource.read_at(self.position, batch_size, self.user_id, self.gps_jitter, self.rng)
+        self.position += batch_size
+        return data
+
+
+def create_fleet(datasource: FileDatasource, fleet_size: int, first_user_id: int, gps_jitter: float, seed: int = 0):
+    """Spreads vehicles evenly over the sensor data, each one with its own user_id"""
+    return [
+        Vehicle(first_user_id + i, i * datasource.length // fleet_size, gps_jitter, seed + i)
+        for i in range(fleet_size)
+    ]
+
+
+async def drive(vehicle: Vehicle, datasource: FileDatasource, delay: float, batch_size: int, send_batch):
+    # Spread the first publish over one delay so the fleet does not publish in lockstep
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + vehicle.rng.uniform(0, delay)
+    while True:
+        # Sleep until the next deadline so publishing time does not add up to the delay
+        await asyncio.sleep(max(0.0, deadline - loop.time()))
+        # Publishing can block on a full PublishWindow, a worker thread waits instead of the loop
+        await asyncio.to_thread(send_batch, vehicle.read(datasource, batch_size))
+        deadline += delay
+
+
+async def report(fleet_size: int, delay: float, batch_size: int, interval: float = 10):
+    started = time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        print(f"Fleet of {fleet_size} vehicles running for {time.monotonic() - started:.0f}s, "
+              f"target {fleet_size * batch_size / delay:.0f} records/s")
+
+
+async def run_fleet(datasource: FileDatasource, vehicles: list[Vehicle], delay: float, batch_size: int, send_batch):
+    """
+    Runs every vehicle as a coroutine in a single event loop.
+    Parameters:
+        datasource (FileDatasource): Started datasource in preload mode shared by all vehicles.
+        vehicles (list[Vehicle]): Vehicles to simulate.
+        delay (float): Delay between batches of one vehicle in seconds.
+        batch_size (int): Number of records read per vehicle per delay.
+        send_batch: Callable that publishes a list of AggregatedData, called from worker threads.
+    """
+    tasks = [asyncio.create_task(drive(vehicle, datasource, delay, batch_size, send_batch)) for vehicle in vehicles]
+    tasks.append(asyncio.create_task(report(len(vehicles), delay, batch_size)))
+    await asyncio.gather(*tasks)
@@ -1,54 +1,163 @@
 from paho.mqtt import client as mqtt_client
+import asyncio
 import json
 import time
 from schema.aggregated_data_schema import AggregatedDataSchema
+from schema.fast_serializer import compile_serializer, dumps_many
 from file_datasource import FileDatasource
+from fleet import create_fleet, run_fleet
+from publish_window import PublishWindow
+from rate_controller import RateController
+from spool import OfflineSpool, SpoolDrainer
+from wire_codec import encode_agent_data
 import config
 
+# Produces the same JSON as AggregatedDataSchema().dumps without building the schema per record
+dump_aggregated_data = compile_serializer(AggregatedDataSchema())
 
-def connect_mqtt(broker, port):
-    """Create MQTT client"""
+
+def connect_mqtt(broker, port, drainer: SpoolDrainer = None, inflight_window: int = 0, max_queued: int = 0):
+    """
+    Create MQTT client. With inflight_window it is wrapped in a PublishWindow,
+    publish loops only need publish(topic, payload), so the window stands in for the client.
+    max_queued caps the QoS > 0 messages paho keeps in memory, 0 is unlimited.
+    """
     print(f"CONNECT TO {broker}:{port}")
+    window = None
 
     def on_connect(client, userdata, flags, rc):
         if rc == 0:
             print(f"Connected to MQTT Broker ({broker}:{port})!")
+            if window:
+                window.on_connected()
+            if drainer:
+                drainer.on_connected(window or client)
         else:
             print("Failed to connect {broker}:{port}, return code %d\n", rc)
             exit(rc)  # Stop execution
 
+    def on_disconnect(client, userdata, rc):
+        print(f"Disconnected from MQTT Broker ({broker}:{port}), return code {rc}")
+        if drainer:
+            drainer.on_disconnected()
+
     client = mqtt_client.Client()
+    # paho counts the in flight messages as queued, the window must fit under the cap
+    client.max_queued_messages_set(max(max_queued, inflight_window) if max_queued else 0)
+    if inflight_window:
+        window = PublishWindow(client, inflight_window)
     client.on_connect = on_connect
+    client.on_disconnect = on_disconnect
     client.connect(broker, port)
     client.loop_start()
-    return client
+    return window or client
 
 
-def publish(client, topic: str, datasource: FileDatasource, delay: float, batch_size: int):
+def publish(client, topic: str, datasource: FileDatasource, delay: float, batch_size: int, spool: OfflineSpool = None):
     datasource.startReading()
     while True:
         time.sleep(delay)
 
-        for data in datasource.read(batch_size):
-            aggregated_data = AggregatedDataSchema().dumps(data)
-            
-            result = client.publish(topic, aggregated_data)
+        send_batch(client, topic, datasource.read(batch_size), spool)
+
+
+def publish_at_rate(client, topic: str, datasource: FileDatasource, rate: float, batch_size: int, spool: OfflineSpool = None):
+    datasource.startReading()
+    rate_controller = RateController(rate, batch_size)
+    while True:
+        batch = datasource.read(rate_controller.acquire())
+        send_batch(client, topic, batch, spool)
+        rate_controller.done(len(batch))
+
+
+def partition_topic(topic: str, user_id: int, partitions: int) -> str:
+    """Topic of the vehicle's partition, all samples of one vehicle go to the same one"""
+    return f"{topic}/{user_id % partitions}" if partitions else topic
+
+
+def send_batch(client, topic: str, batch, spool: OfflineSpool = None):
+    if not batch:
+        return
+    if config.TOPIC_PARTITIONS:
+        partitions = {}
+        for data in batch:
+            partitions.setdefault(partition_topic(topic, data.user_id, config.TOPIC_PARTITIONS), []).append(data)
+        for partition, partition_batch in partitions.items():
+            publish_batch(client, partition, partition_batch, spool)
+    else:
+        publish_batch(client, topic, batch, spool)
+
+
+def publish_batch(client, topic: str, batch, spool: OfflineSpool = None):
+    if config.WIRE_FORMAT == "binary":
+        messages = [encode_agent_data(batch)] if config.BATCH_ENVELOPE else [encode_agent_data([data]) for data in batch]
+    elif config.BATCH_ENVELOPE:
+        # One MQTT message carries the whole batch as a JSON array
+        messages = [dumps_many(dump_aggregated_data, batch)]
+    else:
+        messages = [dump_aggregated_data(data) for data in batch]
+
+    for message in messages:
+        result = client.publish(topic, message, qos=config.MQTT_QOS)
+
+        status = result[0]
+        if status == 0:
+            pass
+            # print(f"Send `{msg}` to topic `{topic}`")
+        elif status == mqtt_client.MQTT_ERR_NO_CONN and config.MQTT_QOS > 0:
+            # paho keeps QoS > 0 messages while disconnected and sends them after the reconnect,
+            # once MQTT_MAX_QUEUED are waiting it rejects them with MQTT_ERR_QUEUE_SIZE instead
+            pass
+        elif spool:
+            # Keep the message on disk, it is republished after reconnect
+            spool.append(message, topic if config.TOPIC_PARTITIONS else None)
+        else:
+            print(f"Failed to send message to topic {topic}")
+
+
+def publish_fleet(
+    client, topic: str, datasource: FileDatasource, fleet_size: int, delay: float, batch_size: int, spool: OfflineSpool = None
+):
+    datasource.startReading()
+    vehicles = create_fleet(datasource, fleet_size, config.USER_ID, config.GPS_JITTER)
+    print(f"Starting fleet of {fleet_size} vehicles")
+    asyncio.run(run_fleet(datasource, vehicles, delay, batch_size, lambda batch: send_batch(client, topic, batch, spool)))
+
 
-            status = result[0]
-            if status == 0:
-                pass
-                # print(f"Send `{msg}` to topic `{topic}`")
-            else:
-                print(f"Failed to send message to topic {topic}")
+def create_spool(topic: str):
+    """Creates the offline spool and its drainer when SPOOL_DIR is configured"""
+    if not config.SPOOL_DIR:
+        return None, None
+    spool = OfflineSpool(config.SPOOL_DIR, config.SPOOL_SEGMENT_SIZE, config.SPOOL_MAX_SIZE)
+    drainer = SpoolDrainer(spool, topic, config.SPOOL_DRAIN_RATE, config.MQTT_QOS)
+    return spool, drainer
 
 
 def run():
+    # Prepare offline spool
+    spool, drainer = create_spool(config.MQTT_TOPIC)
     # Prepare mqtt client
-    client = connect_mqtt(config.MQTT_BROKER_HOST, config.MQTT_BROKER_PORT)
-    # Prepare datasource
-    datasource = FileDatasource("data/accelerometer.csv", "data/gps.csv", "data/humidex.csv", "data/anemometer.csv")
+    client = connect_mqtt(
+        config.MQTT_BROKER_HOST, config.MQTT_BROKER_PORT, drainer, config.INFLIGHT_WINDOW, config.MQTT_MAX_QUEUED
+    )
+    # Prepare datasource, the fleet always shares preloaded data
+    fleet_mode = config.FLEET_SIZE > 1
+    sample_rates = (
+        config.ACCELEROMETER_SAMPLE_RATE, config.GPS_SAMPLE_RATE, config.HUMIDEX_SAMPLE_RATE, config.ANEMOMETER_SAMPLE_RATE
+    ) if config.TIME_ALIGNED else None
+    datasource = FileDatasource(
+        *(f"{config.DATA_DIR}/{name}.{config.DATA_FORMAT}" for name in ("accelerometer", "gps", "humidex", "anemometer")),
+        preload=config.PRELOAD or fleet_mode, sample_rates=sample_rates
+    )
     # Infinity publish data
-    publish(client, config.MQTT_TOPIC, datasource, config.DELAY, config.BATCH_SIZE)
+    if fleet_mode:
+        # RATE is the target for the whole fleet, every vehicle sends one batch per delay
+        delay = config.FLEET_SIZE * config.BATCH_SIZE / config.RATE if config.RATE else config.DELAY
+        publish_fleet(client, config.MQTT_TOPIC, datasource, config.FLEET_SIZE, delay, config.BATCH_SIZE, spool)
+    elif config.RATE:
+        publish_at_rate(client, config.MQTT_TOPIC, datasource, config.RATE, config.BATCH_SIZE, spool)
+    else:
+        publish(client, config.MQTT_TOPIC, datasource, config.DELAY, config.BATCH_SIZE, spool)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,107 @@
+import threading
+import time
+from paho.mqtt import client as mqtt_client
+
+
+class PublishWindow:
+    """
+    Asynchronous publisher with a bounded window of unacknowledged messages.
+    publish() blocks while the window is full (backpressure) and fails with
+    MQTT_ERR_QUEUE_SIZE after timeout, the slot is released from the on_publish callback
+    when the broker acknowledges the message (PUBACK for QoS 1).
+    Messages are published with QoS 1 at least, at QoS 0 on_publish only reports the
+    socket write. While disconnected paho queues QoS > 0 messages and sends them after
+    the reconnect, so they count as in flight and publish() reports success.
+    on_connected() must be called from the client's on_connect callback.
+    publish() blocks, call it from a thread and not from an event loop.
+    Exposes the same publish(topic, payload) interface as the paho client.
+    """
+
+    def __init__(self, client: mqtt_client.Client, window_size: int, timeout: float = 5.0, report_interval: float = 10.0):
+        self.client = client
+        self.window_size = window_size
+        self.timeout = timeout
+        self.report_interval = report_interval
+        self.slots = threading.BoundedSemaphore(window_size)
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        # Acks that arrived before publish() registered the message id
+        self.early_acks = set()
+        self.published = 0
+        self.acked = 0
+        self.failed = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.report_started = time.monotonic()
+        self.report_acked = 0
+        client.max_inflight_messages_set(window_size)
+        client.on_publish = self.on_publish
+
+    def publish(self, topic: str, payload, qos: int = 1):
+        if not self.slots.acquire(timeout=self.timeout):
+            with self.lock:
+                self.failed += 1
+            return mqtt_client.MQTT_ERR_QUEUE_SIZE, None
+
+        sent = time.monotonic()
+        info = self.client.publish(topic, payload, qos=max(1, qos))
+        rc = info.rc
+        if rc == mqtt_client.MQTT_ERR_NO_CONN:
+            # Kept in the client's queue, sent and acknowledged after the reconnect
+            rc = mqtt_client.MQTT_ERR_SUCCESS
+        with self.lock:
+            if rc != mqtt_client.MQTT_ERR_SUCCESS:
+                self.failed += 1
+                self.slots.release()
+            elif info.mid in self.early_acks:
+                self.early_acks.remove(info.mid)
+                self.published += 1
+                self._acknowledge(sent)
+            else:
+                self.published += 1
+                self.in_flight[info.mid] = sent
+        self._report()
+        return rc, info.mid
+
+    def on_connected(self):
+        """Forgets unmatched acks of the previous connection, their message ids are reused"""
+        with self.lock:
+            self.early_acks.clear()
+
+    def on_publish(self, client, userdata, mid):
+        with self.lock:
+            sent = self.in_flight.pop(mid, None)
+            if sent is None:
+                self.early_acks.add(mid)
+            else:
+                self._acknowledge(sent)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "published": self.published,
+                "acked": self.acked,
+                "failed": self.failed,
+                "in_flight": len(self.in_flight),
+                "ack_latency_avg": self.latency_sum / self.acked if self.acked else 0.0,
+                "ack_latency_max": self.latency_max,
+            }
+
+    def _acknowledge(self, sent: float):
+        latency = time.monotonic() - sent
+        self.acked += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.slots.release()
+
+    def _report(self):
+        now = time.monotonic()
+        if now - self.report_started < self.report_interval:
+            return
+        stats = self.stats()
+        throughput = (stats["acked"] - self.report_acked) / (now - self.report_started)
+        print(f"Publish window: {throughput:.1f} acks/s, in flight {stats['in_flight']}/{self.window_size}, "
+              f"ack latency avg {stats['ack_latency_avg'] * 1000:.1f} ms max {stats['ack_latency_max'] * 1000:.1f} ms, "
+              f"failed {stats['failed']}")
+        self.report_started = now
+        self.report_acked = stats["acked"]
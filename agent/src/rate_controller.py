@@ -0,0 +1,58 @@
+import time
+
+
+class RateController:
+    """
+    Deadline based pacing for a target rate of records per second.
+    Deadlines are computed from the start time rather than from the previous send,
+    so time spent on serialization and publishing does not make the rate drift,
+    and rates above one batch per sleep granularity are sent in bigger chunks.
+    """
+
+    def __init__(
+        self, rate: float, max_batch: int, report_interval: float = 10.0, max_lag: float = 1.0, clock=time.monotonic, sleep=time.sleep
+    ):
+        self.rate = rate
+        self.max_batch = max_batch
+        self.report_interval = report_interval
+        # When the publisher falls behind by more than max_lag seconds the schedule is restarted
+        # instead of bursting to catch up
+        self.max_lag = max_lag
+        self.clock = clock
+        self.sleep = sleep
+        self.started = clock()
+        self.scheduled = 0
+        self.sent = 0
+        self.skipped = 0
+        self.report_started = self.started
+        self.report_sent = 0
+
+    def acquire(self) -> int:
+        """Blocks until records are due and returns how many to send now, at most max_batch"""
+        now = self.clock()
+        due = int((now - self.started) * self.rate) - self.scheduled
+
+        if due <= 0:
+            self.sleep((self.scheduled + 1) / self.rate - (now - self.started))
+            due = 1
+        elif due > max(1, self.rate * self.max_lag):
+            # One record is sent now, the rest of the backlog is never sent
+            self.skipped += due - 1
+            self.started = now
+            self.scheduled = 0
+            due = 1
+
+        count = min(due, self.max_batch)
+        self.scheduled += count
+        return count
+
+    def done(self, count: int):
+        """Records that count records were actually sent and prints the achieved rate periodically"""
+        self.sent += count
+        now = self.clock()
+        if now - self.report_started >= self.report_interval:
+            achieved = (self.sent - self.report_sent) / (now - self.report_started)
+            print(f"Rate: achieved {achieved:.1f} records/s, target {self.rate:.1f} records/s, "
+                  f"skipped {self.skipped} records while behind schedule")
+            self.report_started = now
+            self.report_sent = self.sent
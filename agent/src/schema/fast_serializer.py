@@ -0,0 +1,47 @@
+from marshmallow import Schema, fields
+
+_SPECIAL_FLOATS = {"nan": "NaN", "inf": "Infinity", "-inf": "-Infinity"}
+
+
+def _float(value) -> str:
+    # Same text as json.dumps produces for floats
+    text = float.__repr__(float(value))
+    return text if text[-1].isdigit() else _SPECIAL_FLOATS[text]
+
+
+def _field_expression(field: fields.Field, accessor: str) -> str:
+    if isinstance(field, fields.Nested):
+        return _schema_expression(field.schema, accessor)
+    if isinstance(field, fields.Integer):
+        return f"{{int({accessor})}}"
+    if isinstance(field, fields.Number):
+        return f"{{_float({accessor})}}"
+    if isinstance(field, fields.DateTime) and field.format == "iso":
+        return f'"{{{accessor}.isoformat()}}"'
+    raise TypeError(f"Field {field!r} is not supported by the compiled serializer")
+
+
+def _schema_expression(schema: Schema, accessor: str) -> str:
+    items = [
+        f'"{field.data_key or name}": ' + _field_expression(field, f"{accessor}.{field.attribute or name}")
+        for name, field in schema.dump_fields.items()
+    ]
+    return "{{" + ", ".join(items) + "}}"
+
+
+def compile_serializer(schema: Schema):
+    """
+    Generates a function that serializes an object to the same JSON text as schema.dumps(obj).
+    The nested field tree is walked once here, the generated function is a single f-string,
+    so no schema instances or intermediate dicts are created per message.
+    Supported fields are Nested, Integer, Number/Float and DateTime("iso"); None values are not supported.
+    """
+    source = f"def dumps(obj):\n    return f'{_schema_expression(schema, 'obj')}'\n"
+    namespace = {"_float": _float}
+    exec(compile(source, f"<compiled {type(schema).__name__}>", "exec"), namespace)
+    return namespace["dumps"]
+
+
+def dumps_many(dumps, batch) -> str:
+    """Same output as schema.dumps(batch, many=True)"""
+    return "[" + ", ".join([dumps(obj) for obj in batch]) + "]"
@@ -0,0 +1,224 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import deque
+
+
+class SpoolSegment:
+    """Fixed size memory-mapped file with length-prefixed records"""
+    # read offset, write offset
+    HEADER = struct.Struct("<II")
+    RECORD_HEADER = struct.Struct("<I")
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        exists = os.path.exists(path)
+        self.file = open(path, "r+b" if exists else "w+b")
+        if not exists:
+            self.file.truncate(size)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.size = len(self.map)
+        self.read_offset, self.write_offset = SpoolSegment.HEADER.unpack_from(self.map, 0)
+        if self.write_offset == 0:
+            self.read_offset = self.write_offset = SpoolSegment.HEADER.size
+            self._write_header()
+
+    def append(self, payload: bytes) -> bool:
+        end = self.write_offset + SpoolSegment.RECORD_HEADER.size + len(payload)
+        if end > self.size:
+            return False
+        SpoolSegment.RECORD_HEADER.pack_into(self.map, self.write_offset, len(payload))
+        self.map[self.write_offset + SpoolSegment.RECORD_HEADER.size:end] = payload
+        self.write_offset = end
+        self._write_header()
+        return True
+
+    def peek(self):
+        if self.read_offset >= self.write_offset:
+            return None
+        (length,) = SpoolSegment.RECORD_HEADER.unpack_from(self.map, self.read_offset)
+        start = self.read_offset + SpoolSegment.RECORD_HEADER.size
+        return self.map[start:start + length]
+
+    def commit(self, payload: bytes):
+        self.read_offset += SpoolSegment.RECORD_HEADER.size + len(payload)
+        self._write_header()
+
+    def pending_bytes(self) -> int:
+        return self.write_offset - self.read_offset
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+    def delete(self):
+        self.map.close()
+        self.file.close()
+        os.remove(self.path)
+
+    def _write_header(self):
+        SpoolSegment.HEADER.pack_into(self.map, 0, self.read_offset, self.write_offset)
+
+
+class OfflineSpool:
+    """
+    Bounded on-disk ring buffer for MQTT payloads that could not be published.
+    Payloads are appended to memory-mapped segment files in the spool directory,
+    when the size cap is reached the oldest segment is dropped. The spool survives
+    agent restarts, segments left in the directory are replayed first.
+    A payload can carry its own topic, it is stored in front of the payload behind a zero
+    byte that no JSON or binary message starts with.
+    """
+    TOPIC_HEADER = struct.Struct("<BH")
+    # Called after a payload was appended, set by SpoolDrainer
+    on_append = None
+
+    def __init__(self, directory: str, segment_size: int, max_size: int):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max(2, max_size // segment_size)
+        self.lock = threading.Lock()
+        self.dropped_segments = 0
+        self.peeked_segment = None
+        os.makedirs(directory, exist_ok=True)
+        names = sorted(name for name in os.listdir(directory) if name.endswith(".seg"))
+        self.segments = deque(SpoolSegment(os.path.join(directory, name), segment_size) for name in names)
+        self.next_sequence = int(names[-1].split(".")[0]) + 1 if names else 0
+        # The cap may have been lowered since the segments were written
+        while len(self.segments) > self.max_segments:
+            self.segments.popleft().delete()
+            self.dropped_segments += 1
+        if self.dropped_segments:
+            print(f"Offline spool is over its size cap, dropped the {self.dropped_segments} oldest segments")
+        if not self.segments:
+            self._add_segment()
+
+    def append(self, payload, topic: str = None):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        if topic is not None:
+            topic = topic.encode("utf-8")
+            payload = OfflineSpool.TOPIC_HEADER.pack(0, len(topic)) + topic + payload
+        with self.lock:
+            if not self.segments[-1].append(payload):
+                if SpoolSegment.HEADER.size + SpoolSegment.RECORD_HEADER.size + len(payload) > self.segment_size:
+                    print(f"Message of {len(payload)} bytes does not fit into a spool segment, dropped")
+                    return
+                self._add_segment()
+                if len(self.segments) > self.max_segments:
+                    self.segments.popleft().delete()
+                    self.dropped_segments += 1
+                    print(f"Offline spool is full, dropped the oldest segment ({self.dropped_segments} in total)")
+                self.segments[-1].append(payload)
+        if self.on_append:
+            self.on_append()
+
+    def peek(self):
+        """Returns the oldest payload without removing it, None when the spool is empty"""
+        with self.lock:
+            while True:
+                self.peeked_segment = self.segments[0]
+                payload = self.peeked_segment.peek()
+                if payload is not None or len(self.segments) == 1:
+                    return payload
+                self.segments.popleft().delete()
+
+    def commit(self, payload: bytes):
+        """Removes the payload returned by peek after it was sent"""
+        with self.lock:
+            # The segment may have been dropped by append in the meantime
+            if self.segments[0] is self.peeked_segment:
+                self.segments[0].commit(payload)
+
+    def pending_bytes(self) -> int:
+        with self.lock:
+            return sum(segment.pending_bytes() for segment in self.segments)
+
+    @staticmethod
+    def split_topic(record, default_topic: str):
+        """Splits a record returned by peek into (topic, payload)"""
+        if record[:1] != b"\x00":
+            return default_topic, record
+        _, length = OfflineSpool.TOPIC_HEADER.unpack_from(record)
+        start = OfflineSpool.TOPIC_HEADER.size
+        return bytes(record[start:start + length]).decode("utf-8"), record[start + length:]
+
+    def close(self):
+        with self.lock:
+            for segment in self.segments:
+                segment.close()
+
+    def _add_segment(self):
+        if self.segments:
+            self.segments[-1].map.flush()
+        path = os.path.join(self.directory, f"{self.next_sequence:012d}.seg")
+        self.next_sequence += 1
+        self.segments.append(SpoolSegment(path, self.segment_size))
+
+
+class SpoolDrainer:
+    """
+    Republishes spooled payloads at a limited rate while the MQTT connection is up,
+    so a reconnecting fleet does not flood the broker. The drainer keeps running and
+    is woken whenever a payload is spooled, also while the connection stays up.
+    Payloads go through the publisher passed to on_connected (the client or its
+    PublishWindow) with the configured QoS. New messages are published directly
+    while the spool drains, so they can overtake older spooled ones.
+    """
+
+    def __init__(self, spool: OfflineSpool, topic: str, rate: float, qos: int = 0, retry_interval: float = 1.0):
+        self.spool = spool
+        self.topic = topic
+        self.rate = rate
+        self.qos = qos
+        self.retry_interval = retry_interval
+        self.publisher = None
+        self.connected = threading.Event()
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.thread = None
+        spool.on_append = self.wakeup.set
+
+    def on_connected(self, publisher):
+        """publisher is anything with publish(topic, payload, qos), the paho client or a PublishWindow"""
+        self.publisher = publisher
+        self.connected.set()
+        self.wakeup.set()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._drain, name="spool-drainer", daemon=True)
+            self.thread.start()
+
+    def on_disconnected(self):
+        self.connected.clear()
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _drain(self):
+        sent = 0
+        deadline = time.monotonic()
+        while not self.closed:
+            # Cleared before looking, so a payload spooled meanwhile wakes the next wait
+            self.wakeup.clear()
+            record = self.spool.peek() if self.connected.is_set() else None
+            if record is None:
+                if sent:
+                    print(f"Republished {sent} spooled messages, {self.spool.pending_bytes()} bytes left in the spool")
+                    sent = 0
+                self.wakeup.wait()
+                deadline = time.monotonic()
+                continue
+            topic, payload = OfflineSpool.split_topic(record, self.topic)
+            if self.publisher.publish(topic, payload, qos=self.qos)[0] != 0:
+                time.sleep(self.retry_interval)
+                continue
+            self.spool.commit(record)
+            sent += 1
+            deadline += 1 / self.rate
+            time.sleep(max(0.0, deadline - time.monotonic()))
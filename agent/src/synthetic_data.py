@@ -0,0 +1,167 @@
+"""
+Generator of large synthetic drives for replay benchmarks.
+
+Statistical profiles are fitted to the recorded CSV files, then an arbitrary number of
+samples is generated chunk by chunk into NumPy .npy files, which FileDatasource replays
+through memory maps without loading them into RAM. Potholes and bumps are injected into
+the accelerometer signal at known positions and saved to anomalies.npy as ground truth.
+
+Usage: python synthetic_data.py --output data/synthetic --samples 10000000 --seed 1
+"""
+import argparse
+import csv
+import os
+from dataclasses import fields
+import numpy as np
+from domain.accelerometer import Accelerometer
+from domain.anemometer import Anemometer
+from domain.gps import Gps
+from domain.humidex import Humidex
+
+SENSORS = {
+    "accelerometer": Accelerometer,
+    "gps": Gps,
+    "humidex": Humidex,
+    "anemometer": Anemometer,
+}
+ANOMALY_DTYPE = np.dtype([("index", np.int64), ("kind", np.uint8), ("amplitude", np.float64)])
+POTHOLE = 1
+BUMP = 2
+# Accelerometer values of a calm road, potholes and bumps are classified outside this range
+CALM_Z_RANGE = (15000, 17000)
+# Number of samples between the knots of the slowly changing signals
+SMOOTH_PERIOD = 50
+
+
+def record_dtype(domain_type: type) -> np.dtype:
+    return np.dtype([(field.name, np.int32 if field.type is int else np.float64) for field in fields(domain_type)])
+
+
+def _load_csv(filename: str) -> dict:
+    with open(filename, "r") as file:
+        rows = [row for row in csv.DictReader(file) if row]
+    return {name: np.array([float(row[name]) for row in rows]) for name in rows[0]}
+
+
+def fit_profile(data_dir: str) -> dict:
+    """Fits the statistics used by the generator to the recorded CSV files"""
+    accelerometer = _load_csv(os.path.join(data_dir, "accelerometer.csv"))
+    gps = _load_csv(os.path.join(data_dir, "gps.csv"))
+    humidex = _load_csv(os.path.join(data_dir, "humidex.csv"))
+    anemometer = _load_csv(os.path.join(data_dir, "anemometer.csv"))
+
+    calm = (accelerometer["z"] >= CALM_Z_RANGE[0]) & (accelerometer["z"] <= CALM_Z_RANGE[1])
+    steps = np.hypot(np.diff(gps["latitude"]), np.diff(gps["longitude"]))
+    return {
+        "accelerometer": {name: (float(np.median(values[calm])), float(np.std(values[calm]))) for name, values in accelerometer.items()},
+        "gps_start": (float(gps["latitude"][0]), float(gps["longitude"][0])),
+        "gps_step": (float(steps.mean()), float(steps.std())),
+        "humidex": {name: (float(values.mean()), float(values.std())) for name, values in humidex.items()},
+        "anemometer_speed": (float(anemometer["speed"].mean()), float(anemometer["speed"].std()), float(anemometer["speed"].max())),
+    }
+
+
+def _smooth_noise(knots: np.ndarray, start: int, count: int) -> np.ndarray:
+    """Linearly interpolates precomputed knots, one every SMOOTH_PERIOD samples"""
+    positions = np.arange(start, start + count) / SMOOTH_PERIOD
+    return np.interp(positions, np.arange(len(knots)), knots)
+
+
+def _anomalies(rng: np.random.Generator, samples: int, anomaly_rate: float) -> np.ndarray:
+    count = rng.binomial(samples, anomaly_rate)
+    # Keep anomalies apart so the detector windows do not overlap
+    indices = np.unique(rng.integers(100, max(101, samples - 100), count) // 100 * 100)
+    anomalies = np.empty(len(indices), dtype=ANOMALY_DTYPE)
+    anomalies["index"] = indices
+    anomalies["kind"] = rng.choice([POTHOLE, BUMP], len(indices))
+    # Drawn once per anomaly, one crossing a chunk boundary keeps its shape
+    potholes = anomalies["kind"] == POTHOLE
+    anomalies["amplitude"] = np.where(
+        potholes, -rng.uniform(3000, 12000, len(indices)), rng.uniform(2000, 6000, len(indices))
+    )
+    return anomalies
+
+
+def _anomaly_signal(anomalies: np.ndarray, start: int, count: int) -> np.ndarray:
+    """Half sine dips for potholes and rises for bumps centered on the anomaly index"""
+    signal = np.zeros(count)
+    first, last = np.searchsorted(anomalies["index"], [start - 40, start + count + 40])
+    for index, kind, amplitude in anomalies[first:last]:
+        width = 30 if kind == POTHOLE else 24
+        positions = np.arange(index - width // 2, index + width // 2)
+        shape = amplitude * np.sin(np.pi * (positions - positions[0] + 0.5) / width)
+        inside = (positions >= start) & (positions < start + count)
+        signal[positions[inside] - start] += shape[inside]
+    return signal
+
+
+def generate(output_dir: str, samples: int, seed: int, profile: dict, anomaly_rate: float = 0.001,
+             chunk_size: int = 1_000_000):
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = {
+        name: np.lib.format.open_memmap(os.path.join(output_dir, f"{name}.npy"), mode="w+",
+                                        dtype=record_dtype(domain_type), shape=(samples,))
+        for name, domain_type in SENSORS.items()
+    }
+    anomalies = _anomalies(rng, samples, anomaly_rate)
+    np.save(os.path.join(output_dir, "anomalies.npy"), anomalies)
+
+    knot_count = samples // SMOOTH_PERIOD + 2
+    heading_knots = np.cumsum(rng.normal(0.0, 0.3, knot_count))
+    temperature_knots = rng.normal(*profile["humidex"]["temperature"], knot_count)
+    humidity_knots = np.clip(rng.normal(*profile["humidex"]["humidity"], knot_count), 0, 100)
+    speed_mean, speed_std, speed_max = profile["anemometer_speed"]
+    speed_knots = np.clip(rng.normal(speed_mean, speed_std, knot_count), 0, speed_max)
+    direction_knots = np.cumsum(rng.normal(0.0, 30.0, knot_count)) + rng.uniform(0, 360)
+    # Every per-sample signal draws from its own generator, so the output does not depend on chunk_size
+    noise = dict(zip(("x", "y", "z", "gps_step"), rng.spawn(4)))
+
+    latitude, longitude = profile["gps_start"]
+    for start in range(0, samples, chunk_size):
+        count = min(chunk_size, samples - start)
+        end = start + count
+
+        accelerometer = outputs["accelerometer"]
+        for name in ("x", "y", "z"):
+            median, std = profile["accelerometer"][name]
+            values = noise[name].normal(median, std, count)
+            if name == "z":
+                values += _anomaly_signal(anomalies, start, count)
+            accelerometer[name][start:end] = np.round(values)
+
+        heading = _smooth_noise(heading_knots, start, count)
+        steps = np.abs(noise["gps_step"].normal(*profile["gps_step"], count))
+        # Accumulated from the previous position one step at a time, like a single chunk would be
+        latitudes = np.cumsum(np.concatenate(([latitude], steps * np.cos(heading))))[1:]
+        longitudes = np.cumsum(np.concatenate(([longitude], steps * np.sin(heading) / np.cos(np.radians(latitudes)))))[1:]
+        outputs["gps"]["latitude"][start:end] = latitudes
+        outputs["gps"]["longitude"][start:end] = longitudes
+        latitude, longitude = latitudes[-1], longitudes[-1]
+
+        outputs["humidex"]["temperature"][start:end] = _smooth_noise(temperature_knots, start, count)
+        outputs["humidex"]["humidity"][start:end] = _smooth_noise(humidity_knots, start, count)
+        outputs["anemometer"]["speed"][start:end] = _smooth_noise(speed_knots, start, count)
+        outputs["anemometer"]["direction"][start:end] = _smooth_noise(direction_knots, start, count) % 360
+
+    for output in outputs.values():
+        output.flush()
+    return anomalies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic drive for replay benchmarks")
+    parser.add_argument("--output", default="data/synthetic", help="output directory for the .npy files")
+    parser.add_argument("--samples", type=int, default=1_000_000, help="number of samples per sensor")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--anomaly-rate", type=float, default=0.001, help="potholes and bumps per sample")
+    parser.add_argument("--profile-data", default="data", help="directory with the CSV files to fit the profile to")
+    args = parser.parse_args()
+
+    profile = fit_profile(args.profile_data)
+    anomalies = generate(args.output, args.samples, args.seed, profile, args.anomaly_rate)
+    print(f"Generated {args.samples} samples with {len(anomalies)} anomalies into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
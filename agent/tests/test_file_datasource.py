@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from file_datasource import FileDatasource
+
+
+def write_csv(path: str, header: str, rows: list[str]):
+    with open(path, "w") as file:
+        file.write("\n".join([header] + rows) + "\n")
+
+
+class TestTimeAlignedDatasource(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = self.directory.name
+        # 100 s of the other sensors at 1 Hz, GPS at 0.1 Hz with rows at latitude 0, 10, 20 ... 80
+        write_csv(os.path.join(path, "accelerometer.csv"), "x,y,z", [f"{i},0,16500" for i in range(100)])
+        write_csv(os.path.join(path, "gps.csv"), "latitude,longitude", [f"{i * 10}.0,30.0" for i in range(9)])
+        write_csv(os.path.join(path, "humidex.csv"), "temperature,humidity", ["20.0,50.0"] * 100)
+        write_csv(os.path.join(path, "anemometer.csv"), "speed,direction", ["5.0,90.0"] * 100)
+        self.datasource = FileDatasource(
+            *(os.path.join(path, f"{name}.csv") for name in ("accelerometer", "gps", "humidex", "anemometer")),
+            sample_rates=(1.0, 0.1, 1.0, 1.0),
+        )
+        self.datasource.startReading()
+
+    def tearDown(self):
+        self.datasource.stopReading()
+        self.directory.cleanup()
+
+    def latitudes(self, position: int, count: int) -> list[float]:
+        return [data.gps.latitude for data in self.datasource.read_at(position, count, user_id=1)]
+
+    def test_samples_on_a_row_are_not_rounded_down(self):
+        latitudes = self.latitudes(0, 90)
+        self.assertEqual(latitudes[::10], [float(row * 10) for row in range(9)])
+        for second in range(90):
+            self.assertAlmostEqual(latitudes[second], min(second, 80))
+
+    def test_last_row_is_held_and_the_loop_ends_with_the_shortest_recording(self):
+        # 9 GPS rows cover 90 s, the last one is held instead of interpolating towards the first
+        self.assertEqual(self.datasource.length, 90)
+        latitudes = self.latitudes(80, 12)
+        self.assertEqual(latitudes[:10], [80.0] * 10)
+        self.assertEqual(latitudes[10:], [0.0, 1.0])
+        accelerometer_x = [data.accelerometer.x for data in self.datasource.read_at(88, 4, user_id=1)]
+        self.assertEqual(accelerometer_x, [88, 89, 0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
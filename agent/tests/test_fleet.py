@@ -0,0 +1,44 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from fleet import Vehicle, drive
+
+
+class FakeDatasource:
+    def read_at(self, position, count, user_id, gps_jitter, rng):
+        return [(user_id, position + i) for i in range(count)]
+
+
+class TestFleet(unittest.TestCase):
+    def test_blocking_send_does_not_stall_the_loop(self):
+        release = threading.Event()
+        sent = []
+
+        def send_batch(batch):
+            # Like a full PublishWindow waiting for acks
+            release.wait(2)
+            sent.append(batch)
+
+        async def scenario():
+            task = asyncio.create_task(drive(Vehicle(1, 0, 0.0, seed=0), FakeDatasource(), 0.01, 2, send_batch))
+            started = time.monotonic()
+            await asyncio.sleep(0.1)
+            elapsed = time.monotonic() - started
+            release.set()
+            await asyncio.sleep(0.05)
+            task.cancel()
+            return elapsed
+
+        elapsed = asyncio.run(scenario())
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(sent[0], [(1, 0), (1, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
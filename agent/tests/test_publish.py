@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from paho.mqtt import client as mqtt_client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import config
+from domain.accelerometer import Accelerometer
+from domain.aggregated_data import AggregatedData
+from domain.anemometer import Anemometer
+from domain.gps import Gps
+from domain.humidex import Humidex
+from main import publish_batch
+from spool import OfflineSpool
+
+
+class FakeClient:
+    def __init__(self, rc):
+        self.rc = rc
+        self.published = []
+
+    def publish(self, topic, payload, qos=0):
+        self.published.append((topic, payload, qos))
+        return self.rc, len(self.published)
+
+
+def make_batch(size: int) -> list[AggregatedData]:
+    return [
+        AggregatedData(Accelerometer(0, 0, 16500), Gps(50.0, 30.0), Humidex(25.0, 50.0), Anemometer(5.0, 90.0),
+                       datetime(2024, 1, 1), 1)
+        for _ in range(size)
+    ]
+
+
+class TestPublishBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.spool = OfflineSpool(self.directory.name, segment_size=4096, max_size=16384)
+
+    def tearDown(self):
+        self.spool.close()
+        self.directory.cleanup()
+
+    def spooled(self) -> int:
+        count = 0
+        while (record := self.spool.peek()) is not None:
+            self.spool.commit(record)
+            count += 1
+        return count
+
+    def publish(self, rc, qos: int) -> FakeClient:
+        client = FakeClient(rc)
+        with patch.object(config, "MQTT_QOS", qos), patch.object(config, "BATCH_ENVELOPE", False):
+            publish_batch(client, "agent", make_batch(3), self.spool)
+        return client
+
+    def test_messages_queued_by_paho_are_not_spooled(self):
+        # paho keeps QoS 1 messages while disconnected, spooling them would deliver them twice
+        self.assertEqual(len(self.publish(mqtt_client.MQTT_ERR_NO_CONN, qos=1).published), 3)
+        self.assertEqual(self.spooled(), 0)
+
+    def test_messages_paho_does_not_keep_are_spooled(self):
+        self.publish(mqtt_client.MQTT_ERR_NO_CONN, qos=0)
+        self.assertEqual(self.spooled(), 3)
+        # Rejected once paho's queue is full
+        self.publish(mqtt_client.MQTT_ERR_QUEUE_SIZE, qos=1)
+        self.assertEqual(self.spooled(), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
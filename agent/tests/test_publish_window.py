@@ -0,0 +1,83 @@
+import itertools
+import os
+import sys
+import unittest
+from paho.mqtt import client as mqtt_client
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from publish_window import PublishWindow
+
+
+class FakeClient:
+    """Stands in for the paho client, acks are delivered by calling the window's on_publish"""
+
+    def __init__(self, rc=mqtt_client.MQTT_ERR_SUCCESS):
+        self.rc = rc
+        self.mids = itertools.count(1)
+        self.published = []
+        self.on_publish = None
+
+    def max_inflight_messages_set(self, inflight):
+        self.max_inflight = inflight
+
+    def publish(self, topic, payload, qos=0):
+        self.published.append((topic, payload, qos))
+        info = mqtt_client.MQTTMessageInfo(next(self.mids))
+        info.rc = self.rc
+        return info
+
+
+class TestPublishWindow(unittest.TestCase):
+    def test_full_window_blocks_until_acked(self):
+        client = FakeClient()
+        window = PublishWindow(client, window_size=2, timeout=0.05)
+        self.assertEqual(window.publish("agent", b"1"), (mqtt_client.MQTT_ERR_SUCCESS, 1))
+        window.publish("agent", b"2")
+        self.assertEqual(window.publish("agent", b"3"), (mqtt_client.MQTT_ERR_QUEUE_SIZE, None))
+
+        client.on_publish(client, None, 1)
+        self.assertEqual(window.publish("agent", b"3"), (mqtt_client.MQTT_ERR_SUCCESS, 3))
+        self.assertEqual({key: window.stats()[key] for key in ("published", "acked", "failed", "in_flight")},
+                         {"published": 3, "acked": 1, "failed": 1, "in_flight": 2})
+
+    def test_messages_are_published_with_qos_1_at_least(self):
+        client = FakeClient()
+        window = PublishWindow(client, window_size=2)
+        window.publish("agent", b"1", qos=0)
+        window.publish("agent", b"2", qos=2)
+        self.assertEqual([qos for _, _, qos in client.published], [1, 2])
+
+    def test_messages_queued_while_disconnected_are_in_flight(self):
+        client = FakeClient(rc=mqtt_client.MQTT_ERR_NO_CONN)
+        window = PublishWindow(client, window_size=1, timeout=0.05)
+        self.assertEqual(window.publish("agent", b"1"), (mqtt_client.MQTT_ERR_SUCCESS, 1))
+        self.assertEqual(window.stats()["in_flight"], 1)
+
+        # Acknowledged after the reconnect
+        client.on_publish(client, None, 1)
+        self.assertEqual(window.stats()["acked"], 1)
+        self.assertEqual(window.publish("agent", b"2")[0], mqtt_client.MQTT_ERR_SUCCESS)
+
+    def test_rejected_messages_release_their_slot(self):
+        client = FakeClient(rc=mqtt_client.MQTT_ERR_QUEUE_SIZE)
+        window = PublishWindow(client, window_size=1, timeout=0.05)
+        for _ in range(2):
+            self.assertEqual(window.publish("agent", b"1")[0], mqtt_client.MQTT_ERR_QUEUE_SIZE)
+        self.assertEqual(window.stats()["failed"], 2)
+        self.assertEqual(window.stats()["in_flight"], 0)
+
+    def test_early_acks_are_forgotten_on_reconnect(self):
+        client = FakeClient()
+        window = PublishWindow(client, window_size=2)
+        # Ack of a message id of the previous connection that was never registered
+        client.on_publish(client, None, 1)
+        window.on_connected()
+
+        window.publish("agent", b"1")
+        self.assertEqual(window.stats()["acked"], 0)
+        self.assertEqual(window.stats()["in_flight"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from rate_controller import RateController
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the controller sleeps or the test advances it"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += max(0.0, seconds)
+
+
+class TestRateController(unittest.TestCase):
+    def controller(self, rate: float, max_batch: int = 100) -> tuple[RateController, FakeClock]:
+        clock = FakeClock()
+        return RateController(rate, max_batch, report_interval=1e9, clock=clock, sleep=clock.sleep), clock
+
+    def test_records_are_paced_at_the_rate(self):
+        controller, clock = self.controller(rate=10.0)
+        self.assertEqual([controller.acquire() for _ in range(10)], [1] * 10)
+        self.assertAlmostEqual(clock.now, 1.0)
+        self.assertEqual(controller.skipped, 0)
+
+    def test_small_lag_is_caught_up_in_bigger_chunks(self):
+        controller, clock = self.controller(rate=10.0, max_batch=3)
+        controller.acquire()
+        clock.now += 0.5
+        self.assertEqual([controller.acquire(), controller.acquire()], [3, 2])
+        self.assertEqual(controller.skipped, 0)
+
+    def test_large_lag_restarts_the_schedule(self):
+        controller, clock = self.controller(rate=10.0)
+        controller.acquire()
+        clock.now += 3.0
+        self.assertEqual(controller.acquire(), 1)
+        # 30 records were due, one of them is sent
+        self.assertEqual(controller.skipped, 29)
+        self.assertEqual(controller.acquire(), 1)
+        self.assertEqual(controller.skipped, 29)
+
+    def test_rates_below_one_record_per_max_lag_do_not_skip(self):
+        controller, clock = self.controller(rate=0.5)
+        for _ in range(5):
+            # Publishing takes a little longer than the 2 s between records
+            clock.now += 2.1
+            self.assertEqual(controller.acquire(), 1)
+        self.assertEqual(controller.skipped, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from spool import OfflineSpool, SpoolDrainer
+
+
+def drain_all(spool: OfflineSpool) -> list[bytes]:
+    payloads = []
+    while True:
+        record = spool.peek()
+        if record is None:
+            return payloads
+        payloads.append(bytes(record))
+        spool.commit(record)
+
+
+class FakePublisher:
+    """Records what the drainer publishes, fails while `failing` is set"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.published = []
+        self.failing = False
+
+    def publish(self, topic, payload, qos=0):
+        with self.lock:
+            if self.failing:
+                return 4, None
+            self.published.append((topic, bytes(payload), qos))
+            return 0, len(self.published)
+
+    def wait_for(self, count: int, timeout: float = 2.0) -> list:
+        deadline = time.monotonic() + timeout
+        while len(self.published) < count and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return self.published
+
+
+class TestOfflineSpool(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_oldest_segment_is_dropped_when_full(self):
+        # Segments of 64 bytes hold 3 messages of 12 bytes, at most 2 segments are kept
+        spool = OfflineSpool(self.path, segment_size=64, max_size=128)
+        for i in range(10):
+            spool.append(b"message %03d" % i)
+        self.assertEqual(spool.dropped_segments, 2)
+        self.assertEqual(drain_all(spool), [b"message %03d" % i for i in range(6, 10)])
+        spool.close()
+
+    def test_restart_resumes_at_the_read_position(self):
+        spool = OfflineSpool(self.path, segment_size=64, max_size=1024)
+        for i in range(5):
+            spool.append(b"message %03d" % i)
+        spool.commit(spool.peek())
+        spool.close()
+
+        spool = OfflineSpool(self.path, segment_size=64, max_size=1024)
+        self.assertEqual(drain_all(spool), [b"message %03d" % i for i in range(1, 5)])
+        spool.close()
+
+    def test_segments_over_a_lowered_cap_are_dropped_on_start(self):
+        spool = OfflineSpool(self.path, segment_size=64, max_size=1024)
+        for i in range(12):
+            spool.append(b"message %03d" % i)
+        spool.close()
+
+        spool = OfflineSpool(self.path, segment_size=64, max_size=128)
+        self.assertEqual(spool.dropped_segments, 2)
+        self.assertEqual(len(os.listdir(self.path)), 2)
+        self.assertEqual(drain_all(spool), [b"message %03d" % i for i in range(6, 12)])
+        spool.close()
+
+
+class TestSpoolDrainer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.spool = OfflineSpool(self.directory.name, segment_size=1024, max_size=4096)
+        self.drainer = SpoolDrainer(self.spool, "agent", rate=1000, qos=1, retry_interval=0.01)
+        self.publisher = FakePublisher()
+
+    def tearDown(self):
+        self.drainer.close()
+        self.spool.close()
+        self.directory.cleanup()
+
+    def test_replays_with_the_configured_qos_and_topic(self):
+        self.spool.append(b"before connect")
+        self.drainer.on_connected(self.publisher)
+        self.assertEqual(self.publisher.wait_for(1), [("agent", b"before connect", 1)])
+
+        # Spooled later on the same connection, e.g. a publish that failed
+        self.spool.append(b"partitioned", topic="agent/3")
+        self.assertEqual(self.publisher.wait_for(2)[1], ("agent/3", b"partitioned", 1))
+        self.assertIsNone(self.spool.peek())
+
+    def test_waits_for_the_connection_and_retries_failed_publishes(self):
+        self.drainer.on_connected(self.publisher)
+        self.drainer.on_disconnected()
+        self.spool.append(b"while disconnected")
+        time.sleep(0.05)
+        self.assertEqual(self.publisher.published, [])
+
+        self.publisher.failing = True
+        self.drainer.on_connected(self.publisher)
+        time.sleep(0.05)
+        self.publisher.failing = False
+        self.assertEqual(self.publisher.wait_for(1), [("agent", b"while disconnected", 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
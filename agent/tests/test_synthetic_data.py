@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from synthetic_data import POTHOLE, SENSORS, generate
+
+PROFILE = {
+    "accelerometer": {"x": (0.0, 50.0), "y": (0.0, 50.0), "z": (16500.0, 100.0)},
+    "gps_start": (50.45, 30.52),
+    "gps_step": (1e-5, 2e-6),
+    "humidex": {"temperature": (20.0, 5.0), "humidity": (50.0, 10.0)},
+    "anemometer_speed": (5.0, 2.0, 15.0),
+}
+
+
+class TestSyntheticData(unittest.TestCase):
+    def test_output_does_not_depend_on_the_chunk_size(self):
+        with tempfile.TemporaryDirectory() as directory:
+            outputs = []
+            for chunk_size in (5000, 337):
+                path = os.path.join(directory, str(chunk_size))
+                anomalies = generate(path, 5000, seed=1, profile=PROFILE, anomaly_rate=0.005, chunk_size=chunk_size)
+                outputs.append({name: np.load(os.path.join(path, f"{name}.npy")) for name in SENSORS})
+            # Anomalies crossing a chunk boundary keep one amplitude
+            self.assertTrue(any((index - 15) // 337 != (index + 15) // 337 for index in anomalies["index"]))
+            for name in SENSORS:
+                self.assertTrue(np.array_equal(outputs[0][name], outputs[1][name]), name)
+
+        z = outputs[0]["accelerometer"]["z"]
+        for index, kind, amplitude in anomalies:
+            self.assertEqual(kind == POTHOLE, amplitude < 0)
+            self.assertGreater(abs(z[index] - 16500), abs(amplitude) / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,82 @@
 import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import paho.mqtt.client as mqtt
+from pydantic import TypeAdapter
 from app.interfaces.agent_gateway import AgentGateway
-from app.entities.agent_data import AgentData, GpsData
-from app.usecases.data_processing import process_agent_data_batch
+from app.entities.agent_data import AgentDataRecord
+from app.entities.agent_data_batch import AgentDataBatch
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+from app.usecases.data_reduction import TrackReducer
+from app.usecases.partitioned_batching import PartitionedBatcher
+from app.usecases.streaming_processing import StreamingAgentDataProcessor
 from app.interfaces.hub_gateway import HubGateway
+from app.adapters.wire_codec import decode_agent_data_batch, is_binary
+from app.metrics import SIZE_BUCKETS, STAGE_BUCKETS, Histogram, MetricsRegistry
+
+# Built once, validating JSON bytes into plain dicts with the compiled validators
+agent_data_record_adapter = TypeAdapter(AgentDataRecord)
+agent_data_records_adapter = TypeAdapter(list[AgentDataRecord])
+
+BACKPRESSURE_POLICIES = ("block", "drop_newest", "drop_oldest")
+# Passed through the stages to stop them in order
+_STOP = object()
+
+
+def subscription_topics(topic: str, partitions: int = 0, instances: int = 1, instance: int = 0) -> list[str]:
+    """
+    Topics one edge instance subscribes to when the agents publish every vehicle to
+    topic/{user_id % partitions}. Partition p belongs to instance p % instances, so all
+    samples of a vehicle reach the same instance and its windowed peak detection sees
+    the whole stream.
+    Parameters:
+        topic (str): Base topic of the agents.
+        partitions (int): Number of topic partitions, 0 when the agents publish to the base topic.
+        instances (int): Number of edge instances splitting the partitions.
+        instance (int): Index of this instance, from 0 to instances - 1.
+    Returns:
+        list[str]: Topics to subscribe to.
+    """
+    if not 0 <= instance < instances:
+        raise ValueError(f"Edge instance {instance} out of range for {instances} instances")
+    if not partitions:
+        if instances > 1:
+            raise ValueError("Sharding over several edge instances needs topic partitions")
+        return [topic]
+    if partitions < instances:
+        raise ValueError(f"{partitions} topic partitions cannot be split over {instances} edge instances")
+    return [f"{topic}/{partition}" for partition in range(instance, partitions, instances)]
 
 
 class AgentMQTTAdapter(AgentGateway):
+    """
+    Receives agent data over MQTT and runs it through a staged pipeline:
+        receive: the MQTT network thread only puts raw payloads into a bounded queue
+        decode: a thread pool decodes payloads in parallel, results are taken in arrival order
+        process: one thread batches the decoded data and runs the processor
+        output: one thread sends the processed data to the hub
+    Samples are batched per vehicle. A vehicle's batch is processed once it holds
+    batch_size samples or its oldest sample waited max_batch_delay seconds, whatever
+    comes first, and full vehicles take turns. The processor still holds back the last
+    samples of every vehicle until their trailing context arrives, a peak can only be
+    detected with samples on both sides, so those wait for the vehicle's next samples
+    and buffer_latency includes that wait. Idle vehicles are flushed by the processor.
+    Stopping processes the partial batches and flushes the samples the processor holds
+    back as context. An optional reducer drops processed samples the map does not need.
+    When the receive queue is full the backpressure policy either blocks the MQTT
+    thread (the broker then holds the messages) or drops the newest or the oldest message.
+    A client driven by an event loop must not block, with flow_control set the block
+    policy pauses reading the socket instead and resumes once the queue has room.
+    `topic` is one topic or a list of them, see subscription_topics for sharding.
+    published_*_total count the batches the hub gateway accepted. A gateway that delivers
+    in the background reports failed deliveries later through on_failed, when it has no
+    other handler they are logged and counted in publish_failures_total as well.
+    """
+
     def __init__(
         self,
         broker_host,
@@ -14,40 +84,323 @@ class AgentMQTTAdapter(AgentGateway):
         topic,
         hub_gateway: HubGateway,
         batch_size=100,
+        max_batch_delay=0.5,
+        processor: StreamingAgentDataProcessor = None,
+        reducer: TrackReducer = None,
+        queue_size=1000,
+        workers=None,
+        backpressure="block",
     ):
-        self.batch_size = batch_size
-        self.agent_data_list = []
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {backpressure}")
+        # Decoded samples waiting to be processed, per vehicle
+        self.batcher = PartitionedBatcher(batch_size, max_batch_delay)
+        # Time from receiving a message until its last sample is put on the output queue
+        self.buffer_latency = Histogram()
+        # [received_at, samples not emitted yet] of the messages in the processor, per vehicle
+        self.unemitted: dict[int, deque] = {}
+        # Time spent waiting for and in each stage, per message (queue, decode) or per batch
+        self.stage_latency = {stage: Histogram(STAGE_BUCKETS) for stage in ("queue", "decode", "process", "publish")}
+        self.batch_size_histogram = Histogram(SIZE_BUCKETS)
+        self.flushes = {"size": 0, "age": 0, "stop": 0}
+        self.processor = processor or StreamingAgentDataProcessor()
+        self.reducer = reducer
+        # Pipeline
+        self.backpressure = backpressure
+        self.workers = workers or os.cpu_count() or 1
+        self.received_queue = queue.Queue(maxsize=queue_size)
+        # Pauses and resumes reading the MQTT socket on the event loop, see AsyncioMqttHelper
+        self.flow_control = None
+        # Messages that arrived after the received queue was full while reading is paused
+        self.overflow = deque()
+        self.overflow_lock = threading.Lock()
+        self.decoded_queue = queue.Queue(maxsize=self.workers * 2)
+        self.output_queue = queue.Queue(maxsize=queue_size)
+        self.decode_pool = None
+        self.threads: list[threading.Thread] = []
+        self.received = 0
+        self.dropped = 0
+        self.decode_errors = 0
+        self.published_batches = 0
+        self.published_samples = 0
+        self.publish_failures = 0
+        self.failures_lock = threading.Lock()
         # MQTT
         self.broker_host = broker_host
         self.broker_port = broker_port
-        self.topic = topic
+        self.topics = [topic] if isinstance(topic, str) else list(topic)
         self.client = mqtt.Client()
         # Hub
         self.hub_gateway = hub_gateway
+        if hub_gateway.on_failed is None:
+            hub_gateway.on_failed = self._delivery_failed
 
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             logging.info("Connected to MQTT broker")
-            self.client.subscribe(self.topic)
+            self.client.subscribe([(topic, 0) for topic in self.topics])
         else:
             logging.info(f"Failed to connect to MQTT broker with code: {rc}")
 
     def on_message(self, client, userdata, msg):
-        """Processing agent data and sent it to hub gateway"""
+        """Puts the received payload into the pipeline, all the work happens in the other stages"""
+        self.received += 1
+        item = (time.monotonic(), msg.payload)
+        if self.backpressure == "block":
+            if self.flow_control is None:
+                self.received_queue.put(item)
+            else:
+                self._put_or_pause(item)
+            return
+        try:
+            self.received_queue.put_nowait(item)
+            return
+        except queue.Full:
+            self.dropped += 1
+        if self.backpressure == "drop_oldest":
+            try:
+                self.received_queue.get_nowait()
+                self.received_queue.task_done()
+            except queue.Empty:
+                pass
+            try:
+                self.received_queue.put_nowait(item)
+            except queue.Full:
+                pass
+
+    def _put_or_pause(self, item):
+        """Runs on the event loop, queues the item without blocking and pauses reading when full"""
+        with self.overflow_lock:
+            if not self.overflow:
+                try:
+                    self.received_queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    pass
+            # A read can deliver several messages, they wait here in order
+            self.overflow.append(item)
+        self.flow_control.pause_reading()
+        # The dispatch stage may have made room before the item was added
+        self._resume_reading()
+
+    def _resume_reading(self):
+        """Runs on the event loop, moves the overflow into the received queue and resumes reading once it is empty"""
+        with self.overflow_lock:
+            while self.overflow:
+                try:
+                    self.received_queue.put_nowait(self.overflow[0])
+                except queue.Full:
+                    return
+                self.overflow.popleft()
+        self.flow_control.resume_reading()
+
+    @staticmethod
+    def decode_payload(payload: bytes) -> AgentDataBatch:
+        """
+        Decodes a binary message, a JSON batch envelope (array) or a single JSON record.
+        JSON is validated straight from the bytes, an envelope with one call.
+        """
+        if is_binary(payload):
+            return decode_agent_data_batch(payload)
+        if payload[:1] == b"[" or (payload[:1].isspace() and payload.lstrip()[:1] == b"["):
+            return AgentDataBatch.from_records(agent_data_records_adapter.validate_json(payload, strict=True))
+        return AgentDataBatch.from_records([agent_data_record_adapter.validate_json(payload, strict=True)])
+
+    def _decode(self, received_at: float, payload: bytes) -> AgentDataBatch:
+        started = time.monotonic()
+        self.stage_latency["queue"].observe(started - received_at)
+        try:
+            return self.decode_payload(payload)
+        finally:
+            self.stage_latency["decode"].observe(time.monotonic() - started)
+
+    def queue_depths(self) -> dict[str, int]:
+        return {
+            "received": self.received_queue.qsize(),
+            "decoded": self.decoded_queue.qsize(),
+            "output": self.output_queue.qsize(),
+        }
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "received_total": self.received,
+            "dropped_total": self.dropped,
+            "decode_errors_total": self.decode_errors,
+            "published_batches_total": self.published_batches,
+            "published_samples_total": self.published_samples,
+            "publish_failures_total": self.publish_failures,
+            **{f"{name}_queue_depth": depth for name, depth in self.queue_depths().items()},
+            **{f"{reason}_flushes_total": count for reason, count in self.flushes.items()},
+            "buffered_samples": len(self.batcher),
+            "buffered_vehicles": len(self.batcher.partitions),
+            "tracked_vehicles": len(self.processor.streams),
+            "evicted_vehicles_total": self.processor.evicted,
+            **(self.reducer.stats() if self.reducer else {}),
+        }
+
+    def register_metrics(self, registry: MetricsRegistry):
+        """Exports the pipeline histograms and stats"""
+        registry.add_histogram(
+            "buffer_latency_seconds", "Time from receiving a message until all its samples are processed", self.buffer_latency
+        )
+        for stage, histogram in self.stage_latency.items():
+            registry.add_histogram(
+                "stage_latency_seconds", "Time spent waiting for (queue) or in a pipeline stage", histogram, stage=stage
+            )
+        registry.add_histogram("batch_size_samples", "Samples per processed batch", self.batch_size_histogram)
+        registry.add_collector(self.stats)
+
+    def _dispatch_stage(self):
+        """Submits payloads to the decode pool, the futures keep the arrival order"""
+        while True:
+            item = self.received_queue.get()
+            if item is _STOP:
+                self.decoded_queue.put(_STOP)
+                self.received_queue.task_done()
+                return
+            if self.overflow:
+                # Room for the messages that arrived while the queue was full
+                self.flow_control.loop.call_soon_threadsafe(self._resume_reading)
+            received_at, payload = item
+            self.decoded_queue.put((received_at, self.decode_pool.submit(self._decode, received_at, payload)))
+            self.received_queue.task_done()
+
+    def _process_stage(self):
+        while True:
+            deadlines = [
+                deadline
+                for deadline in (self.batcher.next_deadline(), self.processor.next_idle_deadline())
+                if deadline is not None
+            ]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            try:
+                item = self.decoded_queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush_ready()
+                continue
+            if item is _STOP:
+                try:
+                    self._flush(self.batcher.drain())
+                    self._emit(self.processor.flush())
+                except Exception as e:
+                    logging.error(f"Error processing batch: {e}")
+                self.output_queue.put(_STOP)
+                self.decoded_queue.task_done()
+                return
+            received_at, future = item
+            try:
+                self.batcher.add(future.result(), received_at)
+            except Exception as e:
+                self.decode_errors += 1
+                logging.info(f"Error processing MQTT message: {e}")
+            self._flush_ready()
+            self.decoded_queue.task_done()
+
+    def _flush_ready(self):
         try:
-            payload: str = msg.payload.decode("utf-8")
-            # Create AgentData instance with the received data
-            self.agent_data_list.append(AgentData.model_validate_json(payload, strict=True))
+            now = time.monotonic()
+            self._flush(self.batcher.pop_ready(now))
+            self._emit(self.processor.evict_idle(now))
+        except Exception as e:
+            logging.error(f"Error processing batch: {e}")
+
+    def _flush(self, ready_batches):
+        """Processes (user_id, batch, received, reason) items of the batcher"""
+        for user_id, batch, received, reason in ready_batches:
             # Process the received data (you can call a use case here if needed)
-            if len(self.agent_data_list) >= self.batch_size:
-                processed_data_batch = process_agent_data_batch(self.agent_data_list)
-                self.agent_data_list = []
+            started = time.monotonic()
+            self.unemitted.setdefault(user_id, deque()).extend([received_at, samples] for received_at, samples in received)
+            processed_data_batch = self.processor.process(batch)
+            self.stage_latency["process"].observe(time.monotonic() - started)
+            self.batch_size_histogram.observe(len(batch))
+            self.flushes[reason] += 1
+            self._emit(processed_data_batch)
+
+    def _observe_emitted(self, processed_data_batch: ProcessedAgentDataBatch):
+        """Observes the buffer latency of the messages whose last sample is emitted"""
+        emitted_at = time.monotonic()
+        for user_id, indices in processed_data_batch.agent_data.user_indices().items():
+            messages = self.unemitted.get(user_id)
+            emitted = len(indices)
+            while messages and emitted:
+                taken = min(emitted, messages[0][1])
+                messages[0][1] -= taken
+                emitted -= taken
+                if not messages[0][1]:
+                    self.buffer_latency.observe(emitted_at - messages.popleft()[0])
+            if messages is not None and not messages:
+                del self.unemitted[user_id]
+
+    def _emit(self, processed_data_batch: ProcessedAgentDataBatch):
+        self._observe_emitted(processed_data_batch)
+        if self.reducer and len(processed_data_batch):
+            processed_data_batch = self.reducer.reduce(processed_data_batch)
+        if len(processed_data_batch):
+            self.output_queue.put(processed_data_batch)
+
+    def _output_stage(self):
+        while True:
+            processed_data_batch: ProcessedAgentDataBatch = self.output_queue.get()
+            if processed_data_batch is _STOP:
+                self.output_queue.task_done()
+                return
+            started = time.monotonic()
+            try:
                 # Store the agent_data in the database (you can send it to the data processing module)
-                for data in processed_data_batch:
-                    if not self.hub_gateway.save_data(data):
-                        logging.error("Hub is not available")
-        except Exception as e:
-            logging.info(f"Error processing MQTT message: {e}")
+                if self.hub_gateway.save_batch(processed_data_batch):
+                    self.published_batches += 1
+                    self.published_samples += len(processed_data_batch)
+                else:
+                    self._delivery_failed(processed_data_batch)
+            except Exception as e:
+                with self.failures_lock:
+                    self.publish_failures += 1
+                logging.error(f"Error sending processed data to hub: {e}")
+            finally:
+                self.stage_latency["publish"].observe(time.monotonic() - started)
+                self.output_queue.task_done()
+
+    def _delivery_failed(self, processed_data_batch: ProcessedAgentDataBatch):
+        with self.failures_lock:
+            self.publish_failures += 1
+        logging.error(f"Hub is not available, {len(processed_data_batch)} samples are lost")
+
+    def start_pipeline(self):
+        self.decode_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="agent-decode")
+        self.threads = [
+            threading.Thread(target=stage, name=f"agent-{name}", daemon=True)
+            for name, stage in (("dispatch", self._dispatch_stage), ("process", self._process_stage), ("output", self._output_stage))
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def join(self):
+        """Waits until every message received so far has passed through the pipeline"""
+        self.received_queue.join()
+        self.decoded_queue.join()
+        self.output_queue.join()
+
+    def stop_pipeline(self):
+        if not self.threads:
+            return
+        with self.overflow_lock:
+            overflow = list(self.overflow)
+            self.overflow.clear()
+        for item in overflow:
+            self.received_queue.put(item)
+        self.received_queue.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.decode_pool.shutdown()
+
+    def is_alive(self) -> bool:
+        """True while every pipeline stage is running"""
+        return bool(self.threads) and all(thread.is_alive() for thread in self.threads)
+
+    def is_ready(self) -> bool:
+        """True while connected to the broker"""
+        return self.client.is_connected()
 
     def connect(self):
         self.client.on_connect = self.on_connect
@@ -55,26 +408,29 @@ class AgentMQTTAdapter(AgentGateway):
         self.client.connect(self.broker_host, self.broker_port, 60)
 
     def start(self):
+        self.start_pipeline()
         self.client.loop_start()
 
     def stop(self):
         self.client.loop_stop()
+        self.stop_pipeline()
 
 
 # Usage example:
 if __name__ == "__main__":
+    from app.adapters.hub_http_adapter import HubHttpAdapter
+
     broker_host = "localhost"
     broker_port = 1883
     topic = "agent_data_topic"
-    # Assuming you have implemented the StoreGateway and passed it to the adapter
-    store_gateway = HubGateway()
-    adapter = AgentMQTTAdapter(broker_host, broker_port, topic, store_gateway)
+    hub_gateway = HubHttpAdapter("http://localhost:8000")
+    adapter = AgentMQTTAdapter(broker_host, broker_port, topic, hub_gateway)
     adapter.connect()
-    adapter.start()
+    adapter.start_pipeline()
     try:
-        # Keep the adapter running in the background
-        while True:
-            pass
+        # Blocks in select() on the socket until interrupted
+        adapter.client.loop_forever()
     except KeyboardInterrupt:
-        adapter.stop()
+        adapter.stop_pipeline()
+        hub_gateway.close()
         logging.info("Adapter stopped.")
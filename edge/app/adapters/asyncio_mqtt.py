@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import paho.mqtt.client as mqtt
+
+
+class AsyncioMqttHelper:
+    """
+    Runs a paho MQTT client on an asyncio event loop instead of its own network thread.
+    The client's socket is watched with add_reader/add_writer, so nothing polls while
+    the connection is idle, and a periodic task handles keepalive and reconnects.
+    Create it before connecting the client, so the socket callbacks are registered.
+    pause_reading() leaves the messages with the broker until resume_reading(), while
+    paused PINGRESP is not read either, so a pause longer than the keepalive reconnects.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, client: mqtt.Client, reconnect_delay=1.0, max_reconnect_delay=30.0):
+        self.loop = loop
+        self.client = client
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.stopping = False
+        self.reading_paused = False
+        self.task = None
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def on_socket_open(self, client, userdata, sock):
+        if not self.reading_paused:
+            self.loop.add_reader(sock, client.loop_read)
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+        self.loop.remove_writer(sock)
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    def pause_reading(self):
+        """Stops reading the socket, call it on the loop"""
+        if self.reading_paused:
+            return
+        self.reading_paused = True
+        sock = self.client.socket()
+        if sock is not None:
+            self.loop.remove_reader(sock)
+
+    def resume_reading(self):
+        """Reads the socket again, call it on the loop"""
+        if not self.reading_paused:
+            return
+        self.reading_paused = False
+        sock = self.client.socket()
+        if sock is not None:
+            self.loop.add_reader(sock, self.client.loop_read)
+
+    def start(self):
+        self.task = self.loop.create_task(self.run())
+
+    async def run(self):
+        """Keepalive once a second and reconnects with exponential backoff while disconnected"""
+        delay = self.reconnect_delay
+        while not self.stopping:
+            if self.client.loop_misc() == mqtt.MQTT_ERR_NO_CONN:
+                try:
+                    self.client.reconnect()
+                    delay = self.reconnect_delay
+                except OSError as e:
+                    logging.info(f"MQTT reconnect failed: {e}, retrying in {delay:.0f} s")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_reconnect_delay)
+                    continue
+            await asyncio.sleep(1)
+
+    async def stop(self):
+        """Disconnects cleanly and stops reconnecting"""
+        self.stopping = True
+        if self.task is not None:
+            self.task.cancel()
+        if self.client.is_connected():
+            self.client.disconnect()
+            # Give the loop a moment to write the DISCONNECT packet
+            await asyncio.sleep(0.1)
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+from typing import Callable
+
+
+class HealthServer:
+    """
+    Minimal HTTP server on the event loop for orchestrator probes:
+        GET /healthz: 200 while every liveness check passes, 503 otherwise
+        GET /readyz: 200 while every readiness check passes, 503 otherwise
+    Other endpoints can be added with add_route.
+    """
+
+    def __init__(self, host: str, port: int, liveness: dict[str, Callable[[], bool]], readiness: dict[str, Callable[[], bool]]):
+        self.host = host
+        self.port = port
+        self.server = None
+        # path -> handler returning (status, content type, body)
+        self.routes: dict[str, Callable[[], tuple[int, str, bytes]]] = {}
+        self.add_route("/healthz", lambda: self.run_checks(liveness))
+        self.add_route("/readyz", lambda: self.run_checks(readiness))
+
+    def add_route(self, path: str, handler: Callable[[], tuple[int, str, bytes]]):
+        self.routes[path] = handler
+
+    @staticmethod
+    def run_checks(checks: dict[str, Callable[[], bool]]) -> tuple[int, str, bytes]:
+        results = {}
+        for name, check in checks.items():
+            try:
+                results[name] = bool(check())
+            except Exception:
+                results[name] = False
+        body = "".join(f"{name}: {'ok' if passed else 'failing'}\n" for name, passed in results.items())
+        return (200 if all(results.values()) else 503), "text/plain", body.encode("utf-8")
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        logging.info(f"Health endpoints listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            # Skip the headers, requests have no body
+            while (await reader.readline()).strip():
+                pass
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?")[0] if len(parts) > 1 else ""
+            handler = self.routes.get(path)
+            if parts and parts[0] != "GET":
+                status, content_type, body = 405, "text/plain", b"method not allowed\n"
+            elif handler is None:
+                status, content_type, body = 404, "text/plain", b"not found\n"
+            else:
+                status, content_type, body = handler()
+            reason = {200: "OK", 404: "Not Found", 405: "Method Not Allowed", 503: "Service Unavailable"}.get(status, "")
+            writer.write(
+                f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
@@ -1,14 +1,60 @@
 import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests as requests
+from requests.adapters import HTTPAdapter
 
+from app.adapters.wire_codec import CONTENT_TYPE, compress, dump_processed_agent_data_batch, encode_processed_agent_data
 from app.entities.processed_agent_data import ProcessedAgentData
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
 from app.interfaces.hub_gateway import HubGateway
+from app.metrics import STAGE_BUCKETS, Histogram, MetricsRegistry
+
+# Responses worth another attempt, everything else is final
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
 
 
 class HubHttpAdapter(HubGateway):
-    def __init__(self, api_base_url):
+    """
+    Sends processed data to the Hub API over a pool of keep-alive connections.
+    save_batch hands the batch to a pool of `concurrency` sender threads, which serialize
+    and send it, and only waits while all of them are busy, so the caller is not blocked
+    by the network.
+    Connection errors and retryable responses are retried with exponential backoff
+    and full jitter.
+    """
+
+    def __init__(
+        self,
+        api_base_url,
+        wire_format="json",
+        compression="none",
+        concurrency=4,
+        retries=3,
+        backoff=0.1,
+        max_backoff=5.0,
+        timeout=5.0,
+    ):
         self.api_base_url = api_base_url
+        self.wire_format = wire_format
+        self.compression = compression
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        # One keep-alive connection per sender thread
+        self.session = requests.Session()
+        self.session.mount(api_base_url, HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+        self.senders = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="hub-http")
+        self.in_flight = threading.BoundedSemaphore(concurrency)
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.lock = threading.Lock()
+        self.request_latency = Histogram(STAGE_BUCKETS)
 
     def save_data(self, processed_data: ProcessedAgentData):
         """
@@ -18,12 +64,86 @@ class HubHttpAdapter(HubGateway):
         Returns:
             bool: True if the data is successfully saved, False otherwise.
         """
-        url = f"{self.api_base_url}/processed_agent_data/"
+        if self.wire_format == "binary":
+            data = encode_processed_agent_data([processed_data])
+            headers = {"Content-Type": CONTENT_TYPE}
+        else:
+            data = processed_data.model_dump_json()
+            headers = {"Content-Type": "application/json"}
+        return self._post(data, headers)
 
-        response = requests.post(url, data=processed_data.model_dump_json())
-        if response.status_code != 200:
-            logging.info(
-                f"Invalid Hub response\nData: {processed_data.model_dump_json()}\nResponse: {response}"
-            )
+    def save_batch(self, processed_batch: ProcessedAgentDataBatch):
+        """
+        Send a batch of processed road data to the Hub with one request, in the background.
+        Parameters:
+            processed_batch (ProcessedAgentDataBatch): Processed road data to be saved.
+        Returns:
+            bool: True if the request is queued, failures after the retries are logged, counted
+                and passed to on_failed.
+        """
+        self.in_flight.acquire()
+        try:
+            future = self.senders.submit(self._deliver_batch, processed_batch)
+        except RuntimeError:
+            self.in_flight.release()
             return False
+        future.add_done_callback(lambda _: self.in_flight.release())
         return True
+
+    def _deliver_batch(self, processed_batch: ProcessedAgentDataBatch):
+        if not self.send_batch(processed_batch) and self.on_failed:
+            self.on_failed(processed_batch)
+
+    def send_batch(self, processed_batch: ProcessedAgentDataBatch) -> bool:
+        """
+        Send a batch of processed road data to the Hub with one request and wait for the response.
+        Parameters:
+            processed_batch (ProcessedAgentDataBatch): Processed road data to be saved.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        headers = {"Content-Type": CONTENT_TYPE if self.wire_format == "binary" else "application/json"}
+        if self.compression != "none":
+            headers["Content-Encoding"] = self.compression
+        data = compress(dump_processed_agent_data_batch(processed_batch, self.wire_format), self.compression)
+        return self._post(data, headers)
+
+    def _post(self, data, headers) -> bool:
+        url = f"{self.api_base_url}/processed_agent_data/"
+        response = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                with self.lock:
+                    self.retried += 1
+                time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1))))
+            started = time.monotonic()
+            try:
+                response = self.session.post(url, data=data, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                logging.info(f"Hub request failed: {e}")
+                continue
+            finally:
+                self.request_latency.observe(time.monotonic() - started)
+            if response.status_code == 200:
+                with self.lock:
+                    self.sent += 1
+                return True
+            if response.status_code not in RETRY_STATUS_CODES:
+                break
+        logging.info(f"Invalid Hub response\nRequest of {len(data)} bytes\nResponse: {response}")
+        with self.lock:
+            self.failed += 1
+        return False
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {"sent_total": self.sent, "failed_total": self.failed, "retries_total": self.retried}
+
+    def register_metrics(self, registry: MetricsRegistry):
+        super().register_metrics(registry)
+        registry.add_histogram("hub_request_latency_seconds", "Duration of one Hub API request", self.request_latency)
+
+    def close(self):
+        """Waits for the requests in flight and closes the connections"""
+        self.senders.shutdown(wait=True)
+        self.session.close()
@@ -3,15 +3,19 @@ import logging
 import requests as requests
 from paho.mqtt import client as mqtt_client
 
+from app.adapters.wire_codec import compress, dump_processed_agent_data_batch, encode_processed_agent_data
 from app.entities.processed_agent_data import ProcessedAgentData
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
 from app.interfaces.hub_gateway import HubGateway
 
 
 class HubMqttAdapter(HubGateway):
-    def __init__(self, broker, port, topic):
+    def __init__(self, broker, port, topic, wire_format="json", compression="none"):
         self.broker = broker
         self.port = port
         self.topic = topic
+        self.wire_format = wire_format
+        self.compression = compression
         self.mqtt_client = self._connect_mqtt(broker, port)
 
     def save_data(self, processed_data: ProcessedAgentData):
@@ -22,7 +26,23 @@ class HubMqttAdapter(HubGateway):
         Returns:
             bool: True if the data is successfully saved, False otherwise.
         """
-        msg = processed_data.model_dump_json()
+        if self.wire_format == "binary":
+            msg = encode_processed_agent_data([processed_data])
+        else:
+            msg = processed_data.model_dump_json()
+        return self._publish(msg)
+
+    def save_batch(self, processed_batch: ProcessedAgentDataBatch):
+        """
+        Save a batch of processed road data to the Hub as one message.
+        Parameters:
+            processed_batch (ProcessedAgentDataBatch): Processed road data to be saved.
+        Returns:
+            bool: True if the data is successfully saved, False otherwise.
+        """
+        return self._publish(compress(dump_processed_agent_data_batch(processed_batch, self.wire_format), self.compression))
+
+    def _publish(self, msg):
         result = self.mqtt_client.publish(self.topic, msg)
         status = result[0]
         if status == 0:
@@ -31,6 +51,13 @@ class HubMqttAdapter(HubGateway):
             print(f"Failed to send message to topic {self.topic}")
             return False
 
+    def is_ready(self) -> bool:
+        return self.mqtt_client.is_connected()
+
+    def close(self):
+        self.mqtt_client.disconnect()
+        self.mqtt_client.loop_stop()
+
     @staticmethod
     def _connect_mqtt(broker, port):
         """Create MQTT client"""
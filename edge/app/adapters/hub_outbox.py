@@ -0,0 +1,339 @@
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Optional
+
+from app.adapters.wire_codec import decode_processed_agent_data_batch, encode_processed_agent_data_batch
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+from app.interfaces.hub_gateway import HubGateway
+from app.metrics import MetricsRegistry
+
+
+class OutboxSegment:
+    """Append-only file of length-prefixed, checksummed records"""
+    # payload length, crc32 of the payload, enqueue time (unix seconds)
+    RECORD_HEADER = struct.Struct("<IId")
+
+    def __init__(self, path: str, sequence: int, read_offset: int = 0):
+        self.path = path
+        self.sequence = sequence
+        # Appends always go to the end of the file, reads seek freely
+        self.file = open(path, "a+b", buffering=0)
+        self.records, self.size, self.read_records = self._scan(read_offset)
+        self.read_offset = min(read_offset, self.size)
+
+    def _scan(self, read_offset: int) -> tuple[int, int, int]:
+        """Counts the complete records, a record torn by a crash during the write is cut off"""
+        records = 0
+        read_records = 0
+        offset = 0
+        self.file.seek(0)
+        while True:
+            header = self.file.read(OutboxSegment.RECORD_HEADER.size)
+            if len(header) < OutboxSegment.RECORD_HEADER.size:
+                break
+            length, crc, _ = OutboxSegment.RECORD_HEADER.unpack(header)
+            payload = self.file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            offset += OutboxSegment.RECORD_HEADER.size + length
+            records += 1
+            if offset <= read_offset:
+                read_records += 1
+        if offset < os.fstat(self.file.fileno()).st_size:
+            logging.warning(f"Outbox segment {self.path} ends with a torn record, truncated to {offset} bytes")
+            self.file.truncate(offset)
+        return records, offset, read_records
+
+    def append(self, payload: bytes, enqueued_at: float):
+        self.file.write(OutboxSegment.RECORD_HEADER.pack(len(payload), zlib.crc32(payload), enqueued_at) + payload)
+        self.size += OutboxSegment.RECORD_HEADER.size + len(payload)
+        self.records += 1
+
+    def peek(self) -> Optional[tuple[bytes, float]]:
+        if self.read_offset >= self.size:
+            return None
+        self.file.seek(self.read_offset)
+        length, _, enqueued_at = OutboxSegment.RECORD_HEADER.unpack(self.file.read(OutboxSegment.RECORD_HEADER.size))
+        return self.file.read(length), enqueued_at
+
+    def commit(self, payload: bytes):
+        self.read_offset += OutboxSegment.RECORD_HEADER.size + len(payload)
+        self.read_records += 1
+
+    def pending_records(self) -> int:
+        return self.records - self.read_records
+
+    def pending_bytes(self) -> int:
+        return self.size - self.read_offset
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    def delete(self):
+        self.file.close()
+        os.remove(self.path)
+
+
+class HubOutbox:
+    """
+    Durable FIFO of messages for the hub, kept in append-only segment files in a directory.
+    Appends are fsynced in groups: after `fsync_batch` records or `fsync_interval` seconds
+    (see sync_if_due), whatever comes first, so a crash loses at most that window.
+    The read position is saved in a cursor file at the same time, consumed segments are
+    deleted. After a restart delivery resumes at the saved position, so messages sent
+    since the last sync are sent again. When the outbox exceeds max_size the oldest
+    segment is dropped, so disk use stays bounded during long hub outages.
+    """
+    # sequence of the first segment, read offset in it
+    CURSOR = struct.Struct("<QQ")
+
+    def __init__(self, directory: str, segment_size: int, max_size: int, fsync_interval: float = 1.0, fsync_batch: int = 100):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max(2, max_size // segment_size)
+        self.fsync_interval = fsync_interval
+        self.fsync_batch = fsync_batch
+        self.lock = threading.Lock()
+        self.peeked_segment = None
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.dropped_segments = 0
+        os.makedirs(directory, exist_ok=True)
+        self.cursor_path = os.path.join(directory, "cursor")
+        cursor_sequence, cursor_offset = self._read_cursor()
+        self.segments = deque()
+        for name in sorted(name for name in os.listdir(directory) if name.endswith(".seg")):
+            sequence = int(name.split(".")[0])
+            path = os.path.join(directory, name)
+            if sequence < cursor_sequence:
+                # Consumed before the restart
+                os.remove(path)
+                continue
+            self.segments.append(OutboxSegment(path, sequence, cursor_offset if sequence == cursor_sequence else 0))
+        self.next_sequence = self.segments[-1].sequence + 1 if self.segments else cursor_sequence
+        if not self.segments:
+            self._add_segment()
+        if self.depth():
+            logging.info(f"Outbox holds {self.depth()} messages from before the restart")
+
+    def append(self, payload: bytes):
+        with self.lock:
+            last = self.segments[-1]
+            if last.records and last.size + OutboxSegment.RECORD_HEADER.size + len(payload) > self.segment_size:
+                self._add_segment()
+                if len(self.segments) > self.max_segments:
+                    dropped = self.segments.popleft()
+                    logging.error(f"Outbox is full, dropped {dropped.pending_records()} of the oldest messages")
+                    dropped.delete()
+                    self.dropped_segments += 1
+                    self._write_cursor()
+            self.segments[-1].append(payload, time.time())
+            self.unsynced += 1
+            if self.unsynced >= self.fsync_batch:
+                self._sync()
+
+    def peek(self) -> Optional[tuple[bytes, float]]:
+        """Returns the oldest message and its enqueue time without removing it, None when the outbox is empty"""
+        with self.lock:
+            while True:
+                self.peeked_segment = self.segments[0]
+                message = self.peeked_segment.peek()
+                if message is not None or len(self.segments) == 1:
+                    return message
+                self.segments.popleft().delete()
+                self._write_cursor()
+
+    def commit(self, payload: bytes):
+        """Removes the message returned by peek after it was delivered"""
+        with self.lock:
+            # The segment may have been dropped by append in the meantime
+            if self.segments[0] is self.peeked_segment:
+                self.segments[0].commit(payload)
+                self.unsynced += 1
+
+    def sync_if_due(self) -> Optional[float]:
+        """
+        Syncs the appends and the read position once fsync_interval passed since the last sync.
+        Returns:
+            Optional[float]: Seconds until the next sync is due, None when nothing is waiting for one.
+        """
+        with self.lock:
+            if not self.unsynced:
+                return None
+            due = self.last_sync + self.fsync_interval - time.monotonic()
+            if due > 0:
+                return due
+            self._sync()
+            return None
+
+    def depth(self) -> int:
+        with self.lock:
+            return sum(segment.pending_records() for segment in self.segments)
+
+    def pending_bytes(self) -> int:
+        with self.lock:
+            return sum(segment.pending_bytes() for segment in self.segments)
+
+    def oldest_age(self) -> float:
+        """Seconds the oldest message has been waiting, 0 when the outbox is empty"""
+        with self.lock:
+            for segment in self.segments:
+                message = segment.peek()
+                if message is not None:
+                    return max(0.0, time.time() - message[1])
+            return 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "outbox_depth": self.depth(),
+            "outbox_bytes": self.pending_bytes(),
+            "outbox_oldest_age_seconds": round(self.oldest_age(), 3),
+            "outbox_dropped_segments_total": self.dropped_segments,
+        }
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            for segment in self.segments:
+                segment.close()
+
+    def _sync(self):
+        self.segments[-1].sync()
+        self._write_cursor()
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def _read_cursor(self) -> tuple[int, int]:
+        try:
+            with open(self.cursor_path, "rb") as file:
+                return HubOutbox.CURSOR.unpack(file.read(HubOutbox.CURSOR.size))
+        except (OSError, struct.error):
+            return 0, 0
+
+    def _write_cursor(self):
+        path = self.cursor_path + ".tmp"
+        with open(path, "wb") as file:
+            file.write(HubOutbox.CURSOR.pack(self.segments[0].sequence, self.segments[0].read_offset))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path, self.cursor_path)
+
+    def _add_segment(self):
+        if self.segments:
+            self.segments[-1].sync()
+        path = os.path.join(self.directory, f"{self.next_sequence:012d}.seg")
+        self.segments.append(OutboxSegment(path, self.next_sequence))
+        self.next_sequence += 1
+
+
+class BufferedHubGateway(HubGateway):
+    """
+    Hub gateway that keeps the batches the hub could not take in a HubOutbox and
+    replays them one at a time, in the order they failed, at `rate` batches per
+    second once the hub is back. While the outbox holds batches new ones are queued
+    behind them. Delivery is in order only from the first failure on: a gateway that
+    sends in the background (HubHttpAdapter) reports a failure through on_failed after
+    its retries, and batches sent concurrently with the failed one may already be
+    delivered by then. Failed replays are retried with exponential backoff up to
+    max_backoff seconds.
+    """
+
+    def __init__(self, gateway: HubGateway, outbox: HubOutbox, rate: float = 10.0, backoff: float = 1.0, max_backoff: float = 30.0):
+        self.gateway = gateway
+        self.outbox = outbox
+        self.rate = rate
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.replayed = 0
+        # Batches the gateway accepted but failed to deliver later
+        gateway.on_failed = self._spool
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self._replay, name="hub-outbox", daemon=True)
+        self.thread.start()
+
+    def save_data(self, processed_data: ProcessedAgentData) -> bool:
+        return self.gateway.save_data(processed_data)
+
+    def save_batch(self, processed_batch: ProcessedAgentDataBatch) -> bool:
+        """
+        Send a batch to the hub, or queue it in the outbox when the hub is not available.
+        Parameters:
+            processed_batch (ProcessedAgentDataBatch): Processed road data to be saved.
+        Returns:
+            bool: True, the batch is either sent or stored.
+        """
+        if not self.outbox.depth() and self.gateway.is_ready() and self.gateway.save_batch(processed_batch):
+            return True
+        self._spool(processed_batch)
+        return True
+
+    def is_ready(self) -> bool:
+        # Batches are stored while the hub is down, so the edge stays ready
+        return True
+
+    def stats(self) -> dict[str, float]:
+        return {**self.outbox.stats(), "outbox_replayed_total": self.replayed}
+
+    def register_metrics(self, registry: MetricsRegistry):
+        self.gateway.register_metrics(registry)
+        super().register_metrics(registry)
+
+    def close(self):
+        self.gateway.close()
+        self.closed = True
+        self.wakeup.set()
+        self.thread.join()
+        self.outbox.close()
+
+    def _spool(self, processed_batch: ProcessedAgentDataBatch):
+        self.outbox.append(encode_processed_agent_data_batch(processed_batch))
+        self.wakeup.set()
+
+    def _replay(self):
+        backoff = self.backoff
+        deadline = time.monotonic()
+        while not self.closed:
+            if not self.gateway.is_ready():
+                self._wait(backoff)
+                continue
+            message = self.outbox.peek()
+            if message is None:
+                self._wait(None)
+                continue
+            payload, _ = message
+            if not self.gateway.send_batch(decode_processed_agent_data_batch(payload)):
+                logging.info(f"Hub is not available, {self.outbox.depth()} batches wait in the outbox")
+                self._wait(backoff)
+                backoff = min(self.max_backoff, backoff * 2)
+                continue
+            self.outbox.commit(payload)
+            self.replayed += 1
+            backoff = self.backoff
+            if not self.outbox.depth():
+                logging.info(f"Outbox drained, {self.replayed} batches replayed in total")
+            # Rate limit, a replay that fell behind does not burst more than a second's worth
+            deadline = max(deadline + 1 / self.rate, time.monotonic() - 1)
+            self._wait(deadline - time.monotonic())
+
+    def _wait(self, timeout: Optional[float]):
+        """Sleeps for timeout seconds, or until a batch is queued when timeout is None, and syncs the outbox when due"""
+        end = None if timeout is None else time.monotonic() + timeout
+        while not self.closed:
+            remaining = None if end is None else end - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return
+            waits = [wait for wait in (remaining, self.outbox.sync_if_due()) if wait is not None]
+            if self.wakeup.wait(min(waits) if waits else None):
+                self.wakeup.clear()
+                if end is None:
+                    return
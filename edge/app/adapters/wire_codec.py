@@ -0,0 +1,256 @@
+"""
+Compact binary wire format shared by agent, edge, hub and store.
+
+Message layout (little endian):
+    header: magic b"RV", version (uint8), kind (uint8), record count (uint32)
+    records: `count` fixed size records, AGENT_RECORD or PROCESSED_RECORD depending on kind
+
+JSON stays the default format. Receivers detect binary MQTT payloads by the magic
+bytes and binary HTTP bodies by CONTENT_TYPE, so both formats work side by side.
+Messages can additionally be compressed with gzip or zstd, receivers detect that by
+the magic bytes of the compressed data as well (HTTP also sets Content-Encoding).
+Keep this layout in sync between the agent, edge, hub and store copies.
+"""
+import gzip
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from pydantic import TypeAdapter
+from app.entities import processed_agent_data_batch
+from app.entities.agent_data import AccelerometerData, AgentData, AnemometerData, GpsData, HumidexData
+from app.entities.agent_data_batch import AgentDataBatch
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional, gzip is always available
+    zstandard = None
+
+CONTENT_TYPE = "application/x-road-vision"
+MAGIC = b"RV"
+VERSION = 1
+KIND_AGENT_DATA = 1
+KIND_PROCESSED_AGENT_DATA = 2
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+HEADER = struct.Struct("<2sBBI")
+# timestamp (microseconds since epoch), is timezone aware, user_id,
+# x, y, z, latitude, longitude, temperature, humidity, speed, direction
+AGENT_RECORD = struct.Struct("<qBi9d")
+# road_state, humidex_state and wind_chill_state codes followed by the agent record
+PROCESSED_RECORD = struct.Struct("<3BqBi9d")
+
+ROAD_STATES = ("normal", "pothole", "bump")
+HUMIDEX_STATES = ("normal", "undefined", "comfortable", "some discomfort", "great discomfort", "dangerous")
+WIND_CHILL_STATES = ("normal", "some", "strong wind", "strong chill wind")
+
+# NumPy views of the records, used to convert whole columnar batches at once
+AGENT_RECORD_DTYPE = np.dtype([
+    ("timestamp", "<i8"), ("timestamp_aware", "u1"), ("user_id", "<i4"),
+    ("x", "<f8"), ("y", "<f8"), ("z", "<f8"), ("latitude", "<f8"), ("longitude", "<f8"),
+    ("temperature", "<f8"), ("humidity", "<f8"), ("speed", "<f8"), ("direction", "<f8"),
+])
+PROCESSED_RECORD_DTYPE = np.dtype(
+    [("road_state", "u1"), ("humidex_state", "u1"), ("wind_chill_state", "u1")] + AGENT_RECORD_DTYPE.descr
+)
+assert AGENT_RECORD_DTYPE.itemsize == AGENT_RECORD.size and PROCESSED_RECORD_DTYPE.itemsize == PROCESSED_RECORD.size
+
+# Batch entities keep their own state codes, these map them to the wire codes
+_ROAD_CODES = np.array([ROAD_STATES.index(state) for state in processed_agent_data_batch.ROAD_STATES], dtype=np.uint8)
+_HUMIDEX_CODES = np.array([HUMIDEX_STATES.index(state) for state in processed_agent_data_batch.HUMIDEX_STATES], dtype=np.uint8)
+_WIND_CHILL_CODES = np.array([WIND_CHILL_STATES.index(state) for state in processed_agent_data_batch.WIND_CHILL_STATES], dtype=np.uint8)
+# and back, wire states the entities do not know map to their first state
+_ROAD_STATE_CODES = np.zeros(len(ROAD_STATES), dtype=np.uint8)
+_ROAD_STATE_CODES[_ROAD_CODES] = np.arange(len(_ROAD_CODES))
+_HUMIDEX_STATE_CODES = np.zeros(len(HUMIDEX_STATES), dtype=np.uint8)
+_HUMIDEX_STATE_CODES[_HUMIDEX_CODES] = np.arange(len(_HUMIDEX_CODES))
+_WIND_CHILL_STATE_CODES = np.zeros(len(WIND_CHILL_STATES), dtype=np.uint8)
+_WIND_CHILL_STATE_CODES[_WIND_CHILL_CODES] = np.arange(len(_WIND_CHILL_CODES))
+
+processed_agent_data_list_adapter = TypeAdapter(list[ProcessedAgentData])
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def is_binary(payload: bytes) -> bool:
+    return payload[:len(MAGIC)] == MAGIC
+
+
+def compress(payload: bytes, compression: str) -> bytes:
+    """Compresses a message with "gzip" or "zstd", "none" returns it as is"""
+    if compression == "gzip":
+        return gzip.compress(payload, compresslevel=6)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor().compress(payload)
+    if compression != "none":
+        raise ValueError(f"Unknown compression: {compression}")
+    return payload
+
+
+def decompress(payload: bytes) -> bytes:
+    """
+    Detects gzip and zstd messages by their magic bytes, other messages are returned as is.
+    Truncated or corrupt compressed messages raise ValueError like other malformed messages.
+    """
+    if payload[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        try:
+            return gzip.decompress(payload)
+        except (OSError, EOFError, zlib.error) as e:
+            raise ValueError(f"Corrupt gzip message: {e}") from e
+    if payload[:len(ZSTD_MAGIC)] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError("zstd compressed message, but the zstandard package is not installed")
+        try:
+            return zstandard.ZstdDecompressor().decompress(payload)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Corrupt zstd message: {e}") from e
+    return payload
+
+
+def encode_timestamp(value: datetime) -> tuple[int, int]:
+    if value.tzinfo is None:
+        return (value - _EPOCH) // _MICROSECOND, 0
+    return (value - _EPOCH_UTC) // _MICROSECOND, 1
+
+
+def decode_timestamp(micros: int, aware: int) -> datetime:
+    if aware:
+        return _EPOCH_UTC + micros * _MICROSECOND
+    return _EPOCH + micros * _MICROSECOND
+
+
+def _state(states: tuple, code: int, name: str) -> str:
+    if code >= len(states):
+        raise ValueError(f"Unknown {name} code {code}")
+    return states[code]
+
+
+def pack(kind: int, record: struct.Struct, rows: list[tuple]) -> bytes:
+    return HEADER.pack(MAGIC, VERSION, kind, len(rows)) + b"".join([record.pack(*row) for row in rows])
+
+
+def unpack_header(kind: int, record_size: int, payload: bytes) -> int:
+    """Validates the header and returns the record count"""
+    if len(payload) < HEADER.size:
+        raise ValueError(f"Wire message of {len(payload)} bytes is shorter than its header")
+    magic, version, payload_kind, count = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION or payload_kind != kind:
+        raise ValueError(f"Unsupported wire message: magic={magic!r}, version={version}, kind={payload_kind}")
+    if len(payload) != HEADER.size + count * record_size:
+        raise ValueError(f"Wire message size {len(payload)} does not match {count} records")
+    return count
+
+
+def unpack(kind: int, record: struct.Struct, payload: bytes):
+    """Validates the header and returns an iterator over the record tuples"""
+    unpack_header(kind, record.size, payload)
+    return record.iter_unpack(memoryview(payload)[HEADER.size:])
+
+
+def _agent_row(agent_data: AgentData) -> tuple:
+    micros, aware = encode_timestamp(agent_data.timestamp)
+    return (
+        micros, aware, agent_data.user_id,
+        agent_data.accelerometer.x, agent_data.accelerometer.y, agent_data.accelerometer.z,
+        agent_data.gps.latitude, agent_data.gps.longitude,
+        agent_data.humidex.temperature, agent_data.humidex.humidity,
+        agent_data.anemometer.speed, agent_data.anemometer.direction,
+    )
+
+
+def _agent_data(row: tuple) -> AgentData:
+    # Record layout is fixed and typed, so the models are built without re-validation
+    micros, aware, user_id, x, y, z, latitude, longitude, temperature, humidity, speed, direction = row
+    return AgentData.model_construct(
+        user_id=user_id,
+        accelerometer=AccelerometerData.model_construct(x=x, y=y, z=z),
+        gps=GpsData.model_construct(latitude=latitude, longitude=longitude),
+        humidex=HumidexData.model_construct(temperature=temperature, humidity=humidity),
+        anemometer=AnemometerData.model_construct(speed=speed, direction=direction),
+        timestamp=decode_timestamp(micros, aware),
+    )
+
+
+def encode_agent_data(batch: list[AgentData]) -> bytes:
+    return pack(KIND_AGENT_DATA, AGENT_RECORD, [_agent_row(agent_data) for agent_data in batch])
+
+
+def decode_agent_data(payload: bytes) -> list[AgentData]:
+    return [_agent_data(row) for row in unpack(KIND_AGENT_DATA, AGENT_RECORD, payload)]
+
+
+def encode_processed_agent_data(batch: list[ProcessedAgentData]) -> bytes:
+    rows = [
+        (
+            ROAD_STATES.index(data.road_state),
+            HUMIDEX_STATES.index(data.humidex_state),
+            WIND_CHILL_STATES.index(data.wind_chill_state),
+        ) + _agent_row(data.agent_data)
+        for data in batch
+    ]
+    return pack(KIND_PROCESSED_AGENT_DATA, PROCESSED_RECORD, rows)
+
+
+def decode_processed_agent_data(payload: bytes) -> list[ProcessedAgentData]:
+    return [
+        ProcessedAgentData.model_construct(
+            road_state=_state(ROAD_STATES, row[0], "road_state"),
+            humidex_state=_state(HUMIDEX_STATES, row[1], "humidex_state"),
+            wind_chill_state=_state(WIND_CHILL_STATES, row[2], "wind_chill_state"),
+            agent_data=_agent_data(row[3:]),
+        )
+        for row in unpack(KIND_PROCESSED_AGENT_DATA, PROCESSED_RECORD, payload)
+    ]
+
+
+def decode_agent_data_batch(payload: bytes) -> AgentDataBatch:
+    """Decodes an agent data message straight into columns, without model objects"""
+    count = unpack_header(KIND_AGENT_DATA, AGENT_RECORD.size, payload)
+    records = np.frombuffer(payload, dtype=AGENT_RECORD_DTYPE, count=count, offset=HEADER.size)
+    columns = {name: records[name] for name in AGENT_RECORD_DTYPE.names}
+    columns["timestamp"] = columns["timestamp"].astype("datetime64[us]")
+    return AgentDataBatch.from_columns(**columns)
+
+
+def encode_processed_agent_data_batch(batch: ProcessedAgentDataBatch) -> bytes:
+    """Encodes a processed batch straight from its columns"""
+    records = np.empty(len(batch), dtype=PROCESSED_RECORD_DTYPE)
+    records["road_state"] = _ROAD_CODES[batch.road_state]
+    records["humidex_state"] = _HUMIDEX_CODES[batch.humidex_state]
+    records["wind_chill_state"] = _WIND_CHILL_CODES[batch.wind_chill_state]
+    records["timestamp"] = batch.agent_data.timestamp.astype(np.int64)
+    for name in AGENT_RECORD_DTYPE.names[1:]:
+        records[name] = getattr(batch.agent_data, name)
+    return HEADER.pack(MAGIC, VERSION, KIND_PROCESSED_AGENT_DATA, len(batch)) + records.tobytes()
+
+
+def decode_processed_agent_data_batch(payload: bytes) -> ProcessedAgentDataBatch:
+    """Decodes a processed agent data message straight into columns, without model objects"""
+    count = unpack_header(KIND_PROCESSED_AGENT_DATA, PROCESSED_RECORD.size, payload)
+    records = np.frombuffer(payload, dtype=PROCESSED_RECORD_DTYPE, count=count, offset=HEADER.size)
+    for name, states in (("road_state", ROAD_STATES), ("humidex_state", HUMIDEX_STATES), ("wind_chill_state", WIND_CHILL_STATES)):
+        if count and records[name].max() >= len(states):
+            raise ValueError(f"Unknown {name} code {records[name].max()}")
+    columns = {name: records[name] for name in AGENT_RECORD_DTYPE.names}
+    columns["timestamp"] = columns["timestamp"].astype("datetime64[us]")
+    return ProcessedAgentDataBatch(
+        agent_data=AgentDataBatch.from_columns(**columns),
+        road_state=_ROAD_STATE_CODES[records["road_state"]],
+        humidex_state=_HUMIDEX_STATE_CODES[records["humidex_state"]],
+        wind_chill_state=_WIND_CHILL_STATE_CODES[records["wind_chill_state"]],
+    )
+
+
+def dump_processed_agent_data_batch(batch: ProcessedAgentDataBatch, wire_format: str) -> bytes:
+    """Serializes a processed batch as one message: binary records or a JSON array"""
+    if wire_format == "binary":
+        return encode_processed_agent_data_batch(batch)
+    return processed_agent_data_list_adapter.dump_json(batch.to_processed_agent_data_list())
@@ -1,5 +1,6 @@
 from datetime import datetime
 from pydantic import BaseModel, field_validator
+from typing_extensions import TypedDict
 
 
 class AccelerometerData(BaseModel):
@@ -43,3 +44,34 @@ class AgentData(BaseModel):
             raise ValueError(
                 "Invalid timestamp format. Expected ISO 8601 format (YYYY-MM-DDTHH:MM:SSZ)."
             )
+
+
+# Plain dict mirrors of AgentData, validating into them skips building model objects
+class AccelerometerRecord(TypedDict):
+    x: float
+    y: float
+    z: float
+
+
+class GpsRecord(TypedDict):
+    latitude: float
+    longitude: float
+
+
+class HumidexRecord(TypedDict):
+    temperature: float
+    humidity: float
+
+
+class AnemometerRecord(TypedDict):
+    speed: float
+    direction: float
+
+
+class AgentDataRecord(TypedDict):
+    user_id: int
+    accelerometer: AccelerometerRecord
+    gps: GpsRecord
+    humidex: HumidexRecord
+    anemometer: AnemometerRecord
+    timestamp: datetime
@@ -0,0 +1,61 @@
+from dataclasses import dataclass
+import numpy as np
+from app.entities.agent_data_batch import AgentDataBatch
+from app.entities.processed_agent_data import ProcessedAgentData
+
+# States are stored as uint8 codes into these tables
+ROAD_STATES = np.array(["normal", "pothole", "bump"], dtype=object)
+HUMIDEX_STATES = np.array(["undefined", "comfortable", "some discomfort", "great discomfort", "dangerous"], dtype=object)
+WIND_CHILL_STATES = np.array(["normal", "strong wind", "strong chill wind"], dtype=object)
+
+
+@dataclass
+class ProcessedAgentDataBatch:
+    """Columnar batch of processed agent data, see AgentDataBatch"""
+    agent_data: AgentDataBatch
+    road_state: np.ndarray
+    humidex_state: np.ndarray
+    wind_chill_state: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.agent_data)
+
+    def __getitem__(self, index) -> "ProcessedAgentDataBatch":
+        return ProcessedAgentDataBatch(
+            agent_data=self.agent_data[index],
+            road_state=self.road_state[index],
+            humidex_state=self.humidex_state[index],
+            wind_chill_state=self.wind_chill_state[index],
+        )
+
+    @classmethod
+    def empty(cls) -> "ProcessedAgentDataBatch":
+        codes = np.empty(0, dtype=np.uint8)
+        return cls(agent_data=AgentDataBatch.empty(), road_state=codes, humidex_state=codes, wind_chill_state=codes)
+
+    @classmethod
+    def concat(cls, batches: list["ProcessedAgentDataBatch"]) -> "ProcessedAgentDataBatch":
+        if len(batches) == 1:
+            return batches[0]
+        if not batches:
+            return cls.empty()
+        return cls(
+            agent_data=AgentDataBatch.concat([batch.agent_data for batch in batches]),
+            road_state=np.concatenate([batch.road_state for batch in batches]),
+            humidex_state=np.concatenate([batch.humidex_state for batch in batches]),
+            wind_chill_state=np.concatenate([batch.wind_chill_state for batch in batches]),
+        )
+
+    def to_processed_agent_data_list(self) -> list[ProcessedAgentData]:
+        """Builds model objects, only meant for the boundaries that still need them"""
+        return [
+            ProcessedAgentData.model_construct(
+                road_state=road_state, humidex_state=humidex_state, wind_chill_state=wind_chill_state, agent_data=agent_data
+            )
+            for road_state, humidex_state, wind_chill_state, agent_data in zip(
+                ROAD_STATES[self.road_state].tolist(),
+                HUMIDEX_STATES[self.humidex_state].tolist(),
+                WIND_CHILL_STATES[self.wind_chill_state].tolist(),
+                self.agent_data.to_agent_data_list(),
+            )
+        ]
@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
 from app.entities.processed_agent_data import ProcessedAgentData
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+from app.metrics import MetricsRegistry
 
 
 class HubGateway(ABC):
@@ -7,6 +9,9 @@ class HubGateway(ABC):
     Abstract class representing the Store Gateway interface.
     All store gateway adapters must implement these methods.
     """
+    # Called with batches that save_batch accepted but that could not be delivered later,
+    # from the thread that delivered them
+    on_failed = None
 
     @abstractmethod
     def save_data(self, processed_data: ProcessedAgentData) -> bool:
@@ -18,3 +23,56 @@ class HubGateway(ABC):
             bool: True if the data is successfully saved, False otherwise.
         """
         pass
+
+    @abstractmethod
+    def save_batch(self, processed_batch: ProcessedAgentDataBatch) -> bool:
+        """
+        Method to save a whole batch of processed agent data with one message or request.
+        Adapters may deliver in the background: True then only means the batch was accepted,
+        and a failed delivery is reported later by calling on_failed with the batch.
+        Parameters:
+            processed_batch (ProcessedAgentDataBatch): The processed agent data to be saved.
+        Returns:
+            bool: True if the data is saved or accepted for delivery, False otherwise.
+        """
+        pass
+
+    def send_batch(self, processed_batch: ProcessedAgentDataBatch) -> bool:
+        """
+        Method to send a batch and wait until it is delivered.
+        Parameters:
+            processed_batch (ProcessedAgentDataBatch): The processed agent data to be saved.
+        Returns:
+            bool: save_batch by default, adapters that send in the background wait for the result.
+        """
+        return self.save_batch(processed_batch)
+
+    def is_ready(self) -> bool:
+        """
+        Method to check whether the gateway can currently deliver data.
+        Returns:
+            bool: True by default, adapters with a connection report its state.
+        """
+        return True
+
+    def stats(self) -> dict[str, float]:
+        """
+        Method to report counters and gauges of the gateway.
+        Returns:
+            dict[str, float]: Values by name, names ending in _total are counters.
+        """
+        return {}
+
+    def register_metrics(self, registry: MetricsRegistry):
+        """
+        Method to export the metrics of the gateway, stats() by default.
+        Parameters:
+            registry (MetricsRegistry): Registry rendered by the metrics endpoint.
+        """
+        registry.add_collector(self.stats, prefix="hub_")
+
+    def close(self):
+        """
+        Method to send what is still in flight and release the connection.
+        """
+        pass
@@ -0,0 +1,118 @@
+import bisect
+import logging
+import math
+import threading
+from typing import Callable
+
+# Upper bounds in seconds, the last bucket takes everything above
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+# Finer bounds for the stages that take microseconds to milliseconds
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, float("inf"))
+# Samples per batch
+SIZE_BUCKETS = (1, 10, 25, 50, 100, 250, 500, 1000, 5000, float("inf"))
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> tuple[list[tuple[float, int]], float, int]:
+        """Consistent (cumulative counts, sum, count)"""
+        with self.lock:
+            counts = list(self.counts)
+            value_sum = self.sum
+            count = self.count
+        return self._cumulative(counts), value_sum, count
+
+    def cumulative_counts(self) -> list[tuple[float, int]]:
+        """(upper bound, number of values <= bound) for every bucket"""
+        with self.lock:
+            counts = list(self.counts)
+        return self._cumulative(counts)
+
+    def _cumulative(self, counts: list[int]) -> list[tuple[float, int]]:
+        total = 0
+        cumulative = []
+        for bound, count in zip(self.buckets, counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket that contains the q-quantile"""
+        cumulative = self.cumulative_counts()
+        target = q * cumulative[-1][1]
+        for bound, total in cumulative:
+            if total >= target:
+                return bound
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """
+    Renders metrics in the Prometheus text exposition format (version 0.0.4).
+    Histograms are registered once and observed on the hot path. Counters and gauges
+    come from collectors, functions that return the current values as a dict like the
+    stats() methods of the adapters, so they cost nothing until scraped.
+    Names ending in _total are exported as counters, the others as gauges.
+    """
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        # name -> (help, [(labels, histogram)])
+        self.histograms: dict[str, tuple[str, list[tuple[dict[str, str], Histogram]]]] = {}
+        self.collectors: list[tuple[str, Callable[[], dict[str, float]]]] = []
+
+    def add_histogram(self, name: str, help: str, histogram: Histogram, **labels: str):
+        self.histograms.setdefault(name, (help, []))[1].append((labels, histogram))
+
+    def add_collector(self, collector: Callable[[], dict[str, float]], prefix: str = ""):
+        self.collectors.append((prefix, collector))
+
+    def render(self) -> str:
+        lines = []
+        for name, (help, series) in self.histograms.items():
+            name = f"{self.namespace}_{name}"
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+            for labels, histogram in series:
+                cumulative, value_sum, count = histogram.snapshot()
+                for bound, total in cumulative:
+                    lines.append(f"{name}_bucket{_labels({**labels, 'le': _number(bound)})} {total}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value_sum)}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        for prefix, collector in self.collectors:
+            try:
+                values = collector()
+            except Exception as e:
+                logging.info(f"Metrics collector failed: {e}")
+                continue
+            for key, value in values.items():
+                name = f"{self.namespace}_{prefix}{key}"
+                lines += [f"# TYPE {name} {'counter' if key.endswith('_total') else 'gauge'}", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
@@ -1,9 +1,15 @@
 from app.entities.agent_data import AgentData
+from app.entities.agent_data_batch import AgentDataBatch
 from app.entities.processed_agent_data import ProcessedAgentData
+from app.entities.processed_agent_data_batch import HUMIDEX_STATES, ProcessedAgentDataBatch
 
 from scipy.signal import find_peaks
 import numpy as np
 
+# Humidex above each threshold moves the state one step up
+HUMIDEX_THRESHOLDS = np.array([20.0, 30.0, 40.0, 45.0])
+
+
 def process_agent_data(
     agent_data: AgentData,
 ) -> ProcessedAgentData:
@@ -24,66 +30,76 @@ def process_agent_data(
         road_state = "bump"
 
     # humidex
-    humidex_state = "normal"
-    e = 6.112 * 10.0 ** (7.5 * agent_data.humidex.temperature / (237.7 + agent_data.humidex.temperature)) * agent_data.humidex.humidity / 100.0
-    humidex = agent_data.humidex.temperature + 5.0 / 9.0 * (e - 10)
-
-    if humidex > 45:
-        humidex_state = "dangerous"
-    elif humidex > 40:
-        humidex_state = "great discomfort"
-    elif humidex > 30:
-        humidex_state = "some discomfort"
-    elif humidex > 20:
-        humidex_state = "comfortable"
-    else:
-        humidex_state = "undefined"
+    humidex_state = HUMIDEX_STATES[classify_humidex(np.array([agent_data.humidex.temperature]), np.array([agent_data.humidex.humidity]))[0]]
 
     wind_chill_state = "some"
 
     return ProcessedAgentData(road_state=road_state, humidex_state=humidex_state, wind_chill_state=wind_chill_state, agent_data=agent_data)
 
-def process_agent_data_batch(
-    agent_data_list: list[AgentData],
-) -> list[ProcessedAgentData]:
-    processed_agent_data_list = [ProcessedAgentData(road_state="normal", humidex_state="normal", wind_chill_state="normal", agent_data=agent_data) for agent_data in agent_data_list]
-
-    # accelerometer
-    z_values = np.array([item.agent_data.accelerometer.z for item in processed_agent_data_list])
+def find_road_anomalies(z_values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Finds bumps (maximums) and potholes (minimums) in the accelerometer z signal.
+    Returns:
+        (bump_indices, pothole_indices)
+    """
     maximum = find_peaks(z_values, height=17000, distance=10, prominence=1000, width=10)
     minimum = find_peaks(-z_values, height=-15000, distance=15, prominence=1000, width=15)
+    return maximum[0], minimum[0]
 
-    for idx in maximum[0]:
-        processed_agent_data_list[idx].road_state = "bump"
 
-    for idx in minimum[0]:
-        processed_agent_data_list[idx].road_state = "pothole"
-
-    # humidex
-    for data in processed_agent_data_list:
-
-        e = 6.112 * 10.0 ** (7.5 * data.agent_data.humidex.temperature / (237.7 + data.agent_data.humidex.temperature)) * data.agent_data.humidex.humidity / 100.0
-        humidex = data.agent_data.humidex.temperature + 5.0 / 9.0 * (e - 10)
-
-        if humidex > 45:
-            data.humidex_state = "dangerous"
-        elif humidex > 40:
-            data.humidex_state = "great discomfort"
-        elif humidex > 30:
-            data.humidex_state = "some discomfort"
-        elif humidex > 20:
-            data.humidex_state = "comfortable"
-        else:
-            data.humidex_state = "undefined"
-
-    # wind
-    speeds = np.array([item.agent_data.anemometer.speed for item in processed_agent_data_list])
-    maximum = find_peaks(speeds, height=25, distance=10)
-
-    for idx in maximum[0]:
-        temperature = processed_agent_data_list[idx].agent_data.humidex.temperature
-        speed_km_p_h = processed_agent_data_list[idx].agent_data.anemometer.speed * 3600 / 1000
-        wind_chill = 13.12 + 0.6215 * temperature - 11.37 * speed_km_p_h ** 0.16 + 0.3965 * temperature * speed_km_p_h ** 0.16
-        processed_agent_data_list[idx].wind_chill_state = "strong chill wind" if wind_chill < -10 else "strong wind"
-
-    return processed_agent_data_list
\ No newline at end of file
+def process_agent_data_batch(
+    batch: AgentDataBatch,
+    context_before: int = 0,
+    context_after: int = 0,
+) -> ProcessedAgentDataBatch:
+    """
+    Process a batch of agent data of one vehicle.
+    Parameters:
+        batch (AgentDataBatch): Consecutive agent data samples.
+        context_before (int): Number of leading samples used only as context for peak detection.
+        context_after (int): Number of trailing samples used only as context for peak detection.
+    Returns:
+        ProcessedAgentDataBatch: Processed data for the samples between the contexts.
+    """
+    end = len(batch) - context_after
+    return ProcessedAgentDataBatch(
+        agent_data=batch[context_before:end],
+        road_state=classify_road_states(batch.z)[context_before:end],
+        humidex_state=classify_humidex(batch.temperature[context_before:end], batch.humidity[context_before:end]),
+        wind_chill_state=classify_wind_chill(batch.temperature, batch.speed)[context_before:end],
+    )
+
+
+def classify_road_states(z_values: np.ndarray) -> np.ndarray:
+    """Road state code of every sample: bump and pothole at the detected peaks, normal elsewhere"""
+    bumps, potholes = find_road_anomalies(z_values)
+    codes = np.zeros(len(z_values), dtype=np.uint8)
+    codes[bumps] = 2
+    codes[potholes] = 1
+    return codes
+
+
+def calculate_humidex(temperatures: np.ndarray, humidities: np.ndarray) -> np.ndarray:
+    e = 6.112 * 10.0 ** (7.5 * temperatures / (237.7 + temperatures)) * humidities / 100.0
+    return temperatures + 5.0 / 9.0 * (e - 10)
+
+
+def classify_humidex(temperatures: np.ndarray, humidities: np.ndarray) -> np.ndarray:
+    """Humidex state code of every sample, a humidex equal to a threshold falls into the lower state"""
+    humidex = calculate_humidex(temperatures, humidities)
+    codes = np.digitize(humidex, HUMIDEX_THRESHOLDS, right=True).astype(np.uint8)
+    # digitize sorts NaN above every threshold, a missing reading is undefined
+    codes[np.isnan(humidex)] = 0
+    return codes
+
+
+def classify_wind_chill(temperatures: np.ndarray, speeds: np.ndarray) -> np.ndarray:
+    """Wind state code of every sample: wind peaks are strong wind or strong chill wind, normal elsewhere"""
+    codes = np.zeros(len(speeds), dtype=np.uint8)
+    peaks = find_peaks(speeds, height=25, distance=10)[0]
+
+    temperature = temperatures[peaks]
+    speed_km_p_h = speeds[peaks] * 3600 / 1000
+    wind_chill = 13.12 + 0.6215 * temperature - 11.37 * speed_km_p_h ** 0.16 + 0.3965 * temperature * speed_km_p_h ** 0.16
+    codes[peaks] = np.where(wind_chill < -10, 2, 1)
+    return codes
@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import numpy as np
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+
+# Meters per degree of latitude, a degree of longitude is this times cos(latitude)
+METERS_PER_DEGREE = 111_320.0
+
+
+@dataclass
+class VehicleTrack:
+    # Last forwarded position and states, the start of the next batch is compared to them
+    latitude: float
+    longitude: float
+    humidex_state: int
+    wind_chill_state: int
+
+
+class TrackReducer:
+    """
+    Drops processed samples that add nothing to what the map shows.
+    Kept in full: every road anomaly (pothole, bump), every wind peak, every sample
+    where the humidex or wind state differs from the previous one of the vehicle, the
+    first sample of a vehicle and the last sample of every batch.
+    The remaining normal samples are simplified per vehicle with Douglas-Peucker:
+    a sample is kept only if the track would otherwise deviate more than `tolerance`
+    meters from it. The kept samples split the track into segments, and the last
+    forwarded position joins the segments of consecutive batches, so the track is
+    simplified as a stream without waiting for future samples.
+    """
+
+    def __init__(self, tolerance: float = 5.0, max_vehicles: int = 10000):
+        self.tolerance = tolerance
+        self.max_vehicles = max_vehicles
+        self.tracks: OrderedDict[int, VehicleTrack] = OrderedDict()
+        self.received = 0
+        self.forwarded = 0
+
+    def reduce(self, batch: ProcessedAgentDataBatch) -> ProcessedAgentDataBatch:
+        keep = np.zeros(len(batch), dtype=bool)
+        for user_id, indices in batch.agent_data.user_indices().items():
+            keep[indices] = self._reduce_user(user_id, batch[indices])
+        while len(self.tracks) > self.max_vehicles:
+            self.tracks.popitem(last=False)
+        self.received += len(batch)
+        self.forwarded += int(keep.sum())
+        return batch if keep.all() else batch[keep]
+
+    def _reduce_user(self, user_id: int, batch: ProcessedAgentDataBatch) -> np.ndarray:
+        track = self.tracks.get(user_id)
+        humidex_state = batch.humidex_state
+        wind_chill_state = batch.wind_chill_state
+
+        forced = (batch.road_state != 0) | (wind_chill_state != 0)
+        forced[1:] |= (humidex_state[1:] != humidex_state[:-1]) | (wind_chill_state[1:] != wind_chill_state[:-1])
+        forced[-1] = True
+        if track is None:
+            forced[0] = True
+        else:
+            forced[0] |= humidex_state[0] != track.humidex_state or wind_chill_state[0] != track.wind_chill_state
+
+        latitude = batch.agent_data.latitude
+        longitude = batch.agent_data.longitude
+        if track is not None:
+            # The last forwarded position is the anchor of the first segment
+            latitude = np.concatenate([[track.latitude], latitude])
+            longitude = np.concatenate([[track.longitude], longitude])
+            forced = np.concatenate([[True], forced])
+        points = np.column_stack([longitude * np.cos(np.radians(latitude.mean())), latitude]) * METERS_PER_DEGREE
+        keep = simplify_track(points, forced, self.tolerance)
+        if track is not None:
+            keep = keep[1:]
+
+        self.tracks[user_id] = VehicleTrack(
+            latitude=float(batch.agent_data.latitude[-1]),
+            longitude=float(batch.agent_data.longitude[-1]),
+            humidex_state=int(humidex_state[-1]),
+            wind_chill_state=int(wind_chill_state[-1]),
+        )
+        self.tracks.move_to_end(user_id)
+        return keep
+
+    def stats(self) -> dict[str, int]:
+        return {"reduction_received_total": self.received, "reduction_forwarded_total": self.forwarded}
+
+
+def simplify_track(points: np.ndarray, keep: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker simplification of a track.
+    Parameters:
+        points (np.ndarray): (n, 2) positions in meters.
+        keep (np.ndarray): Samples that must be kept, the first and the last one included.
+        tolerance (float): Largest allowed distance of a dropped sample from the simplified track.
+    Returns:
+        np.ndarray: Mask of the kept samples.
+    """
+    keep = keep.copy()
+    kept = np.flatnonzero(keep)
+    segments = [(start, end) for start, end in zip(kept[:-1], kept[1:]) if end - start > 1]
+    while segments:
+        start, end = segments.pop()
+        inner = points[start + 1:end]
+        distances = _segment_distances(inner, points[start], points[end])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            if split - start > 1:
+                segments.append((start, split))
+            if end - split > 1:
+                segments.append((split, end))
+    return keep
+
+
+def _segment_distances(points: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Distances of points from the line segment start-end"""
+    direction = end - start
+    length = direction @ direction
+    if length == 0:
+        return np.hypot(*(points - start).T)
+    t = np.clip((points - start) @ direction / length, 0.0, 1.0)
+    return np.hypot(*(points - start - t[:, None] * direction).T)
@@ -0,0 +1,131 @@
+import heapq
+import itertools
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+from app.entities.agent_data_batch import AgentDataBatch
+
+
+@dataclass
+class Partition:
+    """Buffered samples of one vehicle, as (received_at, batch) pieces in arrival order"""
+    pieces: deque = field(default_factory=deque)
+    size: int = 0
+    queued: bool = False
+    entry_id: int = -1
+
+    def take(self, count: int) -> tuple[AgentDataBatch, list[tuple[float, int]]]:
+        """Removes up to `count` samples from the front, with (received_at, samples) of the pieces taken"""
+        batches = []
+        received = []
+        while self.pieces and count > 0:
+            received_at, batch = self.pieces[0]
+            if len(batch) > count:
+                batches.append(batch[:count])
+                self.pieces[0] = (received_at, batch[count:])
+            else:
+                batches.append(batch)
+                self.pieces.popleft()
+            received.append((received_at, len(batches[-1])))
+            self.size -= len(batches[-1])
+            count -= len(batches[-1])
+        return AgentDataBatch.concat(batches), received
+
+    def oldest(self) -> float:
+        return self.pieces[0][0]
+
+
+class PartitionedBatcher:
+    """
+    Batches agent data per vehicle (user_id), so every vehicle gets its own window.
+    A vehicle is ready when it buffered batch_size samples or its oldest sample waited
+    max_batch_delay seconds. Full vehicles are served round-robin with at most
+    batch_size samples per turn, so a vehicle with a backlog does not delay the others.
+    Partitions exist only while they hold samples. Their deadlines are kept in a heap
+    where outdated entries are skipped lazily, so scheduling stays O(samples + log vehicles).
+    """
+
+    def __init__(self, batch_size: int, max_batch_delay: Optional[float] = None):
+        self.batch_size = batch_size
+        self.max_batch_delay = max_batch_delay
+        self.partitions: dict[int, Partition] = {}
+        # (oldest received_at, entry id, user_id), an entry is current if the partition still has that entry id
+        self.deadlines: list[tuple[float, int, int]] = []
+        self.entry_ids = itertools.count()
+        # Vehicles that hold at least batch_size samples, in round-robin order
+        self.full: deque[int] = deque()
+        self.buffered = 0
+
+    def __len__(self) -> int:
+        return self.buffered
+
+    def add(self, batch: AgentDataBatch, received_at: float):
+        for user_id, user_batch in batch.split_by_user().items():
+            partition = self.partitions.get(user_id)
+            started = partition is None
+            if started:
+                partition = self.partitions[user_id] = Partition()
+            partition.pieces.append((received_at, user_batch))
+            if started:
+                self._push_deadline(user_id, partition)
+            partition.size += len(user_batch)
+            self.buffered += len(user_batch)
+            if partition.size >= self.batch_size and not partition.queued:
+                partition.queued = True
+                self.full.append(user_id)
+
+    def next_deadline(self) -> Optional[float]:
+        """When the oldest buffered sample reaches max_batch_delay, None if nothing waits for it"""
+        if not self.max_batch_delay:
+            return None
+        while self.deadlines:
+            oldest, entry_id, user_id = self.deadlines[0]
+            partition = self.partitions.get(user_id)
+            if partition is not None and partition.entry_id == entry_id:
+                return oldest + self.max_batch_delay
+            heapq.heappop(self.deadlines)
+        return None
+
+    def pop_ready(self, now: float):
+        """
+        Yields (user_id, batch, received, reason) for every ready vehicle, where received
+        holds (received_at, samples) of the messages the batch is made of.
+        Full vehicles come first, round-robin, followed by the vehicles past their deadline.
+        """
+        while self.full:
+            user_id = self.full.popleft()
+            partition = self.partitions[user_id]
+            batch, received = partition.take(self.batch_size)
+            if partition.size >= self.batch_size:
+                self.full.append(user_id)
+            else:
+                partition.queued = False
+            yield self._taken(user_id, partition, batch, received, "size")
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or deadline > now:
+                break
+            user_id = self.deadlines[0][2]
+            partition = self.partitions[user_id]
+            batch, received = partition.take(partition.size)
+            yield self._taken(user_id, partition, batch, received, "age")
+
+    def drain(self):
+        """Yields (user_id, batch, received, reason) for everything buffered"""
+        self.full.clear()
+        self.deadlines.clear()
+        for user_id, partition in list(self.partitions.items()):
+            batch, received = partition.take(partition.size)
+            yield self._taken(user_id, partition, batch, received, "stop")
+
+    def _taken(self, user_id: int, partition: Partition, batch: AgentDataBatch, received: list[tuple[float, int]], reason: str):
+        self.buffered -= len(batch)
+        if not partition.size:
+            del self.partitions[user_id]
+        else:
+            self._push_deadline(user_id, partition)
+        return user_id, batch, received, reason
+
+    def _push_deadline(self, user_id: int, partition: Partition):
+        partition.entry_id = next(self.entry_ids)
+        heapq.heappush(self.deadlines, (partition.oldest(), partition.entry_id, user_id))
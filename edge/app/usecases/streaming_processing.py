@@ -0,0 +1,104 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from app.entities.agent_data_batch import AgentDataBatch
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+from app.usecases.data_processing import process_agent_data_batch
+
+
+@dataclass
+class VehicleStream:
+    # Already emitted samples kept as leading context
+    history: AgentDataBatch
+    # Received samples that are not emitted yet
+    pending: AgentDataBatch
+    last_seen: float
+
+
+class StreamingAgentDataProcessor:
+    """
+    Processes agent data as a continuous stream per vehicle instead of isolated batches.
+    The last `context` samples of every vehicle are held back until enough following
+    samples arrive, and the same number of already emitted samples is kept as leading
+    context, so peaks near batch boundaries are detected as in one long signal.
+    Every sample is emitted exactly once, delayed by at most `context` samples.
+    Memory is bounded: streams are kept in least recently seen order, and a vehicle is
+    flushed and forgotten when it is idle for idle_timeout seconds or when more than
+    max_vehicles vehicles are tracked.
+    """
+
+    def __init__(self, context: int = 32, max_vehicles: int = 10000, idle_timeout: Optional[float] = None):
+        self.context = context
+        self.max_vehicles = max_vehicles
+        self.idle_timeout = idle_timeout
+        self.streams: OrderedDict[int, VehicleStream] = OrderedDict()
+        self.evicted = 0
+
+    def process(self, batch: AgentDataBatch, now: float = None) -> ProcessedAgentDataBatch:
+        """
+        Adds samples to the streams of their vehicles.
+        Returns:
+            ProcessedAgentDataBatch: Samples that have enough trailing context to be classified,
+            including the pending samples of vehicles evicted to stay within max_vehicles.
+        """
+        now = time.monotonic() if now is None else now
+        processed_batches = [
+            self._process_user(user_id, user_batch, self.context, now)
+            for user_id, user_batch in batch.split_by_user().items()
+        ]
+        while len(self.streams) > self.max_vehicles:
+            processed_batches.append(self._evict(next(iter(self.streams))))
+        return ProcessedAgentDataBatch.concat(processed_batches)
+
+    def flush(self) -> ProcessedAgentDataBatch:
+        """Emits every pending sample without waiting for trailing context"""
+        return ProcessedAgentDataBatch.concat([
+            self._process_user(user_id, AgentDataBatch.empty(), 0, stream.last_seen)
+            for user_id, stream in list(self.streams.items())
+            if len(stream.pending)
+        ])
+
+    def next_idle_deadline(self) -> Optional[float]:
+        """When the least recently seen vehicle becomes idle, None if idle vehicles are kept"""
+        if not self.streams or self.idle_timeout is None:
+            return None
+        return next(iter(self.streams.values())).last_seen + self.idle_timeout
+
+    def evict_idle(self, now: float = None) -> ProcessedAgentDataBatch:
+        """Flushes and forgets the vehicles that sent nothing for idle_timeout seconds"""
+        now = time.monotonic() if now is None else now
+        processed_batches = []
+        while True:
+            deadline = self.next_idle_deadline()
+            if deadline is None or deadline > now:
+                break
+            processed_batches.append(self._evict(next(iter(self.streams))))
+        return ProcessedAgentDataBatch.concat(processed_batches)
+
+    def _evict(self, user_id: int) -> ProcessedAgentDataBatch:
+        stream = self.streams[user_id]
+        processed_batch = self._process_user(user_id, AgentDataBatch.empty(), 0, stream.last_seen)
+        del self.streams[user_id]
+        self.evicted += 1
+        return processed_batch
+
+    def _process_user(self, user_id: int, batch: AgentDataBatch, context_after: int, now: float) -> ProcessedAgentDataBatch:
+        stream = self.streams.get(user_id)
+        if stream is None:
+            stream = self.streams[user_id] = VehicleStream(AgentDataBatch.empty(), AgentDataBatch.empty(), now)
+        elif len(batch):
+            stream.last_seen = now
+            self.streams.move_to_end(user_id)
+
+        history_length = len(stream.history)
+        window = AgentDataBatch.concat([part for part in (stream.history, stream.pending, batch) if len(part)])
+        end = len(window) - context_after
+        if end <= history_length:
+            stream.pending = window[history_length:]
+            return ProcessedAgentDataBatch.empty()
+
+        processed_batch = process_agent_data_batch(window, context_before=history_length, context_after=context_after)
+        stream.history = window[max(0, end - self.context):end]
+        stream.pending = window[end:]
+        return processed_batch
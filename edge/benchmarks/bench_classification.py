@@ -0,0 +1,76 @@
+"""
+Benchmark of the humidex and wind chill classification: the previous per-item
+Python loops against the vectorized NumPy functions of data_processing.
+Run from the edge directory: python benchmarks/bench_classification.py
+"""
+import os
+import sys
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from scipy.signal import find_peaks
+from app.entities.processed_agent_data_batch import HUMIDEX_STATES, WIND_CHILL_STATES
+from app.usecases.data_processing import classify_humidex, classify_wind_chill
+
+BATCH_SIZES = (100, 10_000, 1_000_000)
+
+
+def classify_humidex_loop(temperatures, humidities):
+    states = []
+    for temperature, humidity in zip(temperatures, humidities):
+        e = 6.112 * 10.0 ** (7.5 * temperature / (237.7 + temperature)) * humidity / 100.0
+        humidex = temperature + 5.0 / 9.0 * (e - 10)
+        if humidex > 45:
+            states.append("dangerous")
+        elif humidex > 40:
+            states.append("great discomfort")
+        elif humidex > 30:
+            states.append("some discomfort")
+        elif humidex > 20:
+            states.append("comfortable")
+        else:
+            states.append("undefined")
+    return states
+
+
+def classify_wind_chill_loop(temperatures, speeds):
+    states = ["normal"] * len(speeds)
+    for idx in find_peaks(speeds, height=25, distance=10)[0]:
+        temperature = temperatures[idx]
+        speed_km_p_h = speeds[idx] * 3600 / 1000
+        wind_chill = 13.12 + 0.6215 * temperature - 11.37 * speed_km_p_h ** 0.16 + 0.3965 * temperature * speed_km_p_h ** 0.16
+        states[idx] = "strong chill wind" if wind_chill < -10 else "strong wind"
+    return states
+
+
+def measure(function, *args) -> float:
+    number = max(1, 100_000 // len(args[0]))
+    return min(timeit.repeat(lambda: function(*args), number=number, repeat=3)) / number
+
+
+def main():
+    rng = np.random.default_rng(1)
+    print(f"{'batch':>9} {'humidex loop':>14} {'vectorized':>14} {'wind loop':>14} {'vectorized':>14}  samples/s")
+    for batch_size in BATCH_SIZES:
+        temperatures = rng.uniform(-30, 45, batch_size)
+        humidities = rng.uniform(0, 100, batch_size)
+        speeds = rng.uniform(0, 40, batch_size)
+        # Missing readings are undefined in both versions
+        temperatures[::97] = np.nan
+
+        assert HUMIDEX_STATES[classify_humidex(temperatures, humidities)].tolist() == classify_humidex_loop(temperatures, humidities)
+        assert WIND_CHILL_STATES[classify_wind_chill(temperatures, speeds)].tolist() == classify_wind_chill_loop(temperatures, speeds)
+
+        results = [
+            batch_size / measure(classify_humidex_loop, temperatures, humidities),
+            batch_size / measure(classify_humidex, temperatures, humidities),
+            batch_size / measure(classify_wind_chill_loop, temperatures, speeds),
+            batch_size / measure(classify_wind_chill, temperatures, speeds),
+        ]
+        print(f"{batch_size:>9} " + " ".join(f"{result:>14.0f}" for result in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of decoding agent JSON messages into an AgentDataBatch: the previous path
+(decode to str, validate AgentData models, copy the fields into columns) against the
+fast path of AgentMQTTAdapter.decode_payload (validate the bytes into plain dicts with
+cached TypeAdapters, then build the columns).
+For every message shape it prints the decode time and the share of one core needed
+to keep up with RATE messages per second.
+Run from the edge directory: python benchmarks/bench_decode.py
+"""
+import json
+import os
+import sys
+import timeit
+import numpy as np
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+from app.entities.agent_data import AgentData
+from app.entities.agent_data_batch import AgentDataBatch
+
+RATE = 10_000
+ENVELOPE_SIZES = (1, 10, 100)
+
+agent_data_list_adapter = TypeAdapter(list[AgentData])
+
+
+def decode_payload_models(payload: bytes) -> AgentDataBatch:
+    text: str = payload.decode("utf-8")
+    if text.lstrip().startswith("["):
+        return AgentDataBatch.from_columns(**columns(agent_data_list_adapter.validate_json(text, strict=True)))
+    return AgentDataBatch.from_columns(**columns([AgentData.model_validate_json(text, strict=True)]))
+
+
+def columns(agent_data_list: list[AgentData]) -> dict:
+    # Per-field list comprehensions and np.array(datetimes), as before the fast path
+    return dict(
+        user_id=[agent_data.user_id for agent_data in agent_data_list],
+        x=[agent_data.accelerometer.x for agent_data in agent_data_list],
+        y=[agent_data.accelerometer.y for agent_data in agent_data_list],
+        z=[agent_data.accelerometer.z for agent_data in agent_data_list],
+        latitude=[agent_data.gps.latitude for agent_data in agent_data_list],
+        longitude=[agent_data.gps.longitude for agent_data in agent_data_list],
+        temperature=[agent_data.humidex.temperature for agent_data in agent_data_list],
+        humidity=[agent_data.humidex.humidity for agent_data in agent_data_list],
+        speed=[agent_data.anemometer.speed for agent_data in agent_data_list],
+        direction=[agent_data.anemometer.direction for agent_data in agent_data_list],
+        timestamp=[agent_data.timestamp for agent_data in agent_data_list],
+        timestamp_aware=[False for _ in agent_data_list],
+    )
+
+
+def make_payload(size: int) -> bytes:
+    rng = np.random.default_rng(1)
+    records = [
+        {
+            "user_id": 1,
+            "accelerometer": {"x": float(x), "y": float(y), "z": float(z)},
+            "gps": {"latitude": 50.4501, "longitude": 30.5234},
+            "humidex": {"temperature": 22.5, "humidity": 55.0},
+            "anemometer": {"speed": 5.0, "direction": 90.0},
+            "timestamp": f"2024-01-01T12:00:{i % 60:02d}.{i:06d}",
+        }
+        for i, (x, y, z) in enumerate(rng.normal((0, 0, 16500), 100, (size, 3)))
+    ]
+    return json.dumps(records[0] if size == 1 else records).encode("utf-8")
+
+
+def measure(function, payload: bytes) -> float:
+    number = 2000
+    return min(timeit.repeat(lambda: function(payload), number=number, repeat=3)) / number
+
+
+def main():
+    print(f"{'records/msg':>11} {'models us/msg':>14} {'fast us/msg':>12} {'speedup':>8} "
+          f"{'core @ ' + str(RATE) + ' msg/s':>20}")
+    for size in ENVELOPE_SIZES:
+        payload = make_payload(size)
+        assert decode_payload_models(payload).to_agent_data_list() == AgentMQTTAdapter.decode_payload(payload).to_agent_data_list()
+        models = measure(decode_payload_models, payload)
+        fast = measure(AgentMQTTAdapter.decode_payload, payload)
+        print(f"{size:>11} {models * 1e6:>14.1f} {fast * 1e6:>12.1f} {models / fast:>7.1f}x "
+              f"{models * RATE:>9.0%} -> {fast * RATE:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark of sending processed batches to a local stub hub: a new connection per
+request (plain requests.post) against the pooled HubHttpAdapter at several concurrencies.
+The stub answers every request after HUB_LATENCY seconds, like a hub doing some work.
+Batches use the binary wire format, so the numbers show the transport rather than
+the JSON serialization.
+Run from the edge directory: python benchmarks/bench_hub_http.py
+"""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.adapters.hub_http_adapter import HubHttpAdapter
+from app.adapters.wire_codec import CONTENT_TYPE, dump_processed_agent_data_batch
+from app.entities.agent_data_batch import AgentDataBatch
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+
+REQUESTS = 500
+BATCH_SIZE = 100
+HUB_LATENCY = 0.002
+CONCURRENCIES = (1, 4, 16)
+
+
+class StubHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(HUB_LATENCY)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_batch(size: int) -> ProcessedAgentDataBatch:
+    rng = np.random.default_rng(1)
+    agent_data = AgentDataBatch.from_columns(
+        user_id=np.ones(size),
+        x=rng.normal(0, 50, size), y=rng.normal(0, 50, size), z=rng.normal(16500, 100, size),
+        latitude=np.full(size, 50.45), longitude=np.full(size, 30.52),
+        temperature=np.full(size, 22.0), humidity=np.full(size, 55.0),
+        speed=np.full(size, 5.0), direction=np.full(size, 90.0),
+        timestamp=np.datetime64("2024-01-01") + np.arange(size).astype("timedelta64[s]"),
+        timestamp_aware=np.zeros(size, dtype=bool),
+    )
+    codes = np.zeros(size, dtype=np.uint8)
+    return ProcessedAgentDataBatch(agent_data, codes, codes, codes)
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    batch = make_batch(BATCH_SIZE)
+
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        requests.post(
+            f"{url}/processed_agent_data/",
+            data=dump_processed_agent_data_batch(batch, "binary"),
+            headers={"Content-Type": CONTENT_TYPE},
+        )
+    print(f"{'requests.post per request':>28}: {REQUESTS / (time.perf_counter() - started):8.0f} requests/s")
+
+    for concurrency in CONCURRENCIES:
+        adapter = HubHttpAdapter(url, wire_format="binary", concurrency=concurrency)
+        started = time.perf_counter()
+        for _ in range(REQUESTS):
+            adapter.save_batch(batch)
+        adapter.close()
+        elapsed = time.perf_counter() - started
+        assert adapter.stats()["sent_total"] == REQUESTS
+        print(f"{f'pooled, concurrency {concurrency}':>28}: {REQUESTS / elapsed:8.0f} requests/s")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark suite of the edge hot path on generated inputs:
+    process_agent_data        the per-sample path over AgentData models
+    process_agent_data_batch  columnar processing, per vehicle of the batch
+    decode_json               AgentMQTTAdapter.decode_payload of JSON envelopes of 100 records
+across batch sizes and fleet mixes (vehicles interleaved in one batch).
+For every case it prints the throughput in samples/s and the peak memory allocated
+by one run (tracemalloc, which NumPy reports its buffers to).
+
+Inputs come from fixed seeds and every case takes the best of several repeats, so runs
+on one machine are comparable. With --baseline the results are compared to a saved
+run and the script exits with 1 when a case got slower than the allowed regression.
+Baselines are machine specific, save one on the machine that runs the check:
+    python benchmarks/bench_processing.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_processing.py --baseline benchmarks/baseline.json --max-regression 0.2
+Run from the edge directory.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+from app.entities.agent_data_batch import AgentDataBatch
+from app.usecases.data_processing import process_agent_data, process_agent_data_batch
+
+BATCH_SIZES = (100, 1_000, 10_000)
+# Vehicles sending the samples of one batch
+FLEET_MIXES = {"single": 1, "fleet-10": 10, "fleet-100": 100}
+ENVELOPE_SIZE = 100
+
+
+def make_batch(samples: int, vehicles: int, seed: int = 1) -> AgentDataBatch:
+    """Vehicles drive calm roads with a pothole and a bump every 200 samples, each sends consecutive samples"""
+    rng = np.random.default_rng(seed)
+    per_vehicle = -(-samples // vehicles)
+    position = np.arange(per_vehicle) % 200
+    shape = np.sin(np.pi * np.arange(40) / 40)
+    road = np.zeros(200)
+    road[60:100] -= 8000 * shape
+    road[150:190] += 4000 * shape
+    z = (rng.normal(16500, 100, (vehicles, per_vehicle)) + road[position]).ravel()[:samples]
+    user_id = np.repeat(np.arange(vehicles), per_vehicle)[:samples]
+    step = np.tile(np.arange(per_vehicle), vehicles)[:samples]
+    return AgentDataBatch.from_columns(
+        user_id=user_id,
+        x=rng.normal(0, 100, samples),
+        y=rng.normal(0, 100, samples),
+        z=z,
+        latitude=50.45 + user_id * 0.01 + step * 1e-5,
+        longitude=30.52 + step * 1e-5,
+        temperature=rng.uniform(-30, 45, samples),
+        humidity=rng.uniform(0, 100, samples),
+        speed=rng.uniform(0, 40, samples),
+        direction=rng.uniform(0, 360, samples),
+        timestamp=np.datetime64("2024-01-01T00:00:00", "us") + step * np.timedelta64(100, "ms"),
+        timestamp_aware=np.zeros(samples, dtype=bool),
+    )
+
+
+def make_envelopes(batch: AgentDataBatch) -> list[bytes]:
+    records = [agent_data.model_dump(mode="json") for agent_data in batch.to_agent_data_list()]
+    return [json.dumps(records[start:start + ENVELOPE_SIZE]).encode("utf-8") for start in range(0, len(records), ENVELOPE_SIZE)]
+
+
+def run_process_agent_data(agent_data_list):
+    return [process_agent_data(agent_data) for agent_data in agent_data_list]
+
+
+def run_process_agent_data_batch(batch: AgentDataBatch):
+    return [process_agent_data_batch(vehicle_batch) for vehicle_batch in batch.split_by_user().values()]
+
+
+def run_decode_json(envelopes: list[bytes]):
+    return [AgentMQTTAdapter.decode_payload(payload) for payload in envelopes]
+
+
+def measure(function, argument, samples: int, repeat: int) -> tuple[float, int]:
+    """(samples/s of the best repeat, peak bytes allocated by one run)"""
+    number = max(1, 20_000 // samples)
+    function(argument)
+    # CPU time of the process, less disturbed by other load on the machine than wall time
+    seconds = min(timeit.repeat(lambda: function(argument), timer=time.process_time, number=number, repeat=repeat)) / number
+    tracemalloc.start()
+    function(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return samples / seconds, peak
+
+
+def cases():
+    for batch_size in BATCH_SIZES:
+        for fleet, vehicles in FLEET_MIXES.items():
+            if vehicles > batch_size // 10:
+                continue
+            batch = make_batch(batch_size, vehicles)
+            yield "process_agent_data_batch", batch_size, fleet, run_process_agent_data_batch, batch
+            yield "decode_json", batch_size, fleet, run_decode_json, make_envelopes(batch)
+            if batch_size <= 1_000:
+                # The per-sample path is slow, larger batches add nothing
+                yield "process_agent_data", batch_size, fleet, run_process_agent_data, batch.to_agent_data_list()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=7, help="repeats per case, the best one counts")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare to")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed throughput drop against the baseline")
+    parser.add_argument("--save-baseline", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    results = {}
+    regressions = []
+    print(f"{'case':<26} {'batch':>6} {'fleet':<10} {'samples/s':>12} {'peak MiB':>9} {'vs baseline':>12}")
+    for name, batch_size, fleet, function, argument in cases():
+        key = f"{name}/{batch_size}/{fleet}"
+        throughput, peak = measure(function, argument, batch_size, args.repeat)
+        results[key] = {"samples_per_second": round(throughput), "peak_bytes": peak}
+        change = ""
+        if key in baseline:
+            ratio = throughput / baseline[key]["samples_per_second"]
+            change = f"{ratio - 1:+.0%}"
+            if ratio < 1 - args.max_regression:
+                regressions.append(f"{key}: {throughput:.0f} samples/s, baseline {baseline[key]['samples_per_second']}")
+        print(f"{name:<26} {batch_size:>6} {fleet:<10} {throughput:>12.0f} {peak / 2 ** 20:>9.2f} {change:>12}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(results, file, indent=2)
+    if regressions:
+        print(f"Throughput dropped more than {args.max_regression:.0%}:\n    " + "\n    ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
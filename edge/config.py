@@ -8,19 +8,77 @@ def try_parse_int(value: str):
         return None
 
 
+def try_parse_float(value: str):
+    try:
+        return float(value)
+    except Exception:
+        return None
+
+
 # Configuration for agent MQTT
 MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "localhost"
 MQTT_BROKER_PORT = try_parse_int(os.environ.get("MQTT_BROKER_PORT")) or 1883
 MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "agent_data_topic"
+# Sharding: the agents publish every vehicle to MQTT_TOPIC/{user_id % TOPIC_PARTITIONS} (0 disables it)
+# and EDGE_INSTANCES edge instances split the partitions, this one is number EDGE_INSTANCE from 0
+TOPIC_PARTITIONS = try_parse_int(os.environ.get("TOPIC_PARTITIONS")) or 0
+EDGE_INSTANCES = try_parse_int(os.environ.get("EDGE_INSTANCES")) or 1
+EDGE_INSTANCE = try_parse_int(os.environ.get("EDGE_INSTANCE")) or 0
 
 # Configuration for hub MQTT
 HUB_MQTT_BROKER_HOST = os.environ.get("HUB_MQTT_BROKER_HOST") or "localhost"
 HUB_MQTT_BROKER_PORT = try_parse_int(os.environ.get("HUB_MQTT_BROKER_PORT")) or 1883
 HUB_MQTT_TOPIC = os.environ.get("HUB_MQTT_TOPIC") or "processed_data_topic"
 
+# Vehicles tracked by the edge at most, the least recently seen one is flushed and forgotten first
+MAX_VEHICLES = try_parse_int(os.environ.get("MAX_VEHICLES")) or 10000
+# Vehicles that sent nothing for this long are flushed and forgotten
+VEHICLE_IDLE_TIMEOUT_S = try_parse_int(os.environ.get("VEHICLE_IDLE_TIMEOUT_S")) or 60
+
+# Forward only anomalies, state changes and a simplified track of the normal samples
+DATA_REDUCTION = (os.environ.get("DATA_REDUCTION") or "").lower() in ("1", "true", "yes", "on")
+# Largest distance in meters of a dropped normal sample from the forwarded track
+TRACK_TOLERANCE_M = try_parse_float(os.environ.get("TRACK_TOLERANCE_M")) or 5.0
+
 # Configuration for the Hub
 HUB_HOST = os.environ.get("HUB_HOST") or "localhost"
 HUB_PORT = try_parse_int(os.environ.get("HUB_PORT")) or 8000
 HUB_URL = f"http://{HUB_HOST}:{HUB_PORT}"
+# Requests sent to the Hub API at the same time, each over its own keep-alive connection
+HUB_HTTP_CONCURRENCY = try_parse_int(os.environ.get("HUB_HTTP_CONCURRENCY")) or 4
+# Retries of failed Hub API requests, the backoff doubles with every retry and is jittered
+HUB_HTTP_RETRIES = try_parse_int(os.environ.get("HUB_HTTP_RETRIES")) or 3
+HUB_HTTP_BACKOFF_MS = try_parse_int(os.environ.get("HUB_HTTP_BACKOFF_MS")) or 100
+
+# Directory of the durable outbox for batches the hub could not take, disabled when empty
+OUTBOX_DIR = os.environ.get("OUTBOX_DIR") or ""
+# Size of one outbox segment file and the cap of the whole outbox in bytes
+OUTBOX_SEGMENT_SIZE = try_parse_int(os.environ.get("OUTBOX_SEGMENT_SIZE")) or 16 * 1024 * 1024
+OUTBOX_MAX_SIZE = try_parse_int(os.environ.get("OUTBOX_MAX_SIZE")) or 1024 * 1024 * 1024
+# Outbox appends are fsynced after this many batches or this long, whatever comes first
+OUTBOX_FSYNC_BATCH = try_parse_int(os.environ.get("OUTBOX_FSYNC_BATCH")) or 100
+OUTBOX_FSYNC_MS = try_parse_int(os.environ.get("OUTBOX_FSYNC_MS")) or 1000
+# Batches per second replayed from the outbox once the hub is back
+OUTBOX_REPLAY_RATE = try_parse_int(os.environ.get("OUTBOX_REPLAY_RATE")) or 20
 
 BATCH_SIZE = try_parse_int(os.environ.get("BATCH_SIZE")) or 100
+# A batch is processed when it reaches BATCH_SIZE or when its oldest message waited this long
+MAX_BATCH_DELAY_MS = try_parse_int(os.environ.get("MAX_BATCH_DELAY_MS")) or 500
+# Number of samples carried between batches of a vehicle as context for peak detection
+DETECTOR_CONTEXT = try_parse_int(os.environ.get("DETECTOR_CONTEXT")) or 32
+
+# Receive pipeline: bounded queue of raw messages between the MQTT thread and the decode workers
+PIPELINE_QUEUE_SIZE = try_parse_int(os.environ.get("PIPELINE_QUEUE_SIZE")) or 1000
+# Number of decode workers, defaults to the number of cores
+PIPELINE_WORKERS = try_parse_int(os.environ.get("PIPELINE_WORKERS")) or os.cpu_count() or 1
+# What to do when the queue is full: "block" (slows down the MQTT reads), "drop_newest" or "drop_oldest"
+BACKPRESSURE = os.environ.get("BACKPRESSURE") or "block"
+
+# Format of the data sent to the hub: "json" or "binary" (see app/adapters/wire_codec.py)
+WIRE_FORMAT = os.environ.get("WIRE_FORMAT") or "json"
+# Compression of the messages sent to the hub: "none", "gzip" or "zstd" (needs the zstandard package)
+HUB_COMPRESSION = os.environ.get("HUB_COMPRESSION") or "none"
+
+# Health (/healthz) and readiness (/readyz) endpoints
+HEALTH_HOST = os.environ.get("HEALTH_HOST") or "0.0.0.0"
+HEALTH_PORT = try_parse_int(os.environ.get("HEALTH_PORT")) or 8080
@@ -1,18 +1,102 @@
+import asyncio
 import logging
-from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+import signal
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter, subscription_topics
+from app.adapters.asyncio_mqtt import AsyncioMqttHelper
+from app.adapters.health_server import HealthServer
 from app.adapters.hub_http_adapter import HubHttpAdapter
 from app.adapters.hub_mqtt_adapter import HubMqttAdapter
+from app.adapters.hub_outbox import BufferedHubGateway, HubOutbox
+from app.interfaces.hub_gateway import HubGateway
+from app.metrics import MetricsRegistry
+from app.usecases.data_reduction import TrackReducer
+from app.usecases.streaming_processing import StreamingAgentDataProcessor
 from config import (
     MQTT_BROKER_HOST,
     MQTT_BROKER_PORT,
     MQTT_TOPIC,
+    TOPIC_PARTITIONS,
+    EDGE_INSTANCES,
+    EDGE_INSTANCE,
     HUB_URL,
+    HUB_HTTP_CONCURRENCY,
+    HUB_HTTP_RETRIES,
+    HUB_HTTP_BACKOFF_MS,
     HUB_MQTT_BROKER_HOST,
     HUB_MQTT_BROKER_PORT,
     HUB_MQTT_TOPIC,
-    BATCH_SIZE
+    OUTBOX_DIR,
+    OUTBOX_SEGMENT_SIZE,
+    OUTBOX_MAX_SIZE,
+    OUTBOX_FSYNC_BATCH,
+    OUTBOX_FSYNC_MS,
+    OUTBOX_REPLAY_RATE,
+    BATCH_SIZE,
+    MAX_BATCH_DELAY_MS,
+    DETECTOR_CONTEXT,
+    MAX_VEHICLES,
+    VEHICLE_IDLE_TIMEOUT_S,
+    DATA_REDUCTION,
+    TRACK_TOLERANCE_M,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_WORKERS,
+    BACKPRESSURE,
+    WIRE_FORMAT,
+    HUB_COMPRESSION,
+    HEALTH_HOST,
+    HEALTH_PORT,
 )
 
+
+async def run(agent_adapter: AgentMQTTAdapter, hub_adapter: HubGateway):
+    """
+    Runs the edge on an asyncio event loop until SIGINT or SIGTERM.
+    The agent MQTT client is driven by the loop, so an idle edge sleeps instead of spinning.
+    Next to the health endpoints, /metrics exports the pipeline metrics for Prometheus.
+    On shutdown the MQTT client disconnects first, then the pipeline processes what is
+    buffered and the hub gateway sends what is in flight.
+    """
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stopped.set)
+        except NotImplementedError:
+            # Windows event loops have no signal handlers
+            signal.signal(signum, lambda *_: loop.call_soon_threadsafe(stopped.set))
+
+    health_server = HealthServer(
+        HEALTH_HOST,
+        HEALTH_PORT,
+        liveness={"pipeline": agent_adapter.is_alive},
+        readiness={"agent_mqtt": agent_adapter.is_ready, "hub": hub_adapter.is_ready},
+    )
+    metrics = MetricsRegistry("edge")
+    agent_adapter.register_metrics(metrics)
+    hub_adapter.register_metrics(metrics)
+    health_server.add_route("/metrics", lambda: (200, MetricsRegistry.CONTENT_TYPE, metrics.render().encode("utf-8")))
+    await health_server.start()
+
+    mqtt_helper = AsyncioMqttHelper(loop, agent_adapter.client)
+    # on_message runs on the loop, blocking backpressure pauses reading the socket instead
+    agent_adapter.flow_control = mqtt_helper
+    agent_adapter.start_pipeline()
+    try:
+        # Connect to the MQTT broker and start listening for messages
+        agent_adapter.connect()
+    except OSError as e:
+        logging.info(f"Failed to connect to MQTT broker: {e}, retrying in the background")
+    mqtt_helper.start()
+
+    await stopped.wait()
+    logging.info("Stopping, flushing pending batches")
+    await mqtt_helper.stop()
+    await loop.run_in_executor(None, agent_adapter.stop_pipeline)
+    await loop.run_in_executor(None, hub_adapter.close)
+    await health_server.stop()
+    logging.info("System stopped.")
+
+
 if __name__ == "__main__":
     # Configure logging settings
     logging.basicConfig(
@@ -26,28 +110,48 @@ if __name__ == "__main__":
     # Create an instance of the StoreApiAdapter using the configuration
     # hub_adapter = HubHttpAdapter(
     #     api_base_url=HUB_URL,
+    #     wire_format=WIRE_FORMAT,
+    #     compression=HUB_COMPRESSION,
+    #     concurrency=HUB_HTTP_CONCURRENCY,
+    #     retries=HUB_HTTP_RETRIES,
+    #     backoff=HUB_HTTP_BACKOFF_MS / 1000,
     # )
     hub_adapter = HubMqttAdapter(
         broker=HUB_MQTT_BROKER_HOST,
         port=HUB_MQTT_BROKER_PORT,
         topic=HUB_MQTT_TOPIC,
+        wire_format=WIRE_FORMAT,
+        compression=HUB_COMPRESSION,
     )
+    if OUTBOX_DIR:
+        # Keep what the hub cannot take on disk and replay it once the hub is back
+        hub_adapter = BufferedHubGateway(
+            hub_adapter,
+            HubOutbox(
+                OUTBOX_DIR,
+                segment_size=OUTBOX_SEGMENT_SIZE,
+                max_size=OUTBOX_MAX_SIZE,
+                fsync_interval=OUTBOX_FSYNC_MS / 1000,
+                fsync_batch=OUTBOX_FSYNC_BATCH,
+            ),
+            rate=OUTBOX_REPLAY_RATE,
+        )
     # Create an instance of the AgentMQTTAdapter using the configuration
     agent_adapter = AgentMQTTAdapter(
         broker_host=MQTT_BROKER_HOST,
         broker_port=MQTT_BROKER_PORT,
-        topic=MQTT_TOPIC,
+        topic=subscription_topics(MQTT_TOPIC, TOPIC_PARTITIONS, EDGE_INSTANCES, EDGE_INSTANCE),
         hub_gateway=hub_adapter,
-        batch_size=BATCH_SIZE
+        batch_size=BATCH_SIZE,
+        max_batch_delay=MAX_BATCH_DELAY_MS / 1000,
+        processor=StreamingAgentDataProcessor(
+            context=DETECTOR_CONTEXT,
+            max_vehicles=MAX_VEHICLES,
+            idle_timeout=VEHICLE_IDLE_TIMEOUT_S,
+        ),
+        reducer=TrackReducer(tolerance=TRACK_TOLERANCE_M, max_vehicles=MAX_VEHICLES) if DATA_REDUCTION else None,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        workers=PIPELINE_WORKERS,
+        backpressure=BACKPRESSURE,
     )
-    try:
-        # Connect to the MQTT broker and start listening for messages
-        agent_adapter.connect()
-        agent_adapter.start()
-        # Keep the system running indefinitely (you can add other logic as needed)
-        while True:
-            pass
-    except KeyboardInterrupt:
-        # Stop the MQTT adapter and exit gracefully if interrupted by the user
-        agent_adapter.stop()
-        logging.info("System stopped.")
+    asyncio.run(run(agent_adapter, hub_adapter))
@@ -0,0 +1,183 @@
+import json
+import time
+import unittest
+from unittest.mock import Mock, patch
+from pydantic import ValidationError
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter, subscription_topics
+from app.adapters.wire_codec import encode_agent_data
+from app.entities.agent_data import AgentData
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+from app.interfaces.hub_gateway import HubGateway
+from app.usecases.data_processing import process_agent_data_batch
+from tests.test_data_processing import make_drive
+
+
+def make_agent_data(user_id=1, z=16500.0):
+    return {
+        "user_id": user_id,
+        "accelerometer": {"x": 0.1, "y": 0.2, "z": z},
+        "gps": {"latitude": 10.123, "longitude": 20.456},
+        "humidex": {"temperature": 22.5, "humidity": 50.0},
+        "anemometer": {"speed": 5.0, "direction": 90.0},
+        "timestamp": "2023-07-21T12:34:56Z",
+    }
+
+
+class TestAgentMQTTAdapter(unittest.TestCase):
+    def setUp(self):
+        self.mock_hub_gateway = Mock(spec=HubGateway)
+        self.mock_hub_gateway.save_batch.return_value = True
+        with patch("app.adapters.agent_mqtt_adapter.mqtt.Client"):
+            self.agent_adapter = AgentMQTTAdapter(
+                broker_host="test_broker",
+                broker_port=1234,
+                topic="test_topic",
+                hub_gateway=self.mock_hub_gateway,
+                batch_size=3,
+                max_batch_delay=0.05,
+            )
+        self.agent_adapter.start_pipeline()
+
+    def tearDown(self):
+        self.agent_adapter.stop_pipeline()
+
+    def saved_samples(self):
+        return sum(len(call.args[0]) for call in self.mock_hub_gateway.save_batch.call_args_list)
+
+    def test_on_message_single_records(self):
+        for _ in range(3):
+            mock_msg = Mock(payload=json.dumps(make_agent_data()).encode("utf-8"))
+            self.agent_adapter.on_message(None, None, mock_msg)
+        # The processor holds the samples back as context until it is stopped
+        self.agent_adapter.stop_pipeline()
+        self.assertEqual(self.saved_samples(), 3)
+        self.assertEqual(len(self.agent_adapter.batcher), 0)
+
+    def test_on_message_batch_envelope(self):
+        envelope = json.dumps([make_agent_data(z=16500.0 + i) for i in range(3)])
+        self.agent_adapter.on_message(None, None, Mock(payload=envelope.encode("utf-8")))
+        self.agent_adapter.stop_pipeline()
+        self.assertEqual(self.saved_samples(), 3)
+        self.assertEqual(self.mock_hub_gateway.save_batch.call_count, 1)
+        saved = self.mock_hub_gateway.save_batch.call_args.args[0]
+        self.assertEqual(saved.agent_data.z.tolist(), [16500.0, 16501.0, 16502.0])
+        self.assertEqual({stage: histogram.count for stage, histogram in self.agent_adapter.stage_latency.items()},
+                         {"queue": 1, "decode": 1, "process": 1, "publish": 1})
+        self.assertEqual(self.agent_adapter.batch_size_histogram.sum, 3)
+        self.assertEqual(self.agent_adapter.stats()["published_samples_total"], 3)
+
+    def test_on_message_invalid_data(self):
+        invalid_json_data = '[{"user_id": 1, "accelerometer": {"x": 0.1, "y": 0.2}}]'
+        self.agent_adapter.on_message(None, None, Mock(payload=invalid_json_data.encode("utf-8")))
+        self.agent_adapter.join()
+        self.mock_hub_gateway.save_batch.assert_not_called()
+        self.assertEqual(len(self.agent_adapter.batcher), 0)
+        self.assertEqual(self.agent_adapter.stats()["decode_errors_total"], 1)
+
+    def test_decode_payload_matches_model_validation(self):
+        records = [make_agent_data(user_id=1), dict(make_agent_data(user_id=2), timestamp="2023-07-21T15:34:56.5+03:00")]
+        for payload in (json.dumps(records), " \n" + json.dumps(records)):
+            batch = AgentMQTTAdapter.decode_payload(payload.encode("utf-8"))
+            expected = [AgentData.model_validate(record) for record in records]
+            self.assertEqual(batch.to_agent_data_list(), expected)
+        self.assertEqual(batch.timestamp.astype(str).tolist(), ["2023-07-21T12:34:56.000000", "2023-07-21T12:34:56.500000"])
+        with self.assertRaises(ValidationError):
+            AgentMQTTAdapter.decode_payload(json.dumps(dict(make_agent_data(), user_id="1")).encode("utf-8"))
+
+    def test_backpressure_drops_when_queue_is_full(self):
+        for backpressure, expected in (("drop_newest", b"1"), ("drop_oldest", b"2")):
+            with patch("app.adapters.agent_mqtt_adapter.mqtt.Client"):
+                adapter = AgentMQTTAdapter(
+                    "test_broker", 1234, "test_topic", self.mock_hub_gateway, queue_size=1, backpressure=backpressure
+                )
+            adapter.on_message(None, None, Mock(payload=b"1"))
+            adapter.on_message(None, None, Mock(payload=b"2"))
+            self.assertEqual(adapter.stats()["dropped_total"], 1)
+            self.assertEqual(adapter.queue_depths()["received"], 1)
+            self.assertEqual(adapter.received_queue.get_nowait()[1], expected)
+
+    def test_block_pauses_reading_instead_of_blocking_the_event_loop(self):
+        with patch("app.adapters.agent_mqtt_adapter.mqtt.Client"):
+            adapter = AgentMQTTAdapter("test_broker", 1234, "test_topic", self.mock_hub_gateway, queue_size=1)
+        adapter.flow_control = flow_control = Mock()
+        flow_control.loop.call_soon_threadsafe.side_effect = lambda callback: callback()
+        # The pipeline is not running yet, a blocking put would never return
+        for i in range(3):
+            adapter.on_message(None, None, Mock(payload=json.dumps(make_agent_data(z=16500.0 + i)).encode("utf-8")))
+        flow_control.pause_reading.assert_called()
+        flow_control.resume_reading.assert_not_called()
+        self.assertEqual(adapter.queue_depths()["received"], 1)
+
+        adapter.start_pipeline()
+        adapter.stop_pipeline()
+        flow_control.resume_reading.assert_called()
+        saved = ProcessedAgentDataBatch.concat([call.args[0] for call in self.mock_hub_gateway.save_batch.call_args_list])
+        self.assertEqual(saved.agent_data.z.tolist(), [16500.0, 16501.0, 16502.0])
+
+    def test_partial_batch_is_flushed_by_age_and_on_stop(self):
+        self.agent_adapter.on_message(None, None, Mock(payload=json.dumps(make_agent_data()).encode("utf-8")))
+        self.agent_adapter.join()
+        time.sleep(0.2)
+        self.agent_adapter.join()
+        # Processed by the deadline, the processor holds the sample back until trailing context arrives
+        self.assertEqual(len(self.agent_adapter.batcher), 0)
+        self.assertEqual(self.agent_adapter.stats()["age_flushes_total"], 1)
+        self.assertEqual(self.agent_adapter.stats()["tracked_vehicles"], 1)
+        self.assertEqual(self.saved_samples(), 0)
+
+        self.agent_adapter.batcher.max_batch_delay = None
+        self.agent_adapter.on_message(None, None, Mock(payload=json.dumps(make_agent_data()).encode("utf-8")))
+        self.agent_adapter.stop_pipeline()
+        self.assertEqual(self.saved_samples(), 2)
+        self.assertEqual(self.agent_adapter.stats()["stop_flushes_total"], 1)
+        self.assertEqual(self.agent_adapter.buffer_latency.count, 2)
+        self.assertGreaterEqual(self.agent_adapter.buffer_latency.sum, 0.2)
+
+    def test_anomalies_are_detected_when_messages_are_slower_than_the_batch_delay(self):
+        drive = make_drive(user_id=1, samples=250, seed=1)
+        expected = process_agent_data_batch(drive).road_state
+        agent_data_list = drive.to_agent_data_list()
+        # Every message waits longer than max_batch_delay for the next one
+        for start in range(0, len(agent_data_list), 10):
+            self.agent_adapter.on_message(None, None, Mock(payload=encode_agent_data(agent_data_list[start:start + 10])))
+            time.sleep(0.06)
+        self.agent_adapter.stop_pipeline()
+
+        saved = ProcessedAgentDataBatch.concat([call.args[0] for call in self.mock_hub_gateway.save_batch.call_args_list])
+        self.assertGreater(self.agent_adapter.stats()["age_flushes_total"], 0)
+        self.assertEqual(saved.agent_data.to_agent_data_list(), agent_data_list)
+        self.assertEqual(saved.road_state.tolist(), expected.tolist())
+        self.assertIn(1, saved.road_state)
+        self.assertIn(2, saved.road_state)
+
+    def test_background_delivery_failures_are_counted(self):
+        hub_gateway = Mock(spec=HubGateway)
+        hub_gateway.on_failed = None
+        with patch("app.adapters.agent_mqtt_adapter.mqtt.Client"):
+            adapter = AgentMQTTAdapter("test_broker", 1234, "test_topic", hub_gateway)
+        # A gateway sending in the background reports the failure after save_batch returned True
+        hub_gateway.on_failed(ProcessedAgentDataBatch.empty())
+        self.assertEqual(adapter.stats()["publish_failures_total"], 1)
+
+        hub_gateway.on_failed = handler = Mock()
+        with patch("app.adapters.agent_mqtt_adapter.mqtt.Client"):
+            AgentMQTTAdapter("test_broker", 1234, "test_topic", hub_gateway)
+        self.assertIs(hub_gateway.on_failed, handler)
+
+    def test_instances_split_the_topic_partitions(self):
+        self.assertEqual(subscription_topics("agent"), ["agent"])
+        shards = [subscription_topics("agent", partitions=8, instances=3, instance=i) for i in range(3)]
+        self.assertEqual(shards[0], ["agent/0", "agent/3", "agent/6"])
+        self.assertEqual(sorted(sum(shards, [])), sorted(f"agent/{p}" for p in range(8)))
+        for partitions, instances in ((0, 2), (2, 3)):
+            with self.assertRaises(ValueError):
+                subscription_topics("agent", partitions, instances)
+
+        with patch("app.adapters.agent_mqtt_adapter.mqtt.Client"):
+            adapter = AgentMQTTAdapter("test_broker", 1234, shards[1], self.mock_hub_gateway)
+        adapter.on_connect(None, None, None, 0)
+        adapter.client.subscribe.assert_called_once_with([("agent/1", 0), ("agent/4", 0), ("agent/7", 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
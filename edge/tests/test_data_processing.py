@@ -0,0 +1,88 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+from app.entities.agent_data import AccelerometerData, AgentData, AnemometerData, GpsData, HumidexData
+from app.entities.agent_data_batch import AgentDataBatch
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+from app.usecases.data_processing import classify_humidex, process_agent_data_batch
+from app.usecases.streaming_processing import StreamingAgentDataProcessor
+
+
+def make_drive(user_id: int, samples: int, seed: int) -> AgentDataBatch:
+    """Calm road with a pothole and a bump that are 40 samples wide"""
+    rng = np.random.default_rng(seed)
+    z = rng.normal(16500, 100, samples)
+    shape = np.sin(np.pi * np.arange(40) / 40)
+    z[60:100] -= 8000 * shape
+    z[150:190] += 4000 * shape
+    started = datetime(2024, 1, 1)
+    return AgentDataBatch.from_agent_data_list([
+        AgentData(
+            user_id=user_id,
+            accelerometer=AccelerometerData(x=0.0, y=0.0, z=value),
+            gps=GpsData(latitude=50.0, longitude=30.0),
+            humidex=HumidexData(temperature=25.0, humidity=50.0),
+            anemometer=AnemometerData(speed=5.0, direction=90.0),
+            timestamp=started + timedelta(seconds=i),
+        )
+        for i, value in enumerate(z)
+    ])
+
+
+class TestClassification(unittest.TestCase):
+    def test_missing_humidex_readings_are_undefined(self):
+        temperatures = np.array([25.0, np.nan, 45.0, 25.0])
+        humidities = np.array([50.0, 50.0, 90.0, np.nan])
+        self.assertEqual(classify_humidex(temperatures, humidities).tolist(), [1, 0, 4, 0])
+
+
+class TestStreamingAgentDataProcessor(unittest.TestCase):
+    def test_small_batches_match_one_batch(self):
+        drive = make_drive(user_id=1, samples=250, seed=1)
+        expected = process_agent_data_batch(drive).road_state
+        self.assertIn(1, expected)
+        self.assertIn(2, expected)
+
+        processor = StreamingAgentDataProcessor(context=32)
+        parts = [processor.process(drive[start:start + 7]) for start in range(0, len(drive), 7)]
+        processed = ProcessedAgentDataBatch.concat(parts + [processor.flush()])
+
+        self.assertEqual(processed.agent_data.to_agent_data_list(), drive.to_agent_data_list())
+        self.assertEqual(processed.road_state.tolist(), expected.tolist())
+
+    def test_users_are_processed_separately(self):
+        first = make_drive(user_id=1, samples=250, seed=1)
+        second = make_drive(user_id=2, samples=250, seed=2)
+        order = np.arange(len(first) * 2).reshape(2, -1).T.ravel()
+        interleaved = AgentDataBatch.concat([first, second])[order]
+
+        processor = StreamingAgentDataProcessor(context=32)
+        processed = ProcessedAgentDataBatch.concat([processor.process(interleaved), processor.flush()])
+
+        for user_id, drive in ((1, first), (2, second)):
+            expected = process_agent_data_batch(drive).road_state
+            actual = processed.road_state[processed.agent_data.user_id == user_id]
+            self.assertEqual(actual.tolist(), expected.tolist())
+
+    def test_pending_samples_wait_for_context(self):
+        processor = StreamingAgentDataProcessor(context=32)
+        self.assertEqual(len(processor.process(make_drive(user_id=1, samples=250, seed=1)[:20])), 0)
+        self.assertEqual(len(processor.flush()), 20)
+        self.assertEqual(len(processor.flush()), 0)
+
+    def test_idle_and_least_recently_seen_vehicles_are_evicted(self):
+        processor = StreamingAgentDataProcessor(context=32, max_vehicles=2, idle_timeout=10.0)
+        for user_id in (1, 2):
+            self.assertEqual(len(processor.process(make_drive(user_id, 250, user_id)[:20], now=0.0)), 0)
+        evicted = processor.process(make_drive(3, 250, 3)[:20], now=1.0)
+        self.assertEqual(evicted.agent_data.user_id.tolist(), [1] * 20)
+        self.assertEqual(list(processor.streams), [2, 3])
+
+        self.assertEqual(processor.next_idle_deadline(), 10.0)
+        self.assertEqual(processor.evict_idle(now=10.5).agent_data.user_id.tolist(), [2] * 20)
+        self.assertEqual(list(processor.streams), [3])
+        self.assertEqual(processor.evicted, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
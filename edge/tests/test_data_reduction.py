@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+from app.entities.agent_data_batch import AgentDataBatch
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+from app.usecases.data_reduction import METERS_PER_DEGREE, TrackReducer
+
+
+def make_track(user_id: int, samples: int) -> ProcessedAgentDataBatch:
+    """Drives 1 m per sample north, then turns east halfway"""
+    turn = samples // 2
+    north = np.minimum(np.arange(samples), turn)
+    east = np.maximum(np.arange(samples) - turn, 0)
+    columns = {name: np.zeros(samples) for name in AgentDataBatch.DTYPES}
+    columns.update(
+        user_id=np.full(samples, user_id),
+        latitude=north / METERS_PER_DEGREE,
+        longitude=east / METERS_PER_DEGREE,
+        timestamp=np.arange(samples).astype("datetime64[s]"),
+    )
+    codes = np.zeros(samples, dtype=np.uint8)
+    return ProcessedAgentDataBatch(
+        agent_data=AgentDataBatch.from_columns(**columns),
+        road_state=codes.copy(),
+        humidex_state=np.ones(samples, dtype=np.uint8),
+        wind_chill_state=codes.copy(),
+    )
+
+
+class TestTrackReducer(unittest.TestCase):
+    def test_keeps_anomalies_changes_and_corners(self):
+        track = make_track(user_id=1, samples=100)
+        track.road_state[20] = 1
+        track.wind_chill_state[30] = 1
+        track.humidex_state[70:] = 2
+
+        reduced = TrackReducer(tolerance=1.0).reduce(track)
+        kept = reduced.agent_data.timestamp.astype("datetime64[s]").astype(int).tolist()
+        self.assertEqual(kept, [0, 20, 30, 31, 50, 70, 99])
+
+    def test_streaming_respects_tolerance(self):
+        track = make_track(user_id=1, samples=400)
+        # Wobble sideways so the straight parts are not exactly collinear
+        track.agent_data.longitude += np.sin(np.arange(400) / 5) * 3 / METERS_PER_DEGREE
+        reducer = TrackReducer(tolerance=5.0)
+        reduced = ProcessedAgentDataBatch.concat([reducer.reduce(track[start:start + 40]) for start in range(0, 400, 40)])
+
+        self.assertLess(len(reduced), len(track) // 4)
+        self.assertEqual(reducer.stats(), {"reduction_received_total": 400, "reduction_forwarded_total": len(reduced)})
+        points = np.column_stack([track.agent_data.longitude, track.agent_data.latitude]) * METERS_PER_DEGREE
+        kept = np.column_stack([reduced.agent_data.longitude, reduced.agent_data.latitude]) * METERS_PER_DEGREE
+        # Every dropped sample stays within the tolerance of the forwarded polyline
+        for point in points:
+            starts, ends = kept[:-1], kept[1:]
+            direction = ends - starts
+            t = np.clip(np.einsum("ij,ij->i", point - starts, direction) / np.einsum("ij,ij->i", direction, direction), 0, 1)
+            self.assertLessEqual(np.hypot(*(point - starts - t[:, None] * direction).T).min(), 5.0 + 1e-6)
+
+    def test_vehicles_are_reduced_separately(self):
+        first, second = make_track(user_id=1, samples=50), make_track(user_id=2, samples=50)
+        second.humidex_state[:] = 3
+        reduced = TrackReducer(tolerance=1.0).reduce(ProcessedAgentDataBatch.concat([first, second]))
+        self.assertEqual(reduced.agent_data.user_id.tolist(), [1, 1, 1, 2, 2, 2])
+        self.assertEqual(reduced.humidex_state.tolist(), [1, 1, 1, 3, 3, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
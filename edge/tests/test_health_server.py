@@ -0,0 +1,37 @@
+import asyncio
+import unittest
+from app.adapters.health_server import HealthServer
+
+
+async def get(port: int, path: str) -> bytes:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode("latin-1"))
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+class TestHealthServer(unittest.TestCase):
+    def test_checks_decide_the_status(self):
+        ready = {"value": False}
+
+        async def scenario():
+            server = HealthServer("127.0.0.1", 0, liveness={"pipeline": lambda: True}, readiness={"mqtt": lambda: ready["value"]})
+            await server.start()
+            port = server.server.sockets[0].getsockname()[1]
+            responses = [await get(port, "/healthz"), await get(port, "/readyz")]
+            ready["value"] = True
+            responses += [await get(port, "/readyz"), await get(port, "/missing")]
+            await server.stop()
+            return responses
+
+        healthz, not_ready, is_ready, missing = asyncio.run(scenario())
+        self.assertTrue(healthz.startswith(b"HTTP/1.1 200"))
+        self.assertTrue(not_ready.startswith(b"HTTP/1.1 503"))
+        self.assertTrue(not_ready.endswith(b"mqtt: failing\n"))
+        self.assertTrue(is_ready.startswith(b"HTTP/1.1 200"))
+        self.assertTrue(missing.startswith(b"HTTP/1.1 404"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import gzip
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from app.adapters.hub_http_adapter import HubHttpAdapter
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+from tests.test_data_processing import make_drive
+
+
+class StubHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        server = self.server
+        with server.lock:
+            server.requests.append((self.headers.get("Content-Encoding"), body))
+            status = server.statuses.pop(0) if server.statuses else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHubHttpAdapter(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHubHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.statuses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.adapter = HubHttpAdapter(
+            f"http://127.0.0.1:{self.server.server_port}", compression="gzip", concurrency=2, backoff=0.01
+        )
+        batch = make_drive(user_id=1, samples=250, seed=1)[:10]
+        codes = np.zeros(len(batch), dtype=np.uint8)
+        self.processed_batch = ProcessedAgentDataBatch(batch, codes, codes, codes)
+
+    def tearDown(self):
+        self.adapter.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_batch_is_sent_as_one_compressed_request(self):
+        self.assertTrue(self.adapter.save_batch(self.processed_batch))
+        self.adapter.close()
+        self.assertEqual(len(self.server.requests), 1)
+        encoding, body = self.server.requests[0]
+        self.assertEqual(encoding, "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(body))), 10)
+        self.assertEqual(self.adapter.stats(), {"sent_total": 1, "failed_total": 0, "retries_total": 0})
+
+    def test_retryable_responses_are_retried(self):
+        self.server.statuses = [503, 500, 200, 422]
+        self.adapter.save_batch(self.processed_batch)
+        self.adapter.save_batch(self.processed_batch)
+        self.adapter.close()
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(self.adapter.stats(), {"sent_total": 1, "failed_total": 1, "retries_total": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
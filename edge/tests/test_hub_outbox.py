@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import ThreadingHTTPServer
+import numpy as np
+from app.adapters.hub_http_adapter import HubHttpAdapter
+from app.adapters.hub_outbox import BufferedHubGateway, HubOutbox
+from app.adapters.wire_codec import decode_processed_agent_data
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+from tests.test_data_processing import make_drive
+from tests.test_hub_http_adapter import StubHubHandler
+
+
+class TestHubOutbox(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_restart_resumes_after_the_last_delivered_message(self):
+        outbox = HubOutbox(self.path, segment_size=64, max_size=1024)
+        for i in range(5):
+            outbox.append(b"message %d" % i)
+        for _ in range(2):
+            payload, _ = outbox.peek()
+            outbox.commit(payload)
+        self.assertGreater(len(os.listdir(self.path)), 2)
+        outbox.close()
+
+        outbox = HubOutbox(self.path, segment_size=64, max_size=1024)
+        self.assertEqual(outbox.depth(), 3)
+        self.assertEqual(outbox.peek()[0], b"message 2")
+        self.assertGreaterEqual(outbox.stats()["outbox_oldest_age_seconds"], 0)
+        outbox.close()
+
+    def test_torn_record_is_cut_off(self):
+        outbox = HubOutbox(self.path, segment_size=1024, max_size=4096)
+        outbox.append(b"complete")
+        outbox.append(b"torn")
+        outbox.close()
+        segment = os.path.join(self.path, "000000000000.seg")
+        with open(segment, "r+b") as file:
+            file.truncate(os.path.getsize(segment) - 1)
+
+        outbox = HubOutbox(self.path, segment_size=1024, max_size=4096)
+        self.assertEqual(outbox.depth(), 1)
+        outbox.append(b"next")
+        self.assertEqual(outbox.peek()[0], b"complete")
+        outbox.commit(b"complete")
+        self.assertEqual(outbox.peek()[0], b"next")
+        outbox.close()
+
+    def test_oldest_segment_is_dropped_when_full(self):
+        outbox = HubOutbox(self.path, segment_size=64, max_size=128)
+        for i in range(10):
+            outbox.append(b"message %d" % i)
+        self.assertEqual(outbox.dropped_segments, 3)
+        self.assertEqual(outbox.depth(), 4)
+        self.assertEqual(outbox.peek()[0], b"message 6")
+        outbox.close()
+
+
+class TestBufferedHubGateway(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHubHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.statuses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def test_batches_are_replayed_in_order_when_the_hub_is_back(self):
+        # The hub is down for the first 4 requests
+        self.server.statuses = [503] * 4
+        hub_adapter = HubHttpAdapter(f"http://127.0.0.1:{self.server.server_port}", wire_format="binary", concurrency=1, retries=0)
+        gateway = BufferedHubGateway(hub_adapter, HubOutbox(self.directory.name, 4096, 65536), rate=100, backoff=0.01)
+        drive = make_drive(user_id=1, samples=250, seed=1)
+        codes = np.zeros(10, dtype=np.uint8)
+        for start in range(0, 50, 10):
+            self.assertTrue(gateway.save_batch(ProcessedAgentDataBatch(drive[start:start + 10], codes, codes, codes)))
+            time.sleep(0.01)
+
+        deadline = time.monotonic() + 5
+        while gateway.outbox.depth() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        gateway.close()
+
+        delivered = [body for _, body in self.server.requests[4:]]
+        timestamps = [data.agent_data.timestamp for body in delivered for data in decode_processed_agent_data(body)]
+        self.assertEqual(timestamps, [data.timestamp for data in drive[:50].to_agent_data_list()])
+        self.assertEqual(gateway.stats()["outbox_depth"], 0)
+        self.assertGreater(gateway.stats()["outbox_replayed_total"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
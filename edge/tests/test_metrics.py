@@ -0,0 +1,40 @@
+import unittest
+from app.metrics import Histogram, MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_renders_prometheus_text_format(self):
+        decode, publish = Histogram((0.001, 0.01, float("inf"))), Histogram((0.001, 0.01, float("inf")))
+        for value in (0.0005, 0.005, 0.5):
+            decode.observe(value)
+        registry = MetricsRegistry("edge")
+        registry.add_histogram("stage_latency_seconds", "Time in a stage", decode, stage="decode")
+        registry.add_histogram("stage_latency_seconds", "Time in a stage", publish, stage="publish")
+        registry.add_collector(lambda: {"received_total": 3, "output_queue_depth": 0})
+        registry.add_collector(lambda: {"oldest_age_seconds": 1.5}, prefix="hub_")
+        registry.add_collector(lambda: 1 / 0)
+
+        lines = registry.render().splitlines()
+        self.assertEqual(lines[:7], [
+            "# HELP edge_stage_latency_seconds Time in a stage",
+            "# TYPE edge_stage_latency_seconds histogram",
+            'edge_stage_latency_seconds_bucket{stage="decode",le="0.001"} 1',
+            'edge_stage_latency_seconds_bucket{stage="decode",le="0.01"} 2',
+            'edge_stage_latency_seconds_bucket{stage="decode",le="+Inf"} 3',
+            'edge_stage_latency_seconds_sum{stage="decode"} 0.5055',
+            'edge_stage_latency_seconds_count{stage="decode"} 3',
+        ])
+        self.assertEqual(lines.count("# TYPE edge_stage_latency_seconds histogram"), 1)
+        self.assertIn('edge_stage_latency_seconds_count{stage="publish"} 0', lines)
+        self.assertEqual(lines[-6:], [
+            "# TYPE edge_received_total counter",
+            "edge_received_total 3",
+            "# TYPE edge_output_queue_depth gauge",
+            "edge_output_queue_depth 0",
+            "# TYPE edge_hub_oldest_age_seconds gauge",
+            "edge_hub_oldest_age_seconds 1.5",
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
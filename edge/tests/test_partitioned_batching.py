@@ -0,0 +1,41 @@
+import unittest
+from app.entities.agent_data_batch import AgentDataBatch
+from app.usecases.partitioned_batching import PartitionedBatcher
+from tests.test_data_processing import make_drive
+
+
+class TestPartitionedBatcher(unittest.TestCase):
+    def test_full_vehicles_take_turns(self):
+        batcher = PartitionedBatcher(batch_size=10)
+        batcher.add(make_drive(user_id=1, samples=250, seed=1)[:35], received_at=0.0)
+        batcher.add(make_drive(user_id=2, samples=250, seed=2)[:12], received_at=0.0)
+        batcher.add(make_drive(user_id=3, samples=250, seed=3)[:5], received_at=0.0)
+
+        ready = [(user_id, len(batch), reason) for user_id, batch, _, reason in batcher.pop_ready(now=0.0)]
+        self.assertEqual(ready, [(1, 10, "size"), (2, 10, "size"), (1, 10, "size"), (1, 10, "size")])
+        self.assertEqual(len(batcher), 5 + 2 + 5)
+
+    def test_vehicles_past_deadline_are_flushed_oldest_first(self):
+        batcher = PartitionedBatcher(batch_size=100, max_batch_delay=1.0)
+        first = make_drive(user_id=1, samples=250, seed=1)
+        batcher.add(first[:3], received_at=0.0)
+        batcher.add(make_drive(user_id=2, samples=250, seed=2)[:3], received_at=0.5)
+        batcher.add(first[3:6], received_at=0.6)
+        self.assertEqual(batcher.next_deadline(), 1.0)
+        self.assertEqual(list(batcher.pop_ready(now=0.9)), [])
+
+        ready = list(batcher.pop_ready(now=1.5))
+        self.assertEqual([(user_id, len(batch), reason) for user_id, batch, _, reason in ready], [(1, 6, "age"), (2, 3, "age")])
+        self.assertEqual(ready[0][2], [(0.0, 3), (0.6, 3)])
+        self.assertEqual(ready[0][1].to_agent_data_list(), first[:6].to_agent_data_list())
+        self.assertIsNone(batcher.next_deadline())
+
+    def test_drain_returns_everything(self):
+        batcher = PartitionedBatcher(batch_size=100)
+        batcher.add(AgentDataBatch.concat([make_drive(user_id, 250, user_id)[:4] for user_id in (1, 2)]), received_at=0.0)
+        self.assertEqual(sum(len(batch) for _, batch, _, _ in batcher.drain()), 8)
+        self.assertEqual(len(batcher), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
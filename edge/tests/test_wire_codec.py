@@ -0,0 +1,125 @@
+import unittest
+import numpy as np
+from datetime import datetime, timezone
+from app.adapters.agent_mqtt_adapter import AgentMQTTAdapter
+from app.adapters.wire_codec import (
+    HEADER,
+    PROCESSED_RECORD,
+    compress,
+    decode_agent_data,
+    decode_agent_data_batch,
+    decode_processed_agent_data,
+    decode_processed_agent_data_batch,
+    decompress,
+    dump_processed_agent_data_batch,
+    encode_agent_data,
+    encode_processed_agent_data,
+    encode_processed_agent_data_batch,
+    is_binary,
+    processed_agent_data_list_adapter,
+)
+from app.entities.agent_data import AccelerometerData, AgentData, AnemometerData, GpsData, HumidexData
+from app.entities.agent_data_batch import AgentDataBatch
+from app.entities.processed_agent_data import ProcessedAgentData
+from app.entities.processed_agent_data_batch import ProcessedAgentDataBatch
+
+
+def make_agent_data(user_id=1, timestamp=datetime(2023, 7, 21, 12, 34, 56, 123456)):
+    return AgentData(
+        user_id=user_id,
+        accelerometer=AccelerometerData(x=-17.0, y=4.0, z=16516.0),
+        gps=GpsData(latitude=49.32865907112764, longitude=-123.07535438510921),
+        humidex=HumidexData(temperature=22.92713342968395, humidity=56.881684064002364),
+        anemometer=AnemometerData(speed=13.720337598183118, direction=112.89262022737243),
+        timestamp=timestamp,
+    )
+
+
+class TestWireCodec(unittest.TestCase):
+    def test_agent_data_round_trip(self):
+        batch = [
+            make_agent_data(user_id=1),
+            make_agent_data(user_id=2, timestamp=datetime(2023, 7, 21, 12, 34, 56, tzinfo=timezone.utc)),
+        ]
+        payload = encode_agent_data(batch)
+        self.assertTrue(is_binary(payload))
+        self.assertEqual(decode_agent_data(payload), batch)
+
+    def test_processed_agent_data_round_trip(self):
+        batch = [
+            ProcessedAgentData(
+                road_state="pothole",
+                humidex_state="some discomfort",
+                wind_chill_state="strong chill wind",
+                agent_data=make_agent_data(),
+            )
+        ]
+        payload = encode_processed_agent_data(batch)
+        self.assertEqual(len(payload), HEADER.size + PROCESSED_RECORD.size)
+        self.assertLess(len(payload), len(batch[0].model_dump_json()))
+        decoded = decode_processed_agent_data(payload)
+        self.assertEqual(decoded[0].model_dump_json(), batch[0].model_dump_json())
+
+    def test_rejects_truncated_message(self):
+        payload = encode_agent_data([make_agent_data()])
+        for decode in (decode_agent_data, decode_agent_data_batch):
+            for truncated in (payload[:-1], payload[:HEADER.size - 1], b""):
+                with self.assertRaises(ValueError):
+                    decode(truncated)
+
+    def test_rejects_unknown_state_codes(self):
+        batch = [ProcessedAgentData(road_state="bump", humidex_state="normal", wind_chill_state="some", agent_data=make_agent_data())]
+        for offset in range(3):
+            payload = bytearray(encode_processed_agent_data(batch))
+            payload[HEADER.size + offset] = 200
+            for decode in (decode_processed_agent_data, decode_processed_agent_data_batch):
+                with self.assertRaises(ValueError):
+                    decode(bytes(payload))
+
+    def test_batch_round_trip(self):
+        agent_data_list = [
+            make_agent_data(user_id=1),
+            make_agent_data(user_id=2, timestamp=datetime(2023, 7, 21, 12, 34, 56, tzinfo=timezone.utc)),
+        ]
+        batch = decode_agent_data_batch(encode_agent_data(agent_data_list))
+        self.assertEqual(batch.user_id.tolist(), [1, 2])
+        self.assertTrue(batch.z.flags["C_CONTIGUOUS"])
+        self.assertEqual(batch.to_agent_data_list(), agent_data_list)
+
+        processed_batch = ProcessedAgentDataBatch(
+            agent_data=batch,
+            road_state=np.array([1, 2], dtype=np.uint8),
+            humidex_state=np.array([0, 4], dtype=np.uint8),
+            wind_chill_state=np.array([2, 0], dtype=np.uint8),
+        )
+        expected = processed_batch.to_processed_agent_data_list()
+        self.assertEqual(encode_processed_agent_data_batch(processed_batch), encode_processed_agent_data(expected))
+        decoded = decode_processed_agent_data(encode_processed_agent_data_batch(processed_batch))
+        self.assertEqual([data.model_dump_json() for data in decoded], [data.model_dump_json() for data in expected])
+        decoded_batch = decode_processed_agent_data_batch(encode_processed_agent_data_batch(processed_batch))
+        self.assertEqual(decoded_batch.to_processed_agent_data_list(), expected)
+
+    def test_compressed_batch_envelope(self):
+        batch = decode_agent_data_batch(encode_agent_data([make_agent_data(user_id) for user_id in range(50)]))
+        codes = np.zeros(len(batch), dtype=np.uint8)
+        processed_batch = ProcessedAgentDataBatch(agent_data=batch, road_state=codes, humidex_state=codes, wind_chill_state=codes)
+
+        envelope = dump_processed_agent_data_batch(processed_batch, "json")
+        compressed = compress(envelope, "gzip")
+        self.assertLess(len(compressed), len(envelope))
+        self.assertEqual(decompress(compressed), envelope)
+        self.assertEqual(decompress(envelope), envelope)
+        self.assertEqual(processed_agent_data_list_adapter.validate_json(envelope), processed_batch.to_processed_agent_data_list())
+        with self.assertRaises(ValueError):
+            compress(envelope, "brotli")
+
+    def test_adapter_accepts_binary_and_json(self):
+        agent_data = make_agent_data()
+        for payload in (encode_agent_data([agent_data]), agent_data.model_dump_json().encode("utf-8")):
+            batch = AgentMQTTAdapter.decode_payload(payload)
+            self.assertIsInstance(batch, AgentDataBatch)
+            self.assertEqual(batch.to_agent_data_list(), [agent_data])
+
+
+if __name__ == "__main__":
+    unittest.main()
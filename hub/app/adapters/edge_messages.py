@@ -0,0 +1,40 @@
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.adapters.wire_codec import (
+    decode_processed_agent_data,
+    decompress,
+    encode_processed_agent_data,
+    is_binary,
+)
+from app.entities.processed_agent_data import ProcessedAgentData
+
+processed_agent_data_list_adapter = TypeAdapter(List[ProcessedAgentData])
+
+
+def parse_processed_agent_data(payload: bytes, strict: bool = False) -> List[ProcessedAgentData]:
+    """
+    Parses a message of the edge: a single JSON record, a JSON array or binary records,
+    optionally gzip or zstd compressed.
+    """
+    payload = decompress(payload)
+    if is_binary(payload):
+        return decode_processed_agent_data(payload)
+    if payload.lstrip().startswith(b"["):
+        return processed_agent_data_list_adapter.validate_json(payload, strict=strict)
+    return [ProcessedAgentData.model_validate_json(payload, strict=strict)]
+
+
+def dump_processed_agent_data(processed_agent_data: ProcessedAgentData, wire_format: str = "json"):
+    """Serializes one record for the Redis list in the given wire format"""
+    if wire_format == "binary":
+        return encode_processed_agent_data([processed_agent_data])
+    return processed_agent_data.model_dump_json()
+
+
+def load_processed_agent_data(raw: bytes) -> ProcessedAgentData:
+    """Deserializes one record from the Redis list, both wire formats are accepted"""
+    if is_binary(raw):
+        return decode_processed_agent_data(raw)[0]
+    return ProcessedAgentData.model_validate_json(raw)
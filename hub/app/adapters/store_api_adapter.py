@@ -5,13 +5,15 @@ from typing import List
 import pydantic_core
 import requests
 
+from app.adapters.wire_codec import CONTENT_TYPE, encode_processed_agent_data
 from app.entities.processed_agent_data import ProcessedAgentData
 from app.interfaces.store_gateway import StoreGateway
 
 
 class StoreApiAdapter(StoreGateway):
-    def __init__(self, api_base_url):
+    def __init__(self, api_base_url, wire_format="json"):
         self.api_base_url = api_base_url
+        self.wire_format = wire_format
 
     def save_data(self, processed_agent_data_batch: List[ProcessedAgentData]):
         """
@@ -23,8 +25,12 @@ class StoreApiAdapter(StoreGateway):
         """
         url = f"{self.api_base_url}/processed_agent_data/"
 
-        data = [processed_agent_data.model_dump_json() for processed_agent_data in processed_agent_data_batch]
-        response = requests.post(url, data='[' + ','.join(data) + ']', headers={'Content-Type': 'application/json'})
+        if self.wire_format == "binary":
+            data = encode_processed_agent_data(processed_agent_data_batch)
+            response = requests.post(url, data=data, headers={'Content-Type': CONTENT_TYPE})
+        else:
+            data = [processed_agent_data.model_dump_json() for processed_agent_data in processed_agent_data_batch]
+            response = requests.post(url, data='[' + ','.join(data) + ']', headers={'Content-Type': 'application/json'})
         if response.status_code != 200:
             logging.info(f"Invalid Hub response\nData: {data}\nResponse: {response}")
             return False
@@ -0,0 +1,175 @@
+"""
+Compact binary wire format shared by agent, edge, hub and store.
+
+Message layout (little endian):
+    header: magic b"RV", version (uint8), kind (uint8), record count (uint32)
+    records: `count` fixed size records, AGENT_RECORD or PROCESSED_RECORD depending on kind
+
+JSON stays the default format. Receivers detect binary MQTT payloads by the magic
+bytes and binary HTTP bodies by CONTENT_TYPE, so both formats work side by side.
+Messages can additionally be compressed with gzip or zstd, receivers detect that by
+the magic bytes of the compressed data as well (HTTP also sets Content-Encoding).
+Keep this layout in sync between the agent, edge, hub and store copies.
+"""
+import gzip
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+from app.entities.agent_data import AccelerometerData, AgentData, AnemometerData, GpsData, HumidexData
+from app.entities.processed_agent_data import ProcessedAgentData
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional, gzip is always available
+    zstandard = None
+
+CONTENT_TYPE = "application/x-road-vision"
+MAGIC = b"RV"
+VERSION = 1
+KIND_AGENT_DATA = 1
+KIND_PROCESSED_AGENT_DATA = 2
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+HEADER = struct.Struct("<2sBBI")
+# timestamp (microseconds since epoch), is timezone aware, user_id,
+# x, y, z, latitude, longitude, temperature, humidity, speed, direction
+AGENT_RECORD = struct.Struct("<qBi9d")
+# road_state, humidex_state and wind_chill_state codes followed by the agent record
+PROCESSED_RECORD = struct.Struct("<3BqBi9d")
+
+ROAD_STATES = ("normal", "pothole", "bump")
+HUMIDEX_STATES = ("normal", "undefined", "comfortable", "some discomfort", "great discomfort", "dangerous")
+WIND_CHILL_STATES = ("normal", "some", "strong wind", "strong chill wind")
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def is_binary(payload: bytes) -> bool:
+    return payload[:len(MAGIC)] == MAGIC
+
+
+def compress(payload: bytes, compression: str) -> bytes:
+    """Compresses a message with "gzip" or "zstd", "none" returns it as is"""
+    if compression == "gzip":
+        return gzip.compress(payload, compresslevel=6)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor().compress(payload)
+    if compression != "none":
+        raise ValueError(f"Unknown compression: {compression}")
+    return payload
+
+
+def decompress(payload: bytes) -> bytes:
+    """
+    Detects gzip and zstd messages by their magic bytes, other messages are returned as is.
+    Truncated or corrupt compressed messages raise ValueError like other malformed messages.
+    """
+    if payload[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        try:
+            return gzip.decompress(payload)
+        except (OSError, EOFError, zlib.error) as e:
+            raise ValueError(f"Corrupt gzip message: {e}") from e
+    if payload[:len(ZSTD_MAGIC)] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError("zstd compressed message, but the zstandard package is not installed")
+        try:
+            return zstandard.ZstdDecompressor().decompress(payload)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Corrupt zstd message: {e}") from e
+    return payload
+
+
+def encode_timestamp(value: datetime) -> tuple[int, int]:
+    if value.tzinfo is None:
+        return (value - _EPOCH) // _MICROSECOND, 0
+    return (value - _EPOCH_UTC) // _MICROSECOND, 1
+
+
+def decode_timestamp(micros: int, aware: int) -> datetime:
+    if aware:
+        return _EPOCH_UTC + micros * _MICROSECOND
+    return _EPOCH + micros * _MICROSECOND
+
+
+def _state(states: tuple, code: int, name: str) -> str:
+    if code >= len(states):
+        raise ValueError(f"Unknown {name} code {code}")
+    return states[code]
+
+
+def pack(kind: int, record: struct.Struct, rows: list[tuple]) -> bytes:
+    return HEADER.pack(MAGIC, VERSION, kind, len(rows)) + b"".join([record.pack(*row) for row in rows])
+
+
+def unpack(kind: int, record: struct.Struct, payload: bytes):
+    """Validates the header and returns an iterator over the record tuples"""
+    if len(payload) < HEADER.size:
+        raise ValueError(f"Wire message of {len(payload)} bytes is shorter than its header")
+    magic, version, payload_kind, count = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION or payload_kind != kind:
+        raise ValueError(f"Unsupported wire message: magic={magic!r}, version={version}, kind={payload_kind}")
+    if len(payload) != HEADER.size + count * record.size:
+        raise ValueError(f"Wire message size {len(payload)} does not match {count} records")
+    return record.iter_unpack(memoryview(payload)[HEADER.size:])
+
+
+def _agent_row(agent_data: AgentData) -> tuple:
+    micros, aware = encode_timestamp(agent_data.timestamp)
+    return (
+        micros, aware, agent_data.user_id,
+        agent_data.accelerometer.x, agent_data.accelerometer.y, agent_data.accelerometer.z,
+        agent_data.gps.latitude, agent_data.gps.longitude,
+        agent_data.humidex.temperature, agent_data.humidex.humidity,
+        agent_data.anemometer.speed, agent_data.anemometer.direction,
+    )
+
+
+def _agent_data(row: tuple) -> AgentData:
+    # Record layout is fixed and typed, so the models are built without re-validation
+    micros, aware, user_id, x, y, z, latitude, longitude, temperature, humidity, speed, direction = row
+    return AgentData.model_construct(
+        user_id=user_id,
+        accelerometer=AccelerometerData.model_construct(x=x, y=y, z=z),
+        gps=GpsData.model_construct(latitude=latitude, longitude=longitude),
+        humidex=HumidexData.model_construct(temperature=temperature, humidity=humidity),
+        anemometer=AnemometerData.model_construct(speed=speed, direction=direction),
+        timestamp=decode_timestamp(micros, aware),
+    )
+
+
+def encode_agent_data(batch: list[AgentData]) -> bytes:
+    return pack(KIND_AGENT_DATA, AGENT_RECORD, [_agent_row(agent_data) for agent_data in batch])
+
+
+def decode_agent_data(payload: bytes) -> list[AgentData]:
+    return [_agent_data(row) for row in unpack(KIND_AGENT_DATA, AGENT_RECORD, payload)]
+
+
+def encode_processed_agent_data(batch: list[ProcessedAgentData]) -> bytes:
+    rows = [
+        (
+            ROAD_STATES.index(data.road_state),
+            HUMIDEX_STATES.index(data.humidex_state),
+            WIND_CHILL_STATES.index(data.wind_chill_state),
+        ) + _agent_row(data.agent_data)
+        for data in batch
+    ]
+    return pack(KIND_PROCESSED_AGENT_DATA, PROCESSED_RECORD, rows)
+
+
+def decode_processed_agent_data(payload: bytes) -> list[ProcessedAgentData]:
+    return [
+        ProcessedAgentData.model_construct(
+            road_state=_state(ROAD_STATES, row[0], "road_state"),
+            humidex_state=_state(HUMIDEX_STATES, row[1], "humidex_state"),
+            wind_chill_state=_state(WIND_CHILL_STATES, row[2], "wind_chill_state"),
+            agent_data=_agent_data(row[3:]),
+        )
+        for row in unpack(KIND_PROCESSED_AGENT_DATA, PROCESSED_RECORD, payload)
+    ]
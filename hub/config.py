@@ -24,3 +24,6 @@ BATCH_SIZE = try_parse_int(os.environ.get("BATCH_SIZE")) or 20
 MQTT_BROKER_HOST = os.environ.get("MQTT_BROKER_HOST") or "localhost"
 MQTT_BROKER_PORT = try_parse_int(os.environ.get("MQTT_BROKER_PORT")) or 1883
 MQTT_TOPIC = os.environ.get("MQTT_TOPIC") or "processed_agent_data_topic"
+
+# Format used for Redis and the Store API: "json" or "binary" (see app/adapters/wire_codec.py)
+WIRE_FORMAT = os.environ.get("WIRE_FORMAT") or "json"
@@ -1,11 +1,17 @@
 import logging
 from typing import List
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import ValidationError
 from redis import Redis
 import paho.mqtt.client as mqtt
 
 from app.adapters.store_api_adapter import StoreApiAdapter
+from app.adapters.edge_messages import (
+    dump_processed_agent_data,
+    load_processed_agent_data,
+    parse_processed_agent_data,
+)
 from app.entities.processed_agent_data import ProcessedAgentData
 from config import (
     STORE_API_BASE_URL,
@@ -15,6 +21,7 @@ from config import (
     MQTT_TOPIC,
     MQTT_BROKER_HOST,
     MQTT_BROKER_PORT,
+    WIRE_FORMAT,
 )
 
 # Configure logging settings
@@ -29,20 +36,37 @@ logging.basicConfig(
 # Create an instance of the Redis using the configuration
 redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT)
 # Create an instance of the StoreApiAdapter using the configuration
-store_adapter = StoreApiAdapter(api_base_url=STORE_API_BASE_URL)
+store_adapter = StoreApiAdapter(api_base_url=STORE_API_BASE_URL, wire_format=WIRE_FORMAT)
 # Create an instance of the AgentMQTTAdapter using the configuration
 
+
+def push_processed_agent_data(processed_agent_data_list: List[ProcessedAgentData]):
+    """Adds the records to the Redis list with one command"""
+    if processed_agent_data_list:
+        redis_client.lpush(
+            "processed_agent_data",
+            *[dump_processed_agent_data(processed_agent_data, WIRE_FORMAT) for processed_agent_data in processed_agent_data_list],
+        )
+
+
 # FastAPI
 app = FastAPI()
 
 
 @app.post("/processed_agent_data/")
-async def save_processed_agent_data(processed_agent_data: ProcessedAgentData):
-    redis_client.lpush("processed_agent_data", processed_agent_data.model_dump_json())
+async def save_processed_agent_data(request: Request):
+    body = await request.body()
+    try:
+        processed_agent_data_list = parse_processed_agent_data(body)
+        # The binary Redis records reject states they have no code for
+        push_processed_agent_data(processed_agent_data_list)
+    except (ValidationError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
     if redis_client.llen("processed_agent_data") >= BATCH_SIZE:
         processed_agent_data_batch: List[ProcessedAgentData] = []
         for _ in range(BATCH_SIZE):
-            processed_agent_data = ProcessedAgentData.model_validate_json(
+            processed_agent_data = load_processed_agent_data(
                 redis_client.lpop("processed_agent_data")
             )
             processed_agent_data_batch.append(processed_agent_data)
@@ -65,19 +89,13 @@ def on_connect(client, userdata, flags, rc):
 
 def on_message(client, userdata, msg):
     try:
-        payload: str = msg.payload.decode("utf-8")
-        # Create ProcessedAgentData instance with the received data
-        processed_agent_data = ProcessedAgentData.model_validate_json(
-            payload, strict=True
-        )
-
-        redis_client.lpush(
-            "processed_agent_data", processed_agent_data.model_dump_json()
-        )
+        # Create ProcessedAgentData instances with the received data
+        processed_agent_data_list = parse_processed_agent_data(msg.payload, strict=True)
+        push_processed_agent_data(processed_agent_data_list)
         processed_agent_data_batch: List[ProcessedAgentData] = []
         if redis_client.llen("processed_agent_data") >= BATCH_SIZE:
             for _ in range(BATCH_SIZE):
-                processed_agent_data = ProcessedAgentData.model_validate_json(
+                processed_agent_data = load_processed_agent_data(
                     redis_client.lpop("processed_agent_data")
                 )
                 processed_agent_data_batch.append(processed_agent_data)
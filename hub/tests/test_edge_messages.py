@@ -0,0 +1,67 @@
+import gzip
+import unittest
+from pydantic import ValidationError
+from app.adapters.edge_messages import dump_processed_agent_data, load_processed_agent_data, parse_processed_agent_data
+from app.adapters.wire_codec import HEADER, encode_processed_agent_data
+from app.entities.agent_data import AccelerometerData, AgentData, AnemometerData, GpsData, HumidexData
+from app.entities.processed_agent_data import ProcessedAgentData
+
+
+def make_processed_agent_data(user_id=1):
+    return ProcessedAgentData(
+        road_state="pothole",
+        humidex_state="comfortable",
+        wind_chill_state="normal",
+        agent_data=AgentData(
+            user_id=user_id,
+            accelerometer=AccelerometerData(x=0.1, y=0.2, z=0.3),
+            gps=GpsData(latitude=10.123, longitude=20.456),
+            humidex=HumidexData(temperature=22.5, humidity=55.0),
+            anemometer=AnemometerData(speed=5.0, direction=90.0),
+            timestamp="2023-07-21T12:34:56Z",
+        ),
+    )
+
+
+class TestEdgeMessages(unittest.TestCase):
+    def test_parses_single_record_array_and_binary(self):
+        expected = [make_processed_agent_data(1), make_processed_agent_data(2)]
+        single = expected[0].model_dump_json().encode("utf-8")
+        array = ("[" + ",".join(data.model_dump_json() for data in expected) + "]").encode("utf-8")
+        self.assertEqual(parse_processed_agent_data(single, strict=True), expected[:1])
+        self.assertEqual(parse_processed_agent_data(array, strict=True), expected)
+        self.assertEqual(parse_processed_agent_data(gzip.compress(array), strict=True), expected)
+        self.assertEqual(parse_processed_agent_data(encode_processed_agent_data(expected)), expected)
+
+    def test_rejects_invalid_data(self):
+        # Missing fields and a timestamp of the wrong type
+        invalid = b'{"road_state": "normal", "agent_data": {"user_id": 1, "accelerometer": {"x": 0.1, "y": 0.2}, "timestamp": 12345}}'
+        with self.assertRaises(ValidationError):
+            parse_processed_agent_data(invalid, strict=True)
+        # Binary bodies cut short or with an unknown state code
+        payload = bytearray(encode_processed_agent_data([make_processed_agent_data()]))
+        for body in (bytes(payload[:5]), bytes(payload[:-1])):
+            with self.assertRaises(ValueError):
+                parse_processed_agent_data(body)
+        payload[HEADER.size] = 200
+        with self.assertRaises(ValueError):
+            parse_processed_agent_data(bytes(payload))
+
+    def test_rejects_truncated_and_corrupt_compressed_bodies(self):
+        compressed = gzip.compress(make_processed_agent_data().model_dump_json().encode("utf-8"))
+        corrupt = compressed[:10] + bytes(len(compressed) - 10)
+        for body in (compressed[:-8], compressed[:len(compressed) // 2], corrupt):
+            with self.assertRaises(ValueError):
+                parse_processed_agent_data(body, strict=True)
+
+    def test_redis_records_round_trip_in_both_formats(self):
+        processed_agent_data = make_processed_agent_data()
+        for wire_format in ("json", "binary"):
+            raw = dump_processed_agent_data(processed_agent_data, wire_format)
+            if isinstance(raw, str):
+                raw = raw.encode("utf-8")
+            self.assertEqual(load_processed_agent_data(raw), processed_agent_data)
+
+
+if __name__ == "__main__":
+    unittest.main()
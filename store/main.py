@@ -1,7 +1,7 @@
 import asyncio
 import json
 from typing import Set, Dict, List, Any
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Body
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Body, Request
 from sqlalchemy import (
     create_engine,
     MetaData,
@@ -16,7 +16,7 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import select, update, delete
 from sqlalchemy.exc import NoResultFound
 from datetime import datetime
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, TypeAdapter, ValidationError, field_validator
 from config import (
     POSTGRES_HOST,
     POSTGRES_PORT,
@@ -24,6 +24,7 @@ from config import (
     POSTGRES_USER,
     POSTGRES_PASSWORD,
 )
+from wire_codec import CONTENT_TYPE, decode_processed_agent_data_rows
 
 # FastAPI app setup
 app = FastAPI()
@@ -120,6 +121,28 @@ class ProcessedAgentData(BaseModel):
     agent_data: AgentData
 
 
+processed_agent_data_list_adapter = TypeAdapter(List[ProcessedAgentData])
+
+
+def processed_agent_data_to_row(item: ProcessedAgentData) -> dict:
+    return {
+        "road_state": item.road_state,
+        "humidex_state": item.humidex_state,
+        "wind_chill_state": item.wind_chill_state,
+        "user_id": item.agent_data.user_id,
+        "x": item.agent_data.accelerometer.x,
+        "y": item.agent_data.accelerometer.y,
+        "z": item.agent_data.accelerometer.z,
+        "latitude": item.agent_data.gps.latitude,
+        "longitude": item.agent_data.gps.longitude,
+        "temperature": item.agent_data.humidex.temperature,
+        "humidity": item.agent_data.humidex.humidity,
+        "speed": item.agent_data.anemometer.speed,
+        "direction": item.agent_data.anemometer.direction,
+        "timestamp": item.agent_data.timestamp.isoformat()
+    }
+
+
 # WebSocket subscriptions
 subscriptions: Dict[int, Set[WebSocket]] = {}
 
@@ -149,30 +172,23 @@ async def send_data_to_subscribers(user_id: int, data):
 
 
 @app.post("/processed_agent_data/")
-async def create_processed_agent_data(data: List[ProcessedAgentData]):
+async def create_processed_agent_data(request: Request):
+    # Binary wire format is decoded straight into table rows, JSON goes through the models
+    body = await request.body()
+    try:
+        if request.headers.get("content-type") == CONTENT_TYPE:
+            rows = decode_processed_agent_data_rows(body)
+        else:
+            rows = [processed_agent_data_to_row(item) for item in processed_agent_data_list_adapter.validate_json(body)]
+    except (ValidationError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
     # Insert data to database
     # Send data to subscribers
     with SessionLocal() as db:
         results = []
-        for item in data:
+        for dict in rows:
             try:
-                dict = {
-                    "road_state": item.road_state,
-                    "humidex_state": item.humidex_state,
-                    "wind_chill_state": item.wind_chill_state,
-                    "user_id": item.agent_data.user_id,
-                    "x": item.agent_data.accelerometer.x,
-                    "y": item.agent_data.accelerometer.y,
-                    "z": item.agent_data.accelerometer.z,
-                    "latitude": item.agent_data.gps.latitude,
-                    "longitude": item.agent_data.gps.longitude,
-                    "temperature": item.agent_data.humidex.temperature,
-                    "humidity": item.agent_data.humidex.humidity,
-                    "speed": item.agent_data.anemometer.speed,
-                    "direction": item.agent_data.anemometer.direction,
-                    "timestamp": item.agent_data.timestamp.isoformat()
-                }
-
                 ins = processed_agent_data.insert().values(dict)
                 db.execute(ins)
                 db.commit()
@@ -183,7 +199,7 @@ async def create_processed_agent_data(data: List[ProcessedAgentData]):
                 raise e
         
         if len(results) > 0:
-            await send_data_to_subscribers(data[0].agent_data.user_id, results)
+            await send_data_to_subscribers(rows[0]["user_id"], results)
 
 
 @app.get(
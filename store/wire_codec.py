@@ -0,0 +1,97 @@
+"""
+Compact binary wire format shared by agent, edge, hub and store.
+
+Message layout (little endian):
+    header: magic b"RV", version (uint8), kind (uint8), record count (uint32)
+    records: `count` fixed size records, AGENT_RECORD or PROCESSED_RECORD depending on kind
+
+JSON stays the default format. Receivers detect binary MQTT payloads by the magic
+bytes and binary HTTP bodies by CONTENT_TYPE, so both formats work side by side.
+Keep this layout in sync between the agent, edge, hub and store copies.
+"""
+import struct
+from datetime import datetime, timedelta, timezone
+
+CONTENT_TYPE = "application/x-road-vision"
+MAGIC = b"RV"
+VERSION = 1
+KIND_AGENT_DATA = 1
+KIND_PROCESSED_AGENT_DATA = 2
+
+HEADER = struct.Struct("<2sBBI")
+# timestamp (microseconds since epoch), is timezone aware, user_id,
+# x, y, z, latitude, longitude, temperature, humidity, speed, direction
+AGENT_RECORD = struct.Struct("<qBi9d")
+# road_state, humidex_state and wind_chill_state codes followed by the agent record
+PROCESSED_RECORD = struct.Struct("<3BqBi9d")
+
+ROAD_STATES = ("normal", "pothole", "bump")
+HUMIDEX_STATES = ("normal", "undefined", "comfortable", "some discomfort", "great discomfort", "dangerous")
+WIND_CHILL_STATES = ("normal", "some", "strong wind", "strong chill wind")
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def is_binary(payload: bytes) -> bool:
+    return payload[:len(MAGIC)] == MAGIC
+
+
+def encode_timestamp(value: datetime) -> tuple[int, int]:
+    if value.tzinfo is None:
+        return (value - _EPOCH) // _MICROSECOND, 0
+    return (value - _EPOCH_UTC) // _MICROSECOND, 1
+
+
+def decode_timestamp(micros: int, aware: int) -> datetime:
+    if aware:
+        return _EPOCH_UTC + micros * _MICROSECOND
+    return _EPOCH + micros * _MICROSECOND
+
+
+def _state(states: tuple, code: int, name: str) -> str:
+    if code >= len(states):
+        raise ValueError(f"Unknown {name} code {code}")
+    return states[code]
+
+
+def pack(kind: int, record: struct.Struct, rows: list[tuple]) -> bytes:
+    return HEADER.pack(MAGIC, VERSION, kind, len(rows)) + b"".join([record.pack(*row) for row in rows])
+
+
+def unpack(kind: int, record: struct.Struct, payload: bytes):
+    """Validates the header and returns an iterator over the record tuples"""
+    if len(payload) < HEADER.size:
+        raise ValueError(f"Wire message of {len(payload)} bytes is shorter than its header")
+    magic, version, payload_kind, count = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION or payload_kind != kind:
+        raise ValueError(f"Unsupported wire message: magic={magic!r}, version={version}, kind={payload_kind}")
+    if len(payload) != HEADER.size + count * record.size:
+        raise ValueError(f"Wire message size {len(payload)} does not match {count} records")
+    return record.iter_unpack(memoryview(payload)[HEADER.size:])
+
+
+def decode_processed_agent_data_rows(payload: bytes) -> list[dict]:
+    """Decodes processed agent data straight into processed_agent_data table rows"""
+    rows = []
+    for row in unpack(KIND_PROCESSED_AGENT_DATA, PROCESSED_RECORD, payload):
+        road_state, humidex_state, wind_chill_state, micros, aware, user_id, *values = row
+        x, y, z, latitude, longitude, temperature, humidity, speed, direction = values
+        rows.append({
+            "road_state": _state(ROAD_STATES, road_state, "road_state"),
+            "humidex_state": _state(HUMIDEX_STATES, humidex_state, "humidex_state"),
+            "wind_chill_state": _state(WIND_CHILL_STATES, wind_chill_state, "wind_chill_state"),
+            "user_id": user_id,
+            "x": x,
+            "y": y,
+            "z": z,
+            "latitude": latitude,
+            "longitude": longitude,
+            "temperature": temperature,
+            "humidity": humidity,
+            "speed": speed,
+            "direction": direction,
+            "timestamp": decode_timestamp(micros, aware).isoformat(),
+        })
+    return rows